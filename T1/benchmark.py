@@ -0,0 +1,27 @@
+""" Benchmark del receptor de la BME688: las etapas de comun/benchmark.py con
+4 canales, midiendo el inicio de este receiver.py con --inicio. La etapa
+graficos llama al graficar de receiver.py para cada canal, como mostrar_datos
+(guardando en memoria y con el backend Agg).
+
+    python benchmark.py --tamanos 20 1000 100000 --salida resultados.json
+"""
+import io
+import os
+import sys
+
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.benchmark import main
+
+
+def graficos(ventana):
+    """ Los graficos de una ventana con el graficar de receiver.py """
+    import receiver
+    for fila, nombre in zip(ventana.crudo, receiver.CANALES):
+        receiver.graficar(fila, nombre, nombre, io.BytesIO())
+
+
+if __name__ == "__main__":
+    import matplotlib
+    matplotlib.use("Agg")
+    sys.exit(main(directorio=os.path.dirname(os.path.abspath(__file__)), canales=(4,),
+                  etapas_propias={"graficos": graficos}))
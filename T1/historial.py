@@ -0,0 +1,271 @@
+""" Historial de largo plazo con agregados a varias resoluciones.
+
+Sin esto cada ventana se imprime y se pierde. Historial guarda las muestras
+en una carpeta con:
+
+    esquema.json    nombres de los canales
+    crudo.bin       tiempo (float64) y valor de cada canal (float32) de cada
+                    muestra, solo de las ultimas horizonte segundos
+    minuto.bin      un registro por minuto, hora y dia con muestras: inicio,
+    hora.bin        n y por canal minimo, maximo, suma y suma de cuadrados
+    dia.bin         (float64), de donde salen la media y el RMS
+    abiertos.bin    el registro que se esta llenando en cada nivel
+
+agregar() actualiza los tres niveles de una vez con numpy (reduceat por
+tramo). Un registro se escribe al final de su archivo cuando llega una
+muestra de un tramo posterior, asi los archivos solo crecen. Los registros
+abiertos se guardan (reemplazando abiertos.bin) cada vez que se cierra un
+minuto y en cerrar(): si el programa se cae se pierde a lo mas el ultimo
+minuto de los agregados, y esas muestras siguen en crudo.bin. Los tramos se
+alinean al UTC (inicio = tiempo // segundos * segundos) y los tiempos se
+fuerzan a no decrecer: una muestra atrasada cuenta en el tramo abierto.
+
+Las consultas leen los archivos con numpy.memmap y buscan el rango con
+searchsorted, asi meses de historia se consultan sin recorrer las muestras:
+
+    historial = Historial('historial', CANALES)
+    historial.agregar(ventana)
+    historial.agregados('hora', desde, hasta)   # un Agregados por hora
+    historial.resumen(desde, hasta)             # minimo, maximo, media y RMS del rango
+    historial.crudo(desde, hasta)               # las muestras, si siguen en el horizonte
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+NIVELES = {"minuto": 60, "hora": 3600, "dia": 86400}  # Segundos de cada tramo, del mas fino al mas grueso
+HORIZONTE_CRUDO = 7 * 86400  # Segundos de muestras crudas que se guardan
+
+# Arreglos por tramo (o un solo tramo en resumen): inicio y n, y canales columnas en el resto
+Agregados = namedtuple('Agregados', ['inicio', 'n', 'minimo', 'maximo', 'media', 'rms'])
+
+
+class ErrorHistorial(Exception):
+    """ Error al abrir o escribir una carpeta de historial """
+
+
+def _dtype_registro(canales):
+    return np.dtype([('inicio', '<f8'), ('n', '<i8'), ('minimo', '<f8', (canales,)), ('maximo', '<f8', (canales,)),
+                     ('suma', '<f8', (canales,)), ('cuadrados', '<f8', (canales,))])
+
+
+def _dtype_crudo(canales):
+    return np.dtype([('tiempo', '<f8'), ('valores', '<f4', (canales,))])
+
+
+def _leer(ruta, dtype):
+    """ memmap de solo lectura de los registros completos del archivo """
+    largo = os.path.getsize(ruta) // dtype.itemsize if os.path.exists(ruta) else 0
+    if largo == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(ruta, dtype=dtype, mode='r', shape=(largo,))
+
+
+def _juntar(registros):
+    """ Un solo registro con todas las muestras de registros """
+    total = np.zeros(1, dtype=registros.dtype)
+    total['inicio'] = registros['inicio'].min() if len(registros) else np.nan
+    total['n'] = registros['n'].sum()
+    total['minimo'] = registros['minimo'].min(axis=0) if len(registros) else np.nan
+    total['maximo'] = registros['maximo'].max(axis=0) if len(registros) else np.nan
+    total['suma'] = registros['suma'].sum(axis=0)
+    total['cuadrados'] = registros['cuadrados'].sum(axis=0)
+    return total
+
+
+def _a_agregados(registros):
+    n = registros['n'][:, np.newaxis].astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return Agregados(np.array(registros['inicio']), np.array(registros['n']), np.array(registros['minimo']),
+                         np.array(registros['maximo']), registros['suma'] / n, np.sqrt(registros['cuadrados'] / n))
+
+
+class Historial:
+    """ Muestras recientes y agregados por minuto, hora y dia de todas las ventanas recibidas """
+
+    def __init__(self, carpeta, nombres, periodo=1.0, horizonte=HORIZONTE_CRUDO):
+        self.carpeta = carpeta
+        self.nombres = tuple(nombres)
+        self.periodo = periodo  # Segundos entre muestras de una ventana
+        self.horizonte = horizonte  # Segundos de muestras crudas, None para no guardarlas
+        self._registro = _dtype_registro(len(self.nombres))
+        self._crudo = _dtype_crudo(len(self.nombres))
+
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, "esquema.json")
+        if not os.path.exists(ruta):
+            with open(ruta, "w") as archivo:
+                json.dump({"nombres": list(self.nombres)}, archivo)
+        else:
+            with open(ruta) as archivo:
+                nombres_guardados = tuple(json.load(archivo)["nombres"])
+            if nombres_guardados != self.nombres:
+                raise ErrorHistorial(f"{carpeta} tiene canales {list(nombres_guardados)}, no {list(self.nombres)}")
+
+        # Se descartan los registros a medio escribir de una escritura interrumpida
+        for nivel in NIVELES:
+            self._recortar(self._ruta(nivel), self._registro)
+        self._recortar(self._ruta("crudo"), self._crudo)
+        crudo = _leer(self._ruta("crudo"), self._crudo)
+        self._ultimo = float(crudo['tiempo'][-1]) if len(crudo) else -np.inf
+        self._primero_crudo = float(crudo['tiempo'][0]) if len(crudo) else None
+        del crudo
+        self._abiertos = self._cargar_abiertos()
+
+    def _ruta(self, nombre):
+        return os.path.join(self.carpeta, f"{nombre}.bin")
+
+    @staticmethod
+    def _recortar(ruta, dtype):
+        if os.path.exists(ruta):
+            with open(ruta, "r+b") as archivo:
+                archivo.truncate(os.path.getsize(ruta) // dtype.itemsize * dtype.itemsize)
+
+    def _cargar_abiertos(self):
+        """ Registro abierto de cada nivel (None si no hay). Se ignora el que
+        ya este cerrado en su archivo (caida entre escribirlo y guardar abiertos.bin) """
+        abiertos = dict.fromkeys(NIVELES)
+        guardados = np.array(_leer(self._ruta("abiertos"), self._registro))
+        for i, (nivel, segundos) in enumerate(NIVELES.items()):
+            cerrados = _leer(self._ruta(nivel), self._registro)
+            if len(cerrados):
+                # Una muestra nueva no puede caer en un tramo ya cerrado
+                self._ultimo = max(self._ultimo, float(cerrados['inicio'][-1]) + segundos)
+            if len(guardados) != len(NIVELES) or guardados['n'][i] == 0:
+                continue
+            if len(cerrados) == 0 or guardados['inicio'][i] > cerrados['inicio'][-1]:
+                abiertos[nivel] = guardados[i:i + 1].copy()
+                self._ultimo = max(self._ultimo, float(guardados['inicio'][i]))
+        return abiertos
+
+    def _guardar_abiertos(self):
+        registros = np.zeros(len(NIVELES), dtype=self._registro)
+        for i, nivel in enumerate(NIVELES):
+            if self._abiertos[nivel] is not None:
+                registros[i] = self._abiertos[nivel][0]
+        temporal = self._ruta("abiertos") + ".tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(registros.tobytes())
+        os.replace(temporal, self._ruta("abiertos"))
+
+    def agregar(self, ventana, tiempo=None):
+        """ Agrega las muestras de una Ventana; tiempo es cuando llego la
+        ultima muestra (ahora si no se indica) """
+        n = len(ventana)
+        fin = time.time() if tiempo is None else tiempo
+        self.agregar_muestras(fin - (n - 1 - np.arange(n)) * self.periodo, ventana.crudo)
+
+    def agregar_muestras(self, tiempos, valores):
+        """ Agrega muestras sueltas: tiempos (n) y valores (canales x n) """
+        valores = np.asarray(valores, dtype=np.float64)
+        if valores.shape[1] == 0:
+            return
+        tiempos = np.maximum.accumulate(np.maximum(np.asarray(tiempos, dtype=np.float64), self._ultimo))
+        self._ultimo = float(tiempos[-1])
+        minuto_cerrado = False
+        for nivel, segundos in NIVELES.items():
+            cerrados = self._actualizar(nivel, segundos, tiempos, valores)
+            if len(cerrados):
+                with open(self._ruta(nivel), "ab") as archivo:
+                    archivo.write(cerrados.tobytes())
+                minuto_cerrado = minuto_cerrado or nivel == "minuto"
+        if minuto_cerrado:
+            self._guardar_abiertos()
+        if self.horizonte is not None:
+            self._agregar_crudo(tiempos, valores)
+
+    def _actualizar(self, nivel, segundos, tiempos, valores):
+        """ Suma las muestras a los tramos de un nivel; retorna los registros que se cerraron """
+        ids = (tiempos // segundos).astype(np.int64)
+        inicios = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])
+        registros = np.zeros(len(inicios), dtype=self._registro)
+        registros['inicio'] = ids[inicios] * segundos
+        registros['n'] = np.diff(np.append(inicios, len(ids)))
+        registros['minimo'] = np.minimum.reduceat(valores, inicios, axis=1).T
+        registros['maximo'] = np.maximum.reduceat(valores, inicios, axis=1).T
+        registros['suma'] = np.add.reduceat(valores, inicios, axis=1).T
+        registros['cuadrados'] = np.add.reduceat(valores * valores, inicios, axis=1).T
+        abierto = self._abiertos[nivel]
+        if abierto is not None and abierto['inicio'][0] == registros['inicio'][0]:
+            registros[0] = _juntar(np.concatenate([abierto, registros[:1]]))[0]
+            abierto = None
+        self._abiertos[nivel] = registros[-1:].copy()
+        cerrados = registros[:-1]
+        return cerrados if abierto is None else np.concatenate([abierto, cerrados])
+
+    def _agregar_crudo(self, tiempos, valores):
+        muestras = np.empty(len(tiempos), dtype=self._crudo)
+        muestras['tiempo'] = tiempos
+        muestras['valores'] = valores.T
+        with open(self._ruta("crudo"), "ab") as archivo:
+            archivo.write(muestras.tobytes())
+        if self._primero_crudo is None:
+            self._primero_crudo = float(tiempos[0])
+        # Se reescribe recien con el doble del horizonte, asi cada muestra se copia a lo mas una vez
+        if self._ultimo - self._primero_crudo > 2 * self.horizonte:
+            crudo = _leer(self._ruta("crudo"), self._crudo)
+            recientes = crudo[int(np.searchsorted(crudo['tiempo'], self._ultimo - self.horizonte)):]
+            temporal = self._ruta("crudo") + ".tmp"
+            with open(temporal, "wb") as archivo:
+                archivo.write(recientes.tobytes())
+            self._primero_crudo = float(recientes['tiempo'][0])
+            del crudo, recientes
+            os.replace(temporal, self._ruta("crudo"))
+
+    def _registros(self, nivel, desde, hasta):
+        """ Registros del nivel (cerrados y el abierto) con desde <= inicio < hasta """
+        cerrados = _leer(self._ruta(nivel), self._registro)
+        inicio = np.searchsorted(cerrados['inicio'], desde, side='left')
+        fin = np.searchsorted(cerrados['inicio'], hasta, side='left')
+        registros = np.array(cerrados[inicio:fin])
+        abierto = self._abiertos[nivel]
+        if abierto is not None and desde <= abierto['inicio'][0] < hasta:
+            registros = np.concatenate([registros, abierto])
+        return registros
+
+    def agregados(self, nivel, desde=None, hasta=None):
+        """ Agregados de cada tramo del nivel ("minuto", "hora" o "dia") que
+        empieza entre desde y hasta """
+        if nivel not in NIVELES:
+            raise ValueError(f"Nivel {nivel!r} desconocido, los niveles son {list(NIVELES)}")
+        return _a_agregados(self._registros(nivel, -np.inf if desde is None else desde,
+                                            np.inf if hasta is None else hasta))
+
+    def resumen(self, desde=None, hasta=None):
+        """ Minimo, maximo, media y RMS de cada canal entre desde y hasta, con
+        precision de un minuto (los extremos se ajustan a minutos completos).
+        Usa dias completos, luego horas y luego minutos, asi un rango de meses
+        lee unos cientos de registros """
+        desde = -np.inf if desde is None else desde // NIVELES["minuto"] * NIVELES["minuto"]
+        hasta = np.inf if hasta is None else -(-hasta // NIVELES["minuto"]) * NIVELES["minuto"]
+        partes = [np.empty(0, dtype=self._registro)]
+        pendientes = [(desde, hasta)] if desde < hasta else []
+        for nivel, segundos in reversed(NIVELES.items()):
+            siguientes = []
+            for a, b in pendientes:
+                # Tramos completos del nivel dentro de [a, b); los bordes quedan para el nivel mas fino
+                a_nivel = a if np.isinf(a) else -(-a // segundos) * segundos
+                b_nivel = b if np.isinf(b) else b // segundos * segundos
+                if a_nivel < b_nivel:
+                    partes.append(self._registros(nivel, a_nivel, b_nivel))
+                    siguientes += [(a, a_nivel), (b_nivel, b)]
+                else:
+                    siguientes.append((a, b))
+            pendientes = [(a, b) for a, b in siguientes if a < b]
+        total = _a_agregados(_juntar(np.concatenate(partes)))
+        return Agregados(*(valor[0] for valor in total))
+
+    def crudo(self, desde=None, hasta=None):
+        """ (tiempos, valores canales x n) de las muestras guardadas entre desde y hasta """
+        muestras = _leer(self._ruta("crudo"), self._crudo)
+        inicio = 0 if desde is None else int(np.searchsorted(muestras['tiempo'], desde, side='left'))
+        fin = len(muestras) if hasta is None else int(np.searchsorted(muestras['tiempo'], hasta, side='left'))
+        muestras = np.array(muestras[inicio:fin])
+        return muestras['tiempo'], muestras['valores'].T
+
+    def cerrar(self):
+        """ Guarda los registros abiertos; el historial se puede volver a abrir despues """
+        self._guardar_abiertos()
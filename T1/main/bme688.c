@@ -11,6 +11,7 @@
 #include "driver/i2c_master.h"
 #include "driver/uart.h"
 #include "esp_log.h"
+#include "esp_rom_crc.h"
 #include "freertos/FreeRTOS.h"
 #include "freertos/task.h"
 #include "esp_system.h"
@@ -30,6 +31,19 @@
 
 #define REDIRECT_LOGS 1 // if redirect ESP log to another UART
 
+// Frames binarios (ver protocolo.py en el computador)
+#define FRAME_MUESTRAS_F32 1
+#define FRAME_MUESTRAS_I16 2
+#define FRAME_RMS 3
+#define FRAME_FFT 4
+#define FRAME_PEAKS 5
+#define FRAME_FIN 6
+#define FRAME_PRUEBA 7  // Patron de prueba al cambiar los baudios
+#define LARGO_PATRON 4096
+#define PLAZO_BAUDIOS_MS 2000  // Sin CONFI en este plazo se vuelve a la velocidad anterior
+#define FILAS_POR_FRAME 64
+#define FILAS_CONTINUO 1  // Muestras por bloque en el modo continuo (STRM); el sensor mide una vez por segundo
+
 #define I2C_MASTER_SCL_IO GPIO_NUM_22  // GPIO pin
 #define I2C_MASTER_SDA_IO GPIO_NUM_21  // GPIO pin
 #define I2C_MASTER_FREQ_HZ 10000
@@ -44,6 +58,10 @@
 esp_err_t ret = ESP_OK;
 esp_err_t ret2 = ESP_OK;
 
+int modo_binario = 0;  // 0: texto con sprintf (placas antiguas), 1: frames binarios
+uint16_t secuencia_frame = 0;
+int solo_crudo = 0;  // 1: no se calcula RMS, FFT ni peaks, solo se envian las muestras
+
 uint16_t val0[6];
 
 float task_delay_ms = 1000;
@@ -127,12 +145,83 @@ static void uart_setup() {
     }
 }
 
+// Envia un frame: sync, tipo, canales, secuencia, largo, payload y crc32 (little-endian)
+void enviar_frame(uint8_t tipo, uint8_t canales, const void *payload, uint16_t largo) {
+    uint8_t cabecera[8] = {0xA5, 0x5A, tipo, canales,
+                           secuencia_frame & 0xFF, secuencia_frame >> 8,
+                           largo & 0xFF, largo >> 8};
+    uint32_t crc = esp_rom_crc32_le(0, cabecera + 2, 6);
+    crc = esp_rom_crc32_le(crc, (const uint8_t *)payload, largo);
+
+    uart_write_bytes(UART_NUM, (const char *)cabecera, 8);
+    if (largo > 0) {
+        uart_write_bytes(UART_NUM, (const char *)payload, largo);
+    }
+    uart_write_bytes(UART_NUM, (const char *)&crc, 4);
+    secuencia_frame++;
+}
+
+// Envia una matriz de floats de filas x ancho en frames de a lo mas FILAS_POR_FRAME filas
+void enviar_frames_float(uint8_t tipo, uint8_t canales, int ancho, const float *datos, int filas) {
+    for (int i = 0; i < filas; i += FILAS_POR_FRAME) {
+        int n = (filas - i < FILAS_POR_FRAME) ? filas - i : FILAS_POR_FRAME;
+        enviar_frame(tipo, canales, datos + i * ancho, n * ancho * sizeof(float));
+    }
+}
+
 // Read UART_num for input with timeout of 1 sec
 int serial_read(char *buffer, int size){
     int len = uart_read_bytes(UART_NUM, (uint8_t*)buffer, size, pdMS_TO_TICKS(1000));
     return len;
 }
 
+// Velocidades que se pueden pedir con BAUD<i> (igual que VELOCIDADES en protocolo.py)
+static const int velocidades[] = {115200, 230400, 460800, 921600, 1500000, 2000000};
+#define N_VELOCIDADES (sizeof(velocidades) / sizeof(velocidades[0]))
+
+// Cambia la UART a velocidades[indice] como pide enlace.py: responde OK a la velocidad
+// actual, cambia y atiende PRUEB (envia el patron de prueba) y CONFI. Si CONFI no llega
+// en PLAZO_BAUDIOS_MS se vuelve a la velocidad anterior
+void cambiar_baudios(int indice) {
+    static uint8_t patron[LARGO_PATRON];
+    char comando[6];
+    uint32_t anterior;
+    int confirmado = 0;
+
+    if (indice < 0 || indice >= (int)N_VELOCIDADES) {
+        return;
+    }
+    for (int i = 0; i < LARGO_PATRON; i++) {
+        patron[i] = i & 0xFF;
+    }
+    uart_get_baudrate(UART_NUM, &anterior);
+    uart_write_bytes(UART_NUM, "OK\0", 3);
+    uart_wait_tx_done(UART_NUM, pdMS_TO_TICKS(100));
+    uart_set_baudrate(UART_NUM, velocidades[indice]);
+    uart_flush_input(UART_NUM);
+
+    TickType_t limite = xTaskGetTickCount() + pdMS_TO_TICKS(PLAZO_BAUDIOS_MS);
+    while (!confirmado && xTaskGetTickCount() < limite) {
+        memset(comando, 0, sizeof(comando));
+        int len = uart_read_bytes(UART_NUM, (uint8_t*)comando, 6, pdMS_TO_TICKS(100));
+        if (len <= 0) {
+            continue;
+        }
+        if (strcmp(comando, "PRUEB") == 0) {
+            enviar_frame(FRAME_PRUEBA, 1, patron, LARGO_PATRON);
+        }
+        else if (strcmp(comando, "CONFI") == 0) {
+            uart_write_bytes(UART_NUM, "OK\0", 3);
+            confirmado = 1;
+        }
+    }
+    if (!confirmado) {
+        uart_wait_tx_done(UART_NUM, pdMS_TO_TICKS(100));
+        uart_set_baudrate(UART_NUM, anterior);
+        uart_flush_input(UART_NUM);
+    }
+}
+
 // Setea la ventana en la nvs
 void set_window_nvs(int ventana) {
     ventana = (int32_t)ventana;
@@ -745,6 +834,17 @@ void bme_read_data(int window, int time) {
     float data_hum[window];
     float data_gas[window];
 
+    // Muestras intercaladas para el modo binario. Van en el heap: la tarea principal tiene solo
+    // CONFIG_ESP_MAIN_TASK_STACK_SIZE (3584 bytes) de stack y con unos cientos de muestras no cabrian
+    float (*muestras)[4] = NULL;
+    if (modo_binario) {
+        muestras = malloc(window * sizeof(*muestras));
+        if (muestras == NULL) {
+            printf("Sin memoria para una ventana de %d muestras\n", window);
+            return;
+        }
+    }
+
     // Se obtienen los datos de temperatura y presion
     //printf("Obteniendo las direcciones de los datos\n");
     uint8_t forced_temp_addr[] = {0x22, 0x23, 0x24};
@@ -825,6 +925,14 @@ void bme_read_data(int window, int time) {
         data_hum[i] = hum_f;
         data_gas[i] = gas_f;
 
+        if (modo_binario) {
+            muestras[i][0] = temp_f;
+            muestras[i][1] = press_f;
+            muestras[i][2] = hum_f;
+            muestras[i][3] = gas_f;
+            continue;
+        }
+
         // Enviamos los datos a la computadora
         //printf("Enviando datos de temperatura, presion, humedad y concentracion de CO\n");
         char send_temp[20];
@@ -843,6 +951,15 @@ void bme_read_data(int window, int time) {
         uart_write_bytes(UART_NUM, send_hum, strlen(send_hum));
         uart_write_bytes(UART_NUM, " ", 1);
         uart_write_bytes(UART_NUM, send_gas, strlen(send_gas));
+        uart_write_bytes(UART_NUM, "\n", 1);
+    }
+    if (solo_crudo) {
+        // RMS, FFT y peaks se calculan en el computador (analisis.py)
+        if (modo_binario) {
+            enviar_frames_float(FRAME_MUESTRAS_F32, 4, 4, &muestras[0][0], window);
+        }
+        free(muestras);
+        return;
     }
     vTaskDelay(pdMS_TO_TICKS(time+2000));
 
@@ -877,6 +994,37 @@ void bme_read_data(int window, int time) {
     qsort(data_hum, window, sizeof(float), comparar);
     qsort(data_gas, window, sizeof(float), comparar);
 
+    if (modo_binario) {
+        // Mismo contenido que el modo texto, pero en frames de floats sin formatear
+        float rms[4] = {final_rms_temp, final_rms_press, final_rms_hum, final_rms_gas};
+        float (*fft)[8] = malloc(window * sizeof(*fft));
+        if (fft == NULL) {
+            printf("Sin memoria para la FFT de %d muestras\n", window);
+            free(muestras);
+            return;
+        }
+        float peaks[5][4];
+        for (int i = 0; i < window; i++) {
+            fft[i][0] = fft_temp_real[i]; fft[i][1] = fft_temp_imag[i];
+            fft[i][2] = fft_press_real[i]; fft[i][3] = fft_press_imag[i];
+            fft[i][4] = fft_hum_real[i]; fft[i][5] = fft_hum_imag[i];
+            fft[i][6] = fft_gas_real[i]; fft[i][7] = fft_gas_imag[i];
+        }
+        for (int i = 0; i < 5; i++) {
+            peaks[i][0] = data_temp[i];
+            peaks[i][1] = data_press[i];
+            peaks[i][2] = data_hum[i];
+            peaks[i][3] = data_gas[i];
+        }
+        enviar_frames_float(FRAME_MUESTRAS_F32, 4, 4, &muestras[0][0], window);
+        enviar_frame(FRAME_RMS, 4, rms, sizeof(rms));
+        enviar_frames_float(FRAME_FFT, 4, 8, &fft[0][0], window);
+        enviar_frame(FRAME_PEAKS, 4, peaks, sizeof(peaks));
+        free(fft);
+        free(muestras);
+        return;
+    }
+
     // printf("%f %f\n", fft_temp_real[0], fft_temp_imag[0]);
     // printf("%f %f\n", fft_temp_real[1], fft_temp_imag[1]);
 
@@ -1003,7 +1151,11 @@ void app_main(void) {
                 // printf("Ventana obtenida: %d\n", ventana);
                 // uart_write_bytes(UART_NUM, (char *)ventana, 6);
                 bme_read_data(ventana, 1000);
-                uart_write_bytes(UART_NUM, "FINISH\0", 7);
+                if (modo_binario) {
+                    enviar_frame(FRAME_FIN, 4, NULL, 0);
+                } else {
+                    uart_write_bytes(UART_NUM, "FINISH\0", 7);
+                }
                 //printf("Lectura finalizada\n\n");
             }
             else if (strcmp(dataResponse1, "END") == 0) {
@@ -1013,6 +1165,48 @@ void app_main(void) {
                 //printf("ESP reiniciada\n\n");
                 break;
             }
+            else if (strcmp(dataResponse1, "BINAR") == 0) {
+                // El computador pide las ventanas en frames binarios
+                modo_binario = 1;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "TEXTO") == 0) {
+                modo_binario = 0;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "CRUDO") == 0) {
+                // El computador calcula RMS, FFT y peaks, solo se envian las muestras
+                solo_crudo = 1;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "COMPL") == 0) {
+                solo_crudo = 0;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "STRM") == 0) {
+                // Modo continuo: se envian bloques de muestras sin esperar BEGIN hasta recibir STOP.
+                // RMS, FFT y peaks los calcula el computador sobre una ventana deslizante (continuo.py)
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+                int crudo_anterior = solo_crudo;
+                solo_crudo = 1;
+                while (1) {
+                    bme_read_data(FILAS_CONTINUO, 1000);
+                    int len = uart_read_bytes(UART_NUM, (uint8_t*)dataResponse1, 6, 0);
+                    if (len > 0 && strcmp(dataResponse1, "STOP") == 0) {
+                        break;
+                    }
+                }
+                solo_crudo = crudo_anterior;
+                if (modo_binario) {
+                    enviar_frame(FRAME_FIN, 4, NULL, 0);
+                } else {
+                    uart_write_bytes(UART_NUM, "FINISH\0", 7);
+                }
+            }
+            else if (strncmp(dataResponse1, "BAUD", 4) == 0) {
+                // El computador negocia una UART mas rapida (ver enlace.py)
+                cambiar_baudios(dataResponse1[4] - '0');
+            }
             else {
                 //printf("Iniciando cambio de ventana\n");
                 // Si caemos aca es porque la computadora quiere que cambiemos el valor de la ventana, valor que fue enviado en forma de string
@@ -1,51 +1,86 @@
-import serial
-from struct import pack, unpack
-import matplotlib.pyplot as plt
-import bisect
+import argparse
+import sys
+import time
+from struct import pack
+import numpy as np
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.protocolo import EnsambladorTexto, TIPO_FIN, TIPO_MUESTRAS_F32, COMANDO_BINARIO, COMANDO_CRUDO
+from comun.lector import LectorSerial, ErrorLector
+from comun.ventana import Ventana
+from comun.analisis import analizar, verificar, plan_fft
+from comun.estadisticas import TopKCanales
+from comun.decimacion import decimar, eje_tiempo, estilo_marcador
+# pyserial y matplotlib se importan recien cuando se usan (conectar y graficar):
+# importar este modulo no abre el puerto ni carga matplotlib
 
 # Se configura el puerto y el BAUD_Rate
 PORT = 'COM4'  # Esto depende del sistema operativo
 BAUD_RATE = 115200  # Debe coincidir con la configuracion de la ESP32
+BAUDIOS_MAXIMO = None # Al conectar se sube la velocidad hasta estos baudios si el enlace lo soporta (ver enlace.py), None para no negociar
 TIME = 1 # Tiempo de espera entre una medicion y otra
-
-# Se abre la conexion serial
-ser = serial.Serial(PORT, BAUD_RATE, timeout = 1)
+MODO_BINARIO = False # True si la ESP32 tiene el firmware con frames binarios (ver protocolo.py)
+TIMEOUT = 10 # Segundos maximos de espera por una respuesta de la ESP32
+SOLO_CRUDO = False # True: la ESP32 solo envia las muestras y el computador calcula RMS, FFT y peaks (ver analisis.py)
+DETECCION = None # JSON con las reglas de deteccion de anomalias que se revisan mientras llegan las muestras (ver deteccion.py), None para no revisar
+VERIFICAR_ANALISIS = False # True: compara el RMS, la FFT y los peaks de la ESP32 con los calculados en el computador
+CARPETA_DATOS = None # Carpeta donde se guardan todas las ventanas recibidas (ver almacenamiento.py), None para no guardar
+CARPETA_HISTORIAL = None # Carpeta del historial por minuto, hora y dia (ver historial.py), None para no guardarlo
+REDUCCION_DATOS = None # Muestras por bloque del nivel reducido (minimo y maximo) que se guarda junto a los datos, None para no guardarlo
+CAPTURA = None # Archivo donde se graban los bytes de la sesion (ver captura.py), None para no grabar
+REPRODUCIR = None # Archivo de captura que se reproduce en vez de abrir PORT, None para usar la ESP32
+VELOCIDAD_REPRODUCCION = None # 1 para reproducir al ritmo original, None para lo mas rapido posible
+CANALES = ("temperatura", "presion", "humedad", "concentracion") # Orden de los valores en cada linea
+VENTANA_CONTINUO = 10 # Muestras de la ventana deslizante del modo continuo
+SALTO_CONTINUO = 5 # Cada cuantas muestras se muestran las estadisticas en el modo continuo
+GRAFICAR = True # False: no se guardan los PNG de cada ventana y nunca se carga matplotlib
+
+# La conexion serial se abre en conectar()
+ser = None
+lector = None
+escritor = None
+historial = None
+detector = None
 
 # Funciones
-def insertar_ordenado(lista, dato):
-    """ Funcion para insertar un dato en una lista ordenada """
-    bisect.insort(lista, -dato)
+def conectar():
+    """ Funcion que abre el puerto (o la captura a reproducir), parte el hilo
+    lector y configura el modo de la ESP32 """
+    global ser, lector, escritor, historial, detector
+    if REPRODUCIR is not None:
+        from comun.captura import SerialReproductor
+        ser = SerialReproductor(REPRODUCIR, VELOCIDAD_REPRODUCCION)
+    else:
+        import serial
+        ser = serial.serial_for_url(PORT, BAUD_RATE, timeout = 1) # Acepta tambien urls como socket:// (ver simulador.py)
+    if CAPTURA is not None:
+        from comun.captura import SerialGrabador
+        ser = SerialGrabador(ser, CAPTURA)
+    # Un solo hilo lee el puerto y deja las lineas y frames en colas (ver lector.py)
+    lector = LectorSerial(ser)
+    lector.start()
+    if BAUDIOS_MAXIMO is not None:
+        from comun.enlace import negociar_baudios, describir
+        print(describir(negociar_baudios(ser, lector, BAUDIOS_MAXIMO)))
+    # Las ventanas se escriben a disco desde otro hilo para no frenar la lectura
+    if CARPETA_DATOS is not None:
+        from comun.almacenamiento import EscritorAlmacen
+        escritor = EscritorAlmacen(CARPETA_DATOS, CANALES, reduccion=REDUCCION_DATOS)
+        escritor.start()
+    if CARPETA_HISTORIAL is not None:
+        from historial import Historial
+        historial = Historial(CARPETA_HISTORIAL, CANALES, periodo=TIME)
+    if DETECCION is not None:
+        from comun.deteccion import Detector
+        detector = Detector.desde_archivo(DETECCION, CANALES, periodo=TIME)
+    if MODO_BINARIO:
+        activar_modo_binario()
+    if SOLO_CRUDO:
+        activar_solo_crudo()
+
 def send_message(message):
     """ Funcion para enviar un mensaje a la ESP32 """
     ser.write(message)
 
-def receive_response():
-    """ Funcion para recibir un mensaje de la ESP32 """
-    response = ser.readline() #Esta funcion lee hasta que se topa con un salto de linea o el tiempo de espera se agota
-    return response
-
-def receive_data():
-    """ Funcion que recibe n floats de la ESP32 
-    y los imprime en consola """
-    respuesta_encriptada = receive_response()
-    # Descomente la linea de abajo para ver los datos que envia la ESP32 en tiempo real
-    # print(respuesta_encriptada)
-    if b'FINISH' in respuesta_encriptada:
-        return None, None, None, None
-    
-    datos = respuesta_encriptada.decode('utf-8').split(" ")
-
-    if len(datos) == 4: #Estamos viendo mediciones
-
-        return float(datos[0]), float(datos[1]), float(datos[2]), float(datos[3])
-    
-    elif len(datos) == 8:
-
-        return (float(datos[0]), float(datos[1])),\
-                (float(datos[2]), float(datos[3])),\
-                (float(datos[4]), float(datos[5])),\
-                (float(datos[6]), float(datos[7]))
-
 def send_end_message():
     """ Funcion para enviar un mensaje de finalizacion a la ESP32 """
     end_message = pack('4s', 'END\0'.encode())
@@ -55,21 +90,23 @@ def cambiar_ventana(new_size):
     largo_mensaje = len(str(new_size))
     change_message = pack(f'{largo_mensaje}s', f'{new_size}\0'.encode()) #pack('9s', '6\0')
     ser.write(change_message)
+    # Los buffers de la FFT del nuevo tamano quedan listos antes de la primera ventana (ver analisis.plan_fft)
+    plan_fft(int(new_size), (len(CANALES),))
 
 def terminar_conexion():
     # Se envia el mensaje de termino de comunicacion
     send_end_message()
     # Esperamos que la ESP32 responda
-    while True:
-        if ser.in_waiting > 0:
-            try:
-                message = receive_response()
-                # print(message)
-                if b"CLOSED" in message:
-                    break
-            except:
-                continue
+    try:
+        lector.esperar_respuesta(b"CLOSED", TIMEOUT)
+    except (TimeoutError, ErrorLector) as e:
+        print(f"No se recibio CLOSED de la ESP32: {e}")
+    lector.detener()
     ser.close()
+    if escritor is not None:
+        escritor.detener()
+    if historial is not None:
+        historial.cerrar()
 
 # Funciones auxiliares
 
@@ -79,128 +116,189 @@ def comenzar_lectura():
     message = pack('6s','BEGIN\0'.encode()) #Minuto 30 del aux 2
     send_message(message)
 
-    while True:
-        if ser.in_waiting > 0: #verifica si hay datos en el puerto serial
-            try:
-                message = receive_response()
-                if b"OK" in message:
-                    break
-            except:
-                continue
-    
-    
+    lector.esperar_respuesta(b"OK", TIMEOUT)
+
 
 def leyendo():
-    #Creamos un arreglo para guardar los datos
-    temperatura = []
-    presion = []
-    humedad = []
-    concentracion_co = []
-    peaks_tmp = []
-    peaks_pres = []
-    peaks_hum = []
-    peaks_co = []
-    # Se lee data por la conexion serial
-    #listen_forever()
+    """ Funcion que recibe una ventana en modo texto y la retorna como Ventana """
+    # Las lineas se parsean de a lote, con todo lo que ya llego (ver protocolo.ParserTexto)
+    ensamblador = EnsambladorTexto(len(CANALES), SOLO_CRUDO)
+    # Los peaks se siguen a medida que llegan las muestras
+    seguidor = TopKCanales(CANALES)
+    recibidas = 0
+    terminada = False
+    while not terminada:
+        muestras, terminada = ensamblador.agregar_lineas(lector.leer_lineas(TIMEOUT, hasta=b"FINISH"))
+        if len(muestras):
+            seguidor.agregar_bloque(muestras, np.arange(recibidas, recibidas + len(muestras)) * TIME)
+            recibidas += len(muestras)
+            revisar_alertas(muestras)
+    parser = ensamblador.parser
+    if parser.descartadas:
+        print(f"Lineas descartadas: {parser.malformadas} malformadas, {parser.truncadas} truncadas, "
+              f"{parser.sobrantes} con valores de mas")
+    ventana = Ventana.desde_arreglos(*ensamblador.ventana(), nombres=CANALES)
+    ventana.detalle_peaks = seguidor.detalle()
+    return ventana
+
+def activar_modo_binario():
+    """ Funcion para pedirle a la ESP32 que envie las ventanas en frames binarios """
+    send_message(COMANDO_BINARIO)
+
+    lector.esperar_respuesta(b"OK", TIMEOUT)
+
+def activar_solo_crudo():
+    """ Funcion para pedirle a la ESP32 que solo envie las muestras """
+    send_message(COMANDO_CRUDO)
+
+    lector.esperar_respuesta(b"OK", TIMEOUT)
+
+def revisar_analisis(ventana):
+    """ Funcion que avisa si el RMS, la FFT o los peaks de la ESP32 no
+    coinciden con los calculados en el computador """
+    for seccion, (error, canales) in verificar(ventana).items():
+        if canales:
+            print(f"ADVERTENCIA: {seccion} de la ESP32 no coincide en {canales} (error maximo {error})")
+
+def revisar_alertas(muestras):
+    """ Funcion que pasa un bloque de muestras por el detector apenas llega
+    e imprime las alertas """
+    if detector is None:
+        return
+    from comun.deteccion import mensaje
+    for alerta in detector.agregar_bloque(muestras):
+        print(mensaje(alerta))
+
+def leyendo_binario():
+    """ Funcion que recibe una ventana en frames binarios (ver protocolo.py)
+    y la retorna como Ventana """
+    frames = []
+    seguidor = TopKCanales(CANALES)
+    recibidas = 0
     while True:
-        if ser.in_waiting > 0: #verifica si hay datos en el puerto serial
-            try:
-                temp, press, hum, co = receive_data()
-                if temp is None:
-                    window_size =int((len(temperatura) - 6) / 2)
-                    data = {
-                        "ventana_temperatura": temperatura[:window_size],
-                        "ventana_presion": presion[:window_size],
-                        "ventana_humedad": humedad[:window_size],
-                        "ventana_concentracion": concentracion_co[:window_size],
-
-                        "tRMS": temperatura[window_size],
-                        "pRMS": presion[window_size],
-                        "hRMS": humedad[window_size],
-                        "cRMS": concentracion_co[window_size],
-
-                        "peaks_temperatura" : temperatura[2*window_size +1 :],
-                        "peaks_presion" : presion[2*window_size +1 :],
-                        "peaks_humedad" : humedad[2*window_size +1 :],
-                        "peaks_concentracion" : concentracion_co[2*window_size +1 :],
-
-                        "FFT_temperatura" : temperatura[window_size + 1: 2 * window_size + 1],
-                        "FFT_presion" : presion[window_size + 1: 2 * window_size + 1],
-                        "FFT_humedad" : humedad[window_size + 1: 2 * window_size + 1],
-                        "FFT_concentracion" : concentracion_co[window_size + 1: 2 * window_size + 1]
-                    }
-                    return data
-                temperatura.append(temp)
-                presion.append(press)
-                humedad.append(hum)
-                concentracion_co.append(co)
-            except:
-                continue
+        frame = lector.leer_frame(TIMEOUT)
+        if frame.tipo == TIPO_FIN:
+            ventana = Ventana.desde_frames(frames, nombres=CANALES)
+            ventana.detalle_peaks = seguidor.detalle()
+            return ventana
+        if frame.tipo == TIPO_MUESTRAS_F32:
+            tiempos = np.arange(recibidas, recibidas + len(frame.datos)) * TIME
+            seguidor.agregar_bloque(frame.datos, tiempos)
+            recibidas += len(frame.datos)
+            revisar_alertas(frame.datos)
+        frames.append(frame)
 
 def graficar(lista,variable, title, filename):
+    if not GRAFICAR:
+        return
+    import matplotlib.pyplot as plt
     plt.clf()
-    x = [i*TIME for i in range(len(lista))]
-    plt.plot(x, lista, marker='o', linestyle='-', color='b', label='Datos')
+    # Con ventanas largas se dibujan a lo mas decimacion.MAX_PUNTOS puntos (sin perder los peaks)
+    x, y = decimar(eje_tiempo(len(lista), TIME), np.asarray(lista))
+    plt.plot(x, y, marker=estilo_marcador(len(x)), linestyle='-', color='b', label='Datos')
     plt.xlabel('Tiempo (s)')
     plt.ylabel(variable)
     plt.title(title)
     plt.legend()
     plt.savefig(filename)
 
-def mostrar_datos(datos):
-    presiones = datos["ventana_presion"]
-    temperaturas = datos["ventana_temperatura"]
-    humedades = datos["ventana_humedad"]
-    concentraciones = datos["ventana_concentracion"]
-
-    pRMS = datos["pRMS"]
-    tRMS = datos["tRMS"]
-    hRMS = datos["hRMS"]
-    cRMS = datos["cRMS"]
-
-    peaks_temperatura = datos["peaks_temperatura"]
-    peaks_presion = datos["peaks_presion"]
-    peaks_humedad = datos["peaks_humedad"]
-    peaks_concentracion = datos["peaks_concentracion"]
-
-    FFT_temperatura = datos["FFT_temperatura"]
-    FFT_presion = datos["FFT_presion"]
-    FFT_humedad = datos["FFT_humedad"]
-    FFT_concentracion = datos["FFT_concentracion"]
+def describir_peaks(peaks):
+    """ Funcion que retorna los peaks como texto, con su muestra y tiempo si se conocen """
+    textos = []
+    for peak in peaks:
+        if isinstance(peak, tuple):
+            valor, indice, tiempo = peak
+            textos.append(f"{valor} (muestra {indice}, t = {tiempo} s)")
+        else:
+            textos.append(f"{peak}")
+    return ", ".join(textos)
+
+def mostrar_datos(ventana):
+    temperaturas = ventana["temperatura"]
+    presiones = ventana["presion"]
+    humedades = ventana["humedad"]
+    concentraciones = ventana["concentracion"]
+
+    tRMS, pRMS, hRMS, cRMS = ventana.rms
+    peaks_temperatura, peaks_presion, peaks_humedad, peaks_concentracion = ventana.detalle_peaks or ventana.peaks
+    FFT_temperatura, FFT_presion, FFT_humedad, FFT_concentracion = ventana.fft
 
     graficar(temperaturas, "Temperatura (°C)", "Temperatura", "temperatura.png")
-    print("Tamaño de la ventana: ", len(temperaturas), "\n")
+    print("Tamaño de la ventana: ", len(ventana), "\n")
     print("Datos temperatura: ",temperaturas)
     print(f"El RMS fue de {tRMS}")
-    print(f"Los 5 datos mas altos fueron: {peaks_temperatura}")
+    print(f"Los 5 datos mas altos fueron: {describir_peaks(peaks_temperatura)}")
     print(f"La transformada de fourier fue: {FFT_temperatura}\n")
 
     graficar(presiones, "Presión (Pa)", "Presion", "presion.png")
     print("Datos presion: ",presiones)
     print(f"El RMS fue de {pRMS}")
-    print(f"Los 5 datos mas altos fueron: {peaks_presion}")
+    print(f"Los 5 datos mas altos fueron: {describir_peaks(peaks_presion)}")
     print(f"La transformada de fourier fue: {FFT_presion}\n")
 
     graficar(humedades, "Humedad (%r.h.)", "Humedad", "humedad.png") ##### Rellenar unidad de medida
     print("Datos humedad: ",humedades)
     print(f"El RMS fue de {hRMS}")
-    print(f"Los 5 datos mas altos fueron: {peaks_humedad}")
+    print(f"Los 5 datos mas altos fueron: {describir_peaks(peaks_humedad)}")
     print(f"La transformada de fourier fue: {FFT_humedad}\n")
 
     graficar(concentraciones, "Concentración de CO (kΩ)", "Concentracion de CO", "concentracion.png") ##### Rellenar unidad de medida
     print("Datos concentración: ",concentraciones)
     print(f"El RMS fue de {cRMS}")
-    print(f"Los 5 datos mas altos fueron: {peaks_concentracion}")
+    print(f"Los 5 datos mas altos fueron: {describir_peaks(peaks_concentracion)}")
     print(f"La transformada de fourier fue: {FFT_concentracion}")
 
 
 def solicitar_ventana():
     print("Indicandole al ESP32 que comience a leer")
     comenzar_lectura()
+    if detector is not None:
+        # Entre una ventana y otra la ESP32 deja de medir: la pendiente y las bandas parten de nuevo
+        detector.interrumpir()
     print("Recibiendo datos...")
-    return leyendo()
-
-
+    if MODO_BINARIO:
+        ventana = leyendo_binario()
+    else:
+        ventana = leyendo()
+    if SOLO_CRUDO:
+        analizar(ventana)
+    elif VERIFICAR_ANALISIS:
+        revisar_analisis(ventana)
+    if escritor is not None:
+        escritor.agregar(ventana)
+    if historial is not None:
+        historial.agregar(ventana)
+    return ventana
+
+
+
+def mostrar_resultado(resultado):
+    """ Funcion que imprime las estadisticas de la ventana deslizante """
+    print(f"Ultimas {VENTANA_CONTINUO} muestras (hasta la muestra {resultado.muestra}):")
+    for i, nombre in enumerate(CANALES):
+        peaks = [(float(valor), int(indice), int(indice) * TIME)
+                 for valor, indice in zip(resultado.peaks[i], resultado.indices_peaks[i])]
+        print(f"  {nombre}: media {resultado.media[i]}, varianza {resultado.varianza[i]}, RMS {resultado.rms[i]}")
+        print(f"  Los 5 datos mas altos fueron: {describir_peaks(peaks)}")
+
+def modo_continuo():
+    """ Funcion que recibe muestras sin parar y muestra las estadisticas
+    de la ventana deslizante hasta que se presione Ctrl+C """
+    from comun.continuo import FlujoContinuo
+    if detector is not None:
+        detector.interrumpir()
+    flujo = FlujoContinuo(ser, lector, len(CANALES), VENTANA_CONTINUO, SALTO_CONTINUO, MODO_BINARIO, TIMEOUT,
+                          al_recibir=revisar_alertas)
+    flujo.iniciar()
+    print("Modo continuo, presione Ctrl+C para detener")
+    try:
+        for resultado in flujo.resultados():
+            mostrar_resultado(resultado)
+    except KeyboardInterrupt:
+        for resultado in flujo.detener():
+            mostrar_resultado(resultado)
+    if flujo.descartadas:
+        print(f"Se descartaron {flujo.descartadas} lineas corruptas")
 
 def marcador():
     print("+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+")
@@ -213,54 +311,126 @@ def desplegar_menu_principal():
     print("1: Solicitar una ventana de datos")
     print("2: Cambiar el tamaño de la ventana de datos")
     print("3: Cerrar la conexión")
+    print("4: Modo continuo (ventana deslizante)")
+    print("5: Resumen del historial")
+
+def mostrar_historial():
+    """ Funcion que imprime el minimo, maximo, media y RMS de cada canal en
+    la ultima hora, el ultimo dia y los ultimos 30 dias """
+    if historial is None:
+        print("No hay historial, use --historial para guardarlo")
+        return
+    ahora = time.time()
+    for titulo, segundos in (("Ultima hora", 3600), ("Ultimo dia", 86400), ("Ultimos 30 dias", 30 * 86400)):
+        resumen = historial.resumen(ahora - segundos, ahora)
+        print(f"{titulo} ({resumen.n} muestras):")
+        for i, nombre in enumerate(CANALES):
+            print(f"  {nombre}: minimo {resumen.minimo[i]}, maximo {resumen.maximo[i]}, "
+                  f"media {resumen.media[i]}, RMS {resumen.rms[i]}")
+
+def consola(n_ventanas):
+    """ Funcion que pide n_ventanas ventanas y las muestra, sin el menu """
+    for _ in range(n_ventanas):
+        try:
+            datos = solicitar_ventana()
+        except (TimeoutError, ErrorLector, ValueError) as e:
+            print(f"ERROR: No se pudo recibir la ventana: {e}")
+            break
+        mostrar_datos(datos)
+    terminar_conexion()
 
-def listen_forever():
+def menu():
     while True:
-        print(receive_response())
-
-# while True:
-#     if ser.in_waiting > 0: #verifica si hay datos en el puerto serial
-#         try:
-#             message = receive_response()
-#             if b"READY" in message:
-#                 print("Mensaje READY recibido")
-#                 send_message("START\0".encode())
-#                 break
-#         except:
-#             continue
-while True:
-    desplegar_menu_principal()
-
-    respuesta =  input("Ingresa el número de la opción elegida ")
-    print("\n")
+        desplegar_menu_principal()
 
-    if respuesta == "1":
-        """
-        Solicitamos una ventana y graficamos los datos
-        """
-        datos = solicitar_ventana()
-        mostrar_datos(datos)
+        respuesta =  input("Ingresa el número de la opción elegida ")
+        print("\n")
 
-    elif respuesta == "2":
-        respuesta2 =  input("Ingresa el nuevo tamaño de la ventana ")
-        respuesta2 = int(respuesta2)
-        if respuesta2 >= 5:
+        if respuesta == "1":
             """
-            Cambiar el numero de ventana y enviar mensaje para que ellos lo cambien
+            Solicitamos una ventana y graficamos los datos
             """
-            cambiar_ventana(respuesta2) #Solicitamos al ESP32 que cambie el tamaño de la ventana
+            try:
+                datos = solicitar_ventana()
+            except (TimeoutError, ErrorLector, ValueError) as e:
+                print(f"ERROR: No se pudo recibir la ventana: {e}")
+                continue
+            mostrar_datos(datos)
 
+        elif respuesta == "2":
+            respuesta2 =  input("Ingresa el nuevo tamaño de la ventana ")
+            respuesta2 = int(respuesta2)
+            if respuesta2 >= 5:
+                """
+                Cambiar el numero de ventana y enviar mensaje para que ellos lo cambien
+                """
+                cambiar_ventana(respuesta2) #Solicitamos al ESP32 que cambie el tamaño de la ventana
 
-    elif respuesta == "3":
-        """
-        Enviar END\0 y cerrar conexion
-        """
-        terminar_conexion()
-        print("FIN DEL PROGRAMA")
-        marcador()
-        break
 
+        elif respuesta == "3":
+            """
+            Enviar END\0 y cerrar conexion
+            """
+            terminar_conexion()
+            print("FIN DEL PROGRAMA")
+            marcador()
+            break
+
+        elif respuesta == "4":
+            """
+            Recibir muestras sin parar hasta Ctrl+C
+            """
+            try:
+                modo_continuo()
+            except (TimeoutError, ErrorLector) as e:
+                print(f"ERROR: Se interrumpio el modo continuo: {e}")
+
+        elif respuesta == "5":
+            mostrar_historial()
+
+        else:
+            print("ERROR: No es un input valido.")
+            print("Inputs validos: 1,2,3,4,5")
+
+
+def main(argv=None):
+    global PORT, BAUD_RATE, BAUDIOS_MAXIMO, MODO_BINARIO, SOLO_CRUDO, DETECCION, CARPETA_DATOS, REDUCCION_DATOS, CARPETA_HISTORIAL, CAPTURA, REPRODUCIR, GRAFICAR, VENTANA_CONTINUO, SALTO_CONTINUO
+    parser = argparse.ArgumentParser(description="Receptor de la BME688 (tarea 1)")
+    parser.add_argument("--puerto", default=PORT, help="Puerto o url de pyserial (socket://, ...)")
+    parser.add_argument("--baudios", type=int, default=BAUD_RATE)
+    parser.add_argument("--baudios-maximo", type=int, default=BAUDIOS_MAXIMO,
+                        help="Negociar con la ESP32 la velocidad mas alta que funcione, hasta estos baudios")
+    parser.add_argument("--binario", action="store_true", default=MODO_BINARIO, help="Pedir frames binarios")
+    parser.add_argument("--solo-crudo", action="store_true", default=SOLO_CRUDO, help="Calcular RMS, FFT y peaks en el computador")
+    parser.add_argument("--deteccion", default=DETECCION, help="JSON con las reglas de deteccion de anomalias")
+    parser.add_argument("--datos", default=CARPETA_DATOS, help="Carpeta donde se guardan las ventanas")
+    parser.add_argument("--reduccion", type=int, default=REDUCCION_DATOS,
+                        help="Guardar tambien el minimo y maximo de cada bloque de estas muestras")
+    parser.add_argument("--historial", default=CARPETA_HISTORIAL, help="Carpeta del historial por minuto, hora y dia")
+    parser.add_argument("--captura", default=CAPTURA, help="Archivo donde se graba la sesion")
+    parser.add_argument("--reproducir", default=REPRODUCIR, help="Captura que se reproduce en vez de abrir el puerto")
+    parser.add_argument("--sin-graficos", action="store_true", help="No guardar los PNG (no se carga matplotlib)")
+    parser.add_argument("--ventanas", type=int, default=None,
+                        help="Pide esta cantidad de ventanas, las muestra y termina (sin el menu)")
+    parser.add_argument("--ventana-continuo", type=int, default=VENTANA_CONTINUO,
+                        help="Muestras de la ventana deslizante del modo continuo (opcion 4 del menu)")
+    parser.add_argument("--salto-continuo", type=int, default=SALTO_CONTINUO,
+                        help="Cada cuantas muestras se muestran las estadisticas en el modo continuo")
+    args = parser.parse_args(argv)
+    PORT, BAUD_RATE, MODO_BINARIO, SOLO_CRUDO = args.puerto, args.baudios, args.binario, args.solo_crudo
+    BAUDIOS_MAXIMO, REDUCCION_DATOS = args.baudios_maximo, args.reduccion
+    CARPETA_DATOS, CAPTURA, REPRODUCIR = args.datos, args.captura, args.reproducir
+    CARPETA_HISTORIAL, DETECCION = args.historial, args.deteccion
+    GRAFICAR = GRAFICAR and not args.sin_graficos
+    VENTANA_CONTINUO, SALTO_CONTINUO = args.ventana_continuo, args.salto_continuo
+
+    conectar()
+    if args.ventanas is not None:
+        consola(args.ventanas)
     else:
-        print("ERROR: No es un input valido.")
-        print("Inputs validos: 1,2,3")
+        menu()
+    return 0
+
 
+if __name__ == "__main__":
+    sys.exit(main())
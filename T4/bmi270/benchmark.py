@@ -0,0 +1,44 @@
+""" Benchmark del receptor de la BMI270: las etapas de comun/benchmark.py con
+6 canales, midiendo el inicio de este receiver.py y de la interfaz con --inicio.
+Agrega las etapas:
+
+    graficos                   graficarXYZ de receiver.py para la aceleracion y el
+                               giroscopio, como mostrar_datos (en memoria, backend Agg)
+    orientacion_complementario los filtros de orientacion.py sobre toda la ventana,
+    orientacion_madgwick       integrando cada 1 / receiver.ODR segundos
+
+    python benchmark.py --tamanos 20 1000 100000 --salida resultados.json
+"""
+import io
+import os
+import sys
+
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.benchmark import main, MODULOS_INICIO
+from orientacion import FILTROS, crear
+
+
+def graficos(ventana):
+    """ Los graficos de una ventana con el graficarXYZ de receiver.py """
+    import receiver
+    acc = ventana.crudo[0:3]
+    gyr = ventana.crudo[3:6]
+    receiver.graficarXYZ(acc[0], acc[1], acc[2], "Aceleración", "Aceleración en los ejes x, y, z", io.BytesIO())
+    receiver.graficarXYZ(gyr[0], gyr[1], gyr[2], "Giroscopio", "Giroscopio en los ejes x, y, z", io.BytesIO())
+
+
+def orientacion(nombre):
+    """ Etapa que pasa la ventana por un filtro nuevo llamado nombre """
+    def etapa(ventana):
+        import receiver
+        crear(nombre, 1 / receiver.ODR).actualizar(ventana.crudo[0:3].T, ventana.crudo[3:6].T)
+    return etapa
+
+
+if __name__ == "__main__":
+    import matplotlib
+    matplotlib.use("Agg")
+    etapas = {"graficos": graficos}
+    etapas.update({f"orientacion_{nombre}": orientacion(nombre) for nombre in FILTROS})
+    sys.exit(main(directorio=os.path.dirname(os.path.abspath(__file__)), canales=(6,),
+                  modulos_inicio=MODULOS_INICIO + ("PyQt5.QtWidgets", "interfaz"), etapas_propias=etapas))
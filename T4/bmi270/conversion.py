@@ -0,0 +1,80 @@
+""" Conversion de las cuentas int16 de la BMI270 a unidades fisicas.
+
+El firmware convertia cada eje con (int16_t)acc_x * (8.000 / 32768), lo
+formateaba con sprintf("%f") y el computador lo volvia a parsear. Con CUENT
+(COMANDO_CUENTAS, que solo entiende el firmware de la BMI270) la ESP32 envia
+las cuentas tal como las lee del sensor en frames TIPO_MUESTRAS_I16, 2 bytes
+por eje en vez de los 4 de un float o los ~10 del texto, y el computador
+convierte bloques completos con numpy:
+
+    fisico = (cuentas * escala - sesgo) * ganancia
+
+La escala sale del rango configurado en el sensor (RANGOS_ACC en g y
+RANGOS_GYR en grados/s; en la BMI270 no depende del ODR) y el sesgo y la
+ganancia de la calibracion de cada eje. Todo se junta en un factor y un
+desplazamiento por canal, asi convertir es una multiplicacion y una suma.
+
+La calibracion se puede guardar en un JSON con el sesgo (en unidades
+fisicas) y la ganancia de los ejes que la necesiten:
+
+    {"sesgo": {"acc_x": 0.012, "gyr_z": -0.4}, "ganancia": {"acc_x": 0.998}}
+"""
+import json
+import struct
+
+import numpy as np
+
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.protocolo import TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16
+
+CUENTAS = 32768  # Cuentas del int16 para el fondo de escala
+RANGOS_ACC = {rango: rango / CUENTAS for rango in (2, 4, 8, 16)}  # g por cuenta segun el rango +-g
+RANGOS_GYR = {rango: rango / CUENTAS for rango in (125, 250, 500, 1000, 2000)}  # grados/s por cuenta
+RANGO_ACC = 8  # Como bmipowermode() en el firmware
+RANGO_GYR = 2000
+# Con CUENT la ESP32 envia las muestras como cuentas int16 (TIPO_MUESTRAS_I16); FLOAT vuelve a floats
+COMANDO_CUENTAS = struct.pack('6s', 'CUENT\0'.encode())
+COMANDO_FLOTANTES = struct.pack('6s', 'FLOAT\0'.encode())
+
+
+class Conversion:
+    """ Factor y desplazamiento por canal para pasar de cuentas a unidades fisicas """
+
+    def __init__(self, nombres, rango_acc=RANGO_ACC, rango_gyr=RANGO_GYR, sesgo=None, ganancia=None):
+        if rango_acc not in RANGOS_ACC:
+            raise ValueError(f"Rango de aceleracion {rango_acc} invalido, debe ser uno de {list(RANGOS_ACC)}")
+        if rango_gyr not in RANGOS_GYR:
+            raise ValueError(f"Rango de giroscopio {rango_gyr} invalido, debe ser uno de {list(RANGOS_GYR)}")
+        self.nombres = tuple(nombres)
+        sesgo = sesgo or {}
+        ganancia = ganancia or {}
+        desconocidos = (set(sesgo) | set(ganancia)) - set(self.nombres)
+        if desconocidos:
+            raise ValueError(f"La calibracion tiene canales desconocidos: {sorted(desconocidos)}")
+        escala = np.array([RANGOS_ACC[rango_acc] if nombre.startswith("acc") else RANGOS_GYR[rango_gyr]
+                           for nombre in self.nombres])
+        sesgo = np.array([sesgo.get(nombre, 0.0) for nombre in self.nombres])
+        ganancia = np.array([ganancia.get(nombre, 1.0) for nombre in self.nombres])
+        self.factor = (escala * ganancia).astype(np.float32)
+        self.desplazamiento = (-sesgo * ganancia).astype(np.float32)
+
+    @classmethod
+    def desde_archivo(cls, ruta, nombres, rango_acc=RANGO_ACC, rango_gyr=RANGO_GYR):
+        """ Crea la conversion con la calibracion guardada en un JSON """
+        with open(ruta) as archivo:
+            calibracion = json.load(archivo)
+        return cls(nombres, rango_acc, rango_gyr, calibracion.get("sesgo"), calibracion.get("ganancia"))
+
+    def convertir(self, cuentas, out=None):
+        """ Convierte un arreglo de filas x canales de cuentas a float32 en
+        unidades fisicas (en out si se entrega, que puede ser el mismo arreglo
+        si ya es float32) """
+        out = np.multiply(cuentas, self.factor, out=out, dtype=np.float32)
+        out += self.desplazamiento
+        return out
+
+    def convertir_frame(self, frame):
+        """ Un frame TIPO_MUESTRAS_I16 como si la ESP32 lo hubiera enviado en float32 """
+        if frame.tipo != TIPO_MUESTRAS_I16:
+            return frame
+        return frame._replace(tipo=TIPO_MUESTRAS_F32, datos=self.convertir(frame.datos))
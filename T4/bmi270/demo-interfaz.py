@@ -8,6 +8,7 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QMainWindow, QApplication, QLabel, QLineEdit, QVBoxLayout, QWidget, QPushButton, QHBoxLayout, QGridLayout, QTableView
 import random
+import numpy as np
 
 
 # Se configura el puerto y el BAUD_Rate
@@ -172,56 +173,29 @@ def graficarXYZ(listax, listay, listaz, variable, title, filename):
     plt.savefig(filename)
 
 def mostrar_datos(datos):
-    acc_x = datos["ventana_ax"]
-    acc_y = datos["ventana_ay"]
-    acc_z = datos["ventana_az"]
-    gyr_x = datos["ventana_gx"]
-    gyr_y = datos["ventana_gy"]
-    gyr_z = datos["ventana_gz"]
-
-    axRMS = datos["axRMS"]
-    ayRMS = datos["ayRMS"]
-    azRMS = datos["azRMS"]
-    gxRMS = datos["gxRMS"]
-    gyRMS = datos["gyRMS"]
-    gzRMS = datos["gzRMS"]
-
-    peaks_ax = datos["peaks_ax"]
-    peaks_ay = datos["peaks_ay"]
-    peaks_az = datos["peaks_az"]
-    peaks_gx = datos["peaks_gx"]
-    peaks_gy = datos["peaks_gy"]
-    peaks_gz = datos["peaks_gz"]
-
-    FFT_ax = datos["FFT_ax"]
-    FFT_ay = datos["FFT_ay"]
-    FFT_az = datos["FFT_az"]
-    FFT_gx = datos["FFT_gx"]
-    FFT_gy = datos["FFT_gy"]
-    FFT_gz = datos["FFT_gz"]
-
-    graficarXYZ(acc_x, acc_y, acc_z, "Aceleración", "Aceleración en los ejes x, y, z", "acc.png")
-
-    graficarXYZ(gyr_x, gyr_y, gyr_z, "Giroscopio", "Giroscopio en los ejes x, y, z", "gyr.png")
-
-    print("Tamaño de la ventana: ", len(acc_x), "\n")
-    print(f"La transformada de fourier para la aceleración en el eje x fue: \n{FFT_ax}\n")
-    print(f"La transformada de fourier para la aceleración en el eje y fue: \n{FFT_ay}\n")
-    print(f"La transformada de fourier para la aceleración en el eje z fue: \n{FFT_az}\n")
-    print(f"La transformada de fourier para el giroscopio en el eje x fue: \n{FFT_gx}\n")
-    print(f"La transformada de fourier para el giroscopio en el eje y fue: \n{FFT_gy}\n")
-    print(f"La transformada de fourier para el giroscopio en el eje z fue: \n{FFT_gz}\n")
-
-    print(peaks_ax[0])
-    table_data = [
-            [     "", "RMS", "Peak 1", "Peak 2", "Peak 3", "Peak 4", "Peak 5"],
-            ["acc_x", axRMS, peaks_ax[0], peaks_ax[1], peaks_ax[2], peaks_ax[3], peaks_ax[4]],
-            ["acc_y", ayRMS, peaks_ay[0], peaks_ay[1], peaks_ay[2], peaks_ay[3], peaks_ay[4]],
-            ["acc_z", azRMS, peaks_az[0], peaks_az[1], peaks_az[2], peaks_az[3], peaks_az[4]],
-            ["gyr_x", gxRMS, peaks_gx[0], peaks_gx[1], peaks_gx[2], peaks_gx[3], peaks_gx[4]],
-            ["gyr_y", gyRMS, peaks_gy[0], peaks_gy[1], peaks_gy[2], peaks_gy[3], peaks_gy[4]],
-            ["gyr_z", gzRMS, peaks_gz[0], peaks_gz[1], peaks_gz[2], peaks_gz[3], peaks_gz[4]],
-            ]
+    # Las llaves de cada eje en datos ("ventana_ax", "axRMS", ...); las filas de la tabla salen de este orden
+    ejes = {"acc_x": "ax", "acc_y": "ay", "acc_z": "az", "gyr_x": "gx", "gyr_y": "gy", "gyr_z": "gz"}
+    ventanas = np.array([datos[f"ventana_{eje}"] for eje in ejes.values()])
+    rms = [datos[f"{eje}RMS"] for eje in ejes.values()]
+    peaks = np.array([datos[f"peaks_{eje}"][:5] for eje in ejes.values()])
+
+    graficarXYZ(*ventanas[0:3], "Aceleración", "Aceleración en los ejes x, y, z", "acc.png")
+
+    graficarXYZ(*ventanas[3:6], "Giroscopio", "Giroscopio en los ejes x, y, z", "gyr.png")
+
+    print("Tamaño de la ventana: ", ventanas.shape[1], "\n")
+    for nombre, eje in ejes.items():
+        sensor = "la aceleración" if nombre.startswith("acc") else "el giroscopio"
+        print(f"La transformada de fourier para {sensor} en el eje {nombre[-1]} fue: \n{datos['FFT_' + eje]}\n")
+
+    # Resumen de la FFT: el valor de mayor magnitud de cada eje y su indice
+    fft = np.abs(np.array([datos[f"FFT_{eje}"] for eje in ejes.values()], dtype=np.complex128))
+    mayores = fft.argmax(axis=1)
+    for i, nombre in enumerate(ejes):
+        print(f"FFT de {nombre}: mayor magnitud {fft[i, mayores[i]]:g} en el indice {mayores[i]}")
+
+    table_data = [["", "RMS"] + [f"Peak {i + 1}" for i in range(peaks.shape[1])]]
+    table_data += [[nombre, rms[i]] + peaks[i].tolist() for i, nombre in enumerate(ejes)]
     return table_data
 
 def solicitar_ventana():
@@ -0,0 +1,81 @@
+""" Grafico embebido en la interfaz de Qt que se actualiza en vivo.
+
+Antes cada ventana pasaba por plt.savefig('acc.png') y QPixmap('acc.png'):
+rasterizar, codificar el PNG, escribirlo a disco y volver a leerlo. Aca el
+grafico es un FigureCanvasQTAgg dentro de la ventana: las muestras se
+agregan a un arreglo con agregar_muestras() y solo se cambian los datos de
+las lineas (set_data). El redibujo lo hace un QTimer a lo mas FPS veces por
+segundo y solo si llegaron datos nuevos, y con ventanas grandes cada linea se
+reduce a MAX_PUNTOS puntos con decimacion.min_max (minimo y maximo por
+tramo, asi no se pierden los peaks).
+"""
+import numpy as np
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from PyQt5.QtCore import QTimer
+
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.decimacion import min_max, estilo_marcador, MAX_PUNTOS
+
+FPS = 30  # Maximo de redibujos por segundo
+COLORES = ('b', 'r', 'g', 'c', 'm', 'y')
+
+
+class GraficoVivo(FigureCanvasQTAgg):
+    """ Grafico de una o mas senales que se redibuja a lo mas FPS veces por segundo """
+
+    def __init__(self, titulo, variable, etiquetas, periodo=1.0, fps=FPS, max_puntos=MAX_PUNTOS, parent=None):
+        figura = Figure(figsize=(5, 4), layout='constrained')
+        super().__init__(figura)
+        self.setParent(parent)
+        self.setMinimumSize(400, 300)
+        self.periodo = periodo  # Segundos entre muestras, para el eje x
+        self.max_puntos = max_puntos
+        self.ejes = figura.add_subplot()
+        self.ejes.set_title(titulo)
+        self.ejes.set_xlabel('Tiempo (s)')
+        self.ejes.set_ylabel(variable)
+        self.lineas = [self.ejes.plot([], [], marker='o', linestyle='-', color=color, label=etiqueta)[0]
+                       for etiqueta, color in zip(etiquetas, COLORES)]
+        self.ejes.legend()
+        self._datos = np.empty((len(etiquetas), 1024), dtype=np.float32)
+        self._n = 0
+        self._pendiente = False
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._refrescar)
+        self._timer.start(int(1000 / fps))
+
+    def limpiar(self):
+        self._n = 0
+        self._pendiente = True
+
+    def agregar_muestras(self, bloque):
+        """ Agrega un bloque de canales x m muestras; no dibuja nada """
+        bloque = np.asarray(bloque)
+        m = bloque.shape[1]
+        if self._n + m > self._datos.shape[1]:
+            # Se duplica la capacidad para que agregar cueste O(1) amortizado
+            capacidad = max(2 * self._datos.shape[1], self._n + m)
+            datos = np.empty((self._datos.shape[0], capacidad), dtype=np.float32)
+            datos[:, :self._n] = self._datos[:, :self._n]
+            self._datos = datos
+        self._datos[:, self._n:self._n + m] = bloque
+        self._n += m
+        self._pendiente = True
+
+    def mostrar(self, crudo):
+        """ Reemplaza lo graficado por una ventana completa (canales x n) """
+        self.limpiar()
+        self.agregar_muestras(crudo)
+
+    def _refrescar(self):
+        if not self._pendiente:
+            return
+        self._pendiente = False
+        x = np.arange(self._n) * self.periodo
+        for linea, y in zip(self.lineas, self._datos[:, :self._n]):
+            linea.set_data(*min_max(x, y, self.max_puntos))
+            linea.set_marker(estilo_marcador(min(self._n, self.max_puntos)))
+        self.ejes.relim()
+        self.ejes.autoscale_view()
+        self.draw_idle()
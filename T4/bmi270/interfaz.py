@@ -0,0 +1,320 @@
+""" Interfaz grafica (PyQt5) de la tarea 4.
+
+Se importa solo cuando se abre la ventana (receiver.py sin --ventanas), asi
+el modo por consola y las herramientas que importan receiver.py no cargan
+PyQt5 ni matplotlib. Las clases reciben el modulo receiver (receptor) y
+llaman a sus funciones: solicitar_ventana, cambiar_ventana, ...
+"""
+import os
+import sys
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtWidgets import QMainWindow, QApplication, QLabel, QLineEdit, QVBoxLayout, QWidget, QPushButton, QHBoxLayout, QTableView
+
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.almacenamiento import Almacen
+from comun.deteccion import mensaje
+from comun.lector import ErrorLector
+from grafico_vivo import GraficoVivo
+from tablas import TablaVentana, HistorialVentanas
+
+
+class HiloAdquisicion(QThread):
+    """ Pide una ventana fuera del hilo de la interfaz y avisa con senales """
+    muestras = pyqtSignal(object)  # Bloque de muestras x canales recien llegado
+    progreso = pyqtSignal(int)  # Muestras recibidas hasta ahora
+    alertas = pyqtSignal(object)  # Lista de deteccion.Alerta del bloque recien llegado
+    orientacion = pyqtSignal(object)  # Roll, pitch y yaw (grados) tras el bloque recien llegado
+    ventana_lista = pyqtSignal(object)  # La Ventana completa
+    fallo = pyqtSignal(str)
+    cancelada = pyqtSignal()
+
+    def __init__(self, receptor, parent=None):
+        super().__init__(parent)
+        self.receptor = receptor
+        self._cancelar = threading.Event()
+        self._recibidas = 0
+
+    def cancelar(self):
+        """ Pide terminar la lectura; la ventana en curso se descarta """
+        self._cancelar.set()
+
+    def _al_recibir(self, bloque):
+        self._recibidas += len(bloque)
+        self.muestras.emit(bloque)
+        self.progreso.emit(self._recibidas)
+        # El filtro solo se lee en este hilo, que es el que lo actualiza; la interfaz recibe una copia
+        filtro = self.receptor.filtro
+        angulos = None if filtro is None else filtro.euler()
+        if angulos is not None:
+            self.orientacion.emit(tuple(float(angulo) for angulo in angulos))
+
+    def run(self):
+        try:
+            ventana = self.receptor.solicitar_ventana(self._al_recibir, self._cancelar.is_set, self.alertas.emit)
+        except self.receptor.AdquisicionCancelada:
+            self.cancelada.emit()
+        except (TimeoutError, ErrorLector, ValueError) as e:
+            self.fallo.emit(str(e))
+        else:
+            self.ventana_lista.emit(ventana)
+
+class HiloCierre(QThread):
+    """ Espera que termine la adquisicion en curso y cierra la conexion sin
+    bloquear la interfaz mientras llega CLOSED """
+
+    def __init__(self, receptor, adquisicion, parent=None):
+        super().__init__(parent)
+        self.receptor = receptor
+        self.adquisicion = adquisicion
+
+    def run(self):
+        if self.adquisicion is not None:
+            self.adquisicion.cancelar()
+            self.adquisicion.wait()
+        self.receptor.terminar_conexion()
+
+class MainWindow(QMainWindow):
+
+    def __init__(self, receptor):
+        super().__init__()
+        self.receptor = receptor
+        self.title = "Tarea 4 Sistemas Embedidos y Sensores"
+        self.setWindowTitle(self.title)
+        self.data = None
+        self.input = None
+        self.ventana = 0
+        self.hilo = None
+        self.hilo_cierre = None
+        # La DataWindow se crea una vez y se esconde cuando se muestra otra cosa
+        self.datos = None
+
+        self.button_vent = QPushButton("Cambiar Ventana")
+        self.button_vent.clicked.connect(self.request_cambio_ventana)
+
+        self.button_request = QPushButton("Solicitar ventana de datos")
+        self.button_request.clicked.connect(self.request_ventana)
+
+        self.button_cancelar = QPushButton("Cancelar lectura")
+        self.button_cancelar.clicked.connect(self.request_cancelar)
+        self.button_cancelar.setEnabled(False)
+
+        self.button_cierre = QPushButton("Cerrar la conexión")
+        self.button_cierre.clicked.connect(self.request_cierre)
+        self.button_cierre.setStyleSheet("background-color : #d4817b")
+
+        self.base_layout = QHBoxLayout()
+        self.base_layout.addWidget(self.button_request)
+        self.base_layout.addWidget(self.button_vent)
+        self.base_layout.addWidget(self.button_cancelar)
+        self.base_layout.addWidget(self.button_cierre)
+
+        self.main_layout = QVBoxLayout()
+        self.main_layout.addLayout(self.base_layout)
+        self.container = QWidget()
+        self.container.setLayout(self.main_layout)
+
+        self.setCentralWidget(self.container)
+
+    def reemplazar_data(self, new_data):
+        if self.data is not None and self.data is not self.datos:
+            self.main_layout.removeWidget(self.data)
+            self.data.deleteLater()
+        if self.datos is not None:
+            self.datos.setVisible(new_data is self.datos)
+        if new_data is not self.datos:
+            self.main_layout.addWidget(new_data)
+        self.data = new_data
+
+    def inicio_app(self):
+        info_ventana = QLabel(f"La ventana de datos es de {self.ventana}")
+        self.reemplazar_data(info_ventana)
+        
+    def request_cambio_ventana(self):
+        self.reemplazar_data(InputWindow(self))
+        
+
+    def cambio_ventana(self):
+        if self.input.text().isnumeric():
+            self.receptor.cambiar_ventana(self.input.text())
+            self.ventana = int(self.input.text())
+            self.inicio_app()
+        else:
+            print("no es un número")
+
+    def request_ventana(self):
+        if self.hilo is not None and self.hilo.isRunning():
+            return
+        if self.datos is None:
+            self.datos = DataWindow(self.receptor)
+            self.main_layout.addWidget(self.datos)
+        self.reemplazar_data(self.datos)
+        self.datos.iniciar()
+
+        # La ventana se recibe en otro hilo y self.datos se va llenando con las senales
+        self.hilo = HiloAdquisicion(self.receptor, self)
+        self.hilo.muestras.connect(self.datos.agregar_muestras)
+        self.hilo.progreso.connect(self.datos.mostrar_progreso)
+        self.hilo.alertas.connect(self.datos.mostrar_alertas)
+        self.hilo.orientacion.connect(self.datos.mostrar_orientacion)
+        self.hilo.ventana_lista.connect(self.datos.mostrar_ventana)
+        self.hilo.fallo.connect(self.datos.mostrar_error)
+        self.hilo.cancelada.connect(self.datos.mostrar_cancelada)
+        self.hilo.finished.connect(self.fin_adquisicion)
+        self.adquiriendo(True)
+        self.hilo.start()
+
+    def request_cancelar(self):
+        if self.hilo is not None:
+            self.hilo.cancelar()
+            self.button_cancelar.setEnabled(False)
+
+    def adquiriendo(self, activo):
+        # El puerto lo usa el hilo de adquisicion: no se puede pedir otra ventana ni cambiar su tamano
+        self.button_request.setEnabled(not activo)
+        self.button_vent.setEnabled(not activo)
+        self.button_cancelar.setEnabled(activo)
+
+    def fin_adquisicion(self):
+        self.adquiriendo(False)
+
+    def request_cierre(self):
+        if self.hilo_cierre is not None:
+            return
+        self.container.setEnabled(False)
+        self.button_cierre.setText("Cerrando la conexión...")
+        self.hilo_cierre = HiloCierre(self.receptor, self.hilo, self)
+        self.hilo_cierre.finished.connect(self.cerrar)
+        self.hilo_cierre.start()
+
+    def cerrar(self):
+        self.close()
+        QApplication.quit()
+
+    def closeEvent(self, event):
+        # Un QThread no se puede destruir mientras corre
+        if self.hilo is not None and self.hilo.isRunning():
+            self.hilo.cancelar()
+            self.hilo.wait()
+        super().closeEvent(event)
+    
+class DataWindow(QWidget):
+    def __init__(self, receptor):
+        super().__init__()
+        self.receptor = receptor
+        periodo = receptor.TIME
+        self.estado = QLabel("Recibiendo datos...")
+        # Las alertas de deteccion.py aparecen apenas llega la muestra que las provoca
+        self.alertas = QLabel()
+        self.alertas.setStyleSheet("color: red")
+        self.alertas.setVisible(False)
+        self.n_alertas = 0
+        # Roll, pitch y yaw del filtro de orientacion.py, con la ultima muestra que llego
+        self.orientacion = QLabel()
+        self.orientacion.setVisible(receptor.filtro is not None)
+
+        # Graficos dentro de la ventana, sin pasar por archivos PNG (ver grafico_vivo.py)
+        self.grafico_acc = GraficoVivo("Aceleración en los ejes x, y, z", "Aceleración", ["X", "Y", "Z"], periodo)
+        self.grafico_gyr = GraficoVivo("Giroscopio en los ejes x, y, z", "Giroscopio", ["X", "Y", "Z"], periodo)
+
+        # Los modelos se crean una sola vez: cada ventana solo cambia sus valores (ver tablas.py)
+        self.tabla = TablaVentana(receptor.CANALES, periodo=periodo)
+        self.table = QTableView()
+        self.table.setMinimumSize(730,250)
+        self.table.setModel(self.tabla)
+
+        self.historial = HistorialVentanas(receptor.CANALES)
+        carpeta = receptor.CARPETA_DATOS
+        if carpeta is not None and os.path.exists(os.path.join(carpeta, "esquema.json")):
+            # Las ventanas de sesiones anteriores; la vista las va pidiendo al bajar
+            self.historial.cargar_almacen(Almacen(carpeta))
+        self.tabla_historial = QTableView()
+        self.tabla_historial.setSelectionBehavior(QTableView.SelectRows)
+        self.tabla_historial.setSelectionMode(QTableView.SingleSelection)
+        self.tabla_historial.setModel(self.historial)
+        self.tabla_historial.selectionModel().currentRowChanged.connect(self.mostrar_historial)
+
+        fotos = QHBoxLayout()
+        fotos.addWidget(self.table)
+        fotos.addWidget(self.grafico_acc)
+        fotos.addWidget(self.grafico_gyr)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.estado)
+        layout.addWidget(self.alertas)
+        layout.addWidget(self.orientacion)
+        layout.addLayout(fotos)
+        layout.addWidget(QLabel("Ventanas recibidas (seleccione una para ver su RMS y peaks):"))
+        layout.addWidget(self.tabla_historial)
+        self.setLayout(layout)
+
+    def iniciar(self):
+        """ Deja los graficos vacios para una nueva ventana """
+        self.estado.setText("Recibiendo datos...")
+        self.grafico_acc.limpiar()
+        self.grafico_gyr.limpiar()
+
+    def agregar_muestras(self, bloque):
+        """ Grafica las muestras (filas x 6) apenas llegan """
+        self.grafico_acc.agregar_muestras(bloque[:, 0:3].T)
+        self.grafico_gyr.agregar_muestras(bloque[:, 3:6].T)
+
+    def mostrar_orientacion(self, angulos):
+        """ Muestra la orientacion estimada hasta la ultima muestra """
+        roll, pitch, yaw = angulos
+        self.orientacion.setText(f"Orientación: roll {roll:.1f}°, pitch {pitch:.1f}°, yaw {yaw:.1f}°")
+
+    def mostrar_alertas(self, alertas):
+        """ Muestra la ultima alerta y cuantas van """
+        self.n_alertas += len(alertas)
+        self.alertas.setText(f"{mensaje(alertas[-1])} ({self.n_alertas} alertas)")
+        self.alertas.setVisible(True)
+
+    def mostrar_progreso(self, recibidas):
+        self.estado.setText(f"Recibiendo datos... {recibidas} muestras")
+
+    def mostrar_ventana(self, data):
+        self.receptor.mostrar_datos(data)
+        self.grafico_acc.mostrar(data.crudo[0:3])
+        self.grafico_gyr.mostrar(data.crudo[3:6])
+
+        self.tabla.mostrar_ventana(data)
+        self.table.resizeColumnsToContents()
+        self.historial.agregar(data)
+        self.estado.setText(f"Ventana de {len(data)} muestras")
+
+    def mostrar_historial(self, actual, anterior):
+        if actual.isValid():
+            self.tabla.mostrar(*self.historial.resumen(actual.row()))
+            self.estado.setText(f"RMS y peaks de la ventana {actual.row() + 1} del historial")
+
+    def mostrar_error(self, error):
+        self.estado.setText(f"No se pudo recibir la ventana: {error}")
+
+    def mostrar_cancelada(self):
+        self.estado.setText("Lectura cancelada")
+
+class InputWindow(QWidget):
+    def __init__(self, window: MainWindow):
+        super().__init__()
+        new_layout = QHBoxLayout()
+        label = QLabel("Ingrese la nueva ventana de datos:")
+        window.input = QLineEdit()
+        button_cambio_vent = QPushButton("Cambiar Ventana")
+        button_cambio_vent.clicked.connect(window.cambio_ventana)
+        button_cambio_vent.setStyleSheet("background-color : #84e091")
+
+        new_layout.addWidget(label)
+        new_layout.addWidget(window.input)
+        new_layout.addWidget(button_cambio_vent)
+        
+        self.setLayout(new_layout)
+
+
+def ejecutar(receptor):
+    """ Abre la ventana principal y retorna cuando se cierra """
+    app = QApplication.instance() or QApplication(sys.argv)
+    w = MainWindow(receptor)
+    w.show()
+    return app.exec_()
@@ -12,6 +12,7 @@
 #include "driver/i2c_master.h"
 #include "driver/uart.h"
 #include "esp_log.h"
+#include "esp_rom_crc.h"
 #include "freertos/FreeRTOS.h"
 #include "freertos/task.h"
 #include "esp_system.h"
@@ -34,9 +35,28 @@
 #define Fodr 800
 #define UART_NUM UART_NUM_0  // UART port number
 
+// Frames binarios (ver protocolo.py en el computador)
+#define FRAME_MUESTRAS_F32 1
+#define FRAME_MUESTRAS_I16 2
+#define FRAME_RMS 3
+#define FRAME_FFT 4
+#define FRAME_PEAKS 5
+#define FRAME_FIN 6
+#define FRAME_PRUEBA 7  // Patron de prueba al cambiar los baudios
+#define LARGO_PATRON 4096
+#define PLAZO_BAUDIOS_MS 2000  // Sin CONFI en este plazo se vuelve a la velocidad anterior
+#define FILAS_POR_FRAME 64
+#define INTENTOS_DRDY 1000  // Lecturas del registro de estado antes de seguir sin el dato nuevo
+#define FILAS_CONTINUO 16  // Muestras por bloque en el modo continuo (STRM)
+
 esp_err_t ret = ESP_OK;
 esp_err_t ret2 = ESP_OK;
 
+int modo_binario = 0;  // 0: texto con sprintf (placas antiguas), 1: frames binarios
+uint16_t secuencia_frame = 0;
+int solo_crudo = 0;  // 1: no se calcula RMS, FFT ni peaks, solo se envian las muestras
+int enviar_cuentas = 0;  // 1: en modo binario las muestras van como cuentas int16 sin convertir (conversion.py)
+
 //_CRTIMP __cdecl __MINGW_NOTHROW  int atoi (const char *);
 
 uint16_t val0[6];
@@ -746,6 +766,38 @@ float calc_RMS(float *arr, int ventana){
     return raiz;
 }
 
+// Envia un frame: sync, tipo, canales, secuencia, largo, payload y crc32 (little-endian)
+void enviar_frame(uint8_t tipo, uint8_t canales, const void *payload, uint16_t largo) {
+    uint8_t cabecera[8] = {0xA5, 0x5A, tipo, canales,
+                           secuencia_frame & 0xFF, secuencia_frame >> 8,
+                           largo & 0xFF, largo >> 8};
+    uint32_t crc = esp_rom_crc32_le(0, cabecera + 2, 6);
+    crc = esp_rom_crc32_le(crc, (const uint8_t *)payload, largo);
+
+    uart_write_bytes(UART_NUM, (const char *)cabecera, 8);
+    if (largo > 0) {
+        uart_write_bytes(UART_NUM, (const char *)payload, largo);
+    }
+    uart_write_bytes(UART_NUM, (const char *)&crc, 4);
+    secuencia_frame++;
+}
+
+// Envia una matriz de floats de filas x ancho en frames de a lo mas FILAS_POR_FRAME filas
+void enviar_frames_float(uint8_t tipo, uint8_t canales, int ancho, const float *datos, int filas) {
+    for (int i = 0; i < filas; i += FILAS_POR_FRAME) {
+        int n = (filas - i < FILAS_POR_FRAME) ? filas - i : FILAS_POR_FRAME;
+        enviar_frame(tipo, canales, datos + i * ancho, n * ancho * sizeof(float));
+    }
+}
+
+// Igual que enviar_frames_float, para las cuentas int16 del sensor
+void enviar_frames_int16(uint8_t tipo, uint8_t canales, int ancho, const int16_t *datos, int filas) {
+    for (int i = 0; i < filas; i += FILAS_POR_FRAME) {
+        int n = (filas - i < FILAS_POR_FRAME) ? filas - i : FILAS_POR_FRAME;
+        enviar_frame(tipo, canales, datos + i * ancho, n * ancho * sizeof(int16_t));
+    }
+}
+
 // reinicia la ESP y termina la conexión
 void restart_ESP(){
     // Reiniciar la ESP y terminar conexión
@@ -838,6 +890,27 @@ void lectura(int window, int time) {
     float data_gyr_y[window];
     float data_gyr_x[window];
 
+    // Muestras convertidas para el modo binario. Van en el heap y solo en ese modo: la tarea principal
+    // tiene CONFIG_ESP_MAIN_TASK_STACK_SIZE (10000 bytes) de stack y con unos cientos de muestras no cabrian
+    float (*muestras)[6] = NULL;
+    if (modo_binario) {
+        muestras = malloc(window * sizeof(*muestras));
+        if (muestras == NULL) {
+            printf("Sin memoria para una ventana de %d muestras\n", window);
+            return;
+        }
+    }
+    // Muestras sin convertir, si el computador pidio CUENT (tambien en el heap)
+    int16_t (*cuentas)[6] = NULL;
+    if (modo_binario && enviar_cuentas) {
+        cuentas = malloc(window * sizeof(*cuentas));
+        if (cuentas == NULL) {
+            printf("Sin memoria para una ventana de %d muestras\n", window);
+            free(muestras);
+            return;
+        }
+    }
+
     float rms_acc_x = 0;
     float rms_acc_y = 0;
     float rms_acc_z = 0;
@@ -845,84 +918,131 @@ void lectura(int window, int time) {
     float rms_gyr_y = 0;
     float rms_gyr_z = 0;
     for (int i = 0; i < window; i++){
-        bmi_read(&reg_intstatus, &tmp, 1);
-        if ((tmp & 0b10000000) == 0x80) {
-            //Leyendo datos de acelerómetro
-            ret = bmi_read(&addr_acc_x_msb, &tmp, 1);
-            acc_x = tmp;
-            acc_z = tmp;
-            acc_y = tmp;
-            ret = bmi_read(&addr_acc_x_lsb, &tmp, 1);
-            acc_x = (acc_z << 8) | tmp;
-            data_acc_x[i] = acc_x;
-            ret = bmi_read(&addr_acc_y_msb, &tmp, 1);
-            ret = bmi_read(&addr_acc_y_lsb, &tmp, 1);
-            acc_y = (acc_z << 8) | tmp;
-            data_acc_y[i] = acc_y;
-            ret = bmi_read(&addr_acc_z_msb, &tmp, 1);
-            ret = bmi_read(&addr_acc_z_lsb, &tmp, 1);
-            acc_z = (acc_z << 8) | tmp;
-            data_acc_z[i] = acc_z; 
-
-            // Leyendo datos de giroscopio
-            ret = bmi_read(&addr_gyr_x_msb, &tmp, 1);
-            gyr_x = tmp;
-            ret = bmi_read(&addr_gyr_x_lsb, &tmp, 1);
-            gyr_x = (acc_z << 8) | tmp;
-            data_gyr_x[i] = gyr_x;
-            ret = bmi_read(&addr_gyr_y_msb, &tmp, 1);
-            gyr_y = tmp;
-            ret = bmi_read(&addr_gyr_y_lsb, &tmp, 1);
-            gyr_y = (acc_z << 8) | tmp;
-            data_gyr_y[i] = gyr_y;
-            ret = bmi_read(&addr_gyr_z_msb, &tmp, 1);
-            gyr_z = tmp;
-            ret = bmi_read(&addr_gyr_z_lsb, &tmp, 1);
-            gyr_z = (acc_z << 8) | tmp;
-            data_gyr_z[i] = gyr_z;
-
-            //Calculamos el RMS de los datos
-            //printf("Calculando RMS de los datos\n");
-            rms_acc_x += (acc_x * acc_x) / window;
-            rms_acc_y += (acc_y * acc_y) / window;
-            rms_acc_z += (acc_z * acc_z) / window;
-            rms_gyr_x += (gyr_x * gyr_x) / window;
-            rms_gyr_y += (gyr_y * gyr_y) / window;
-            rms_gyr_z += (gyr_z * gyr_z) / window;
+        // Se espera el dato nuevo (DRDY) para que cada fila de la ventana tenga una muestra leida:
+        // en los frames binarios una fila sin leer llegaria como basura con un CRC valido.
+        // Si el bit no llega despues de INTENTOS_DRDY lecturas se lee igual (queda la muestra anterior)
+        int intentos = 0;
+        do {
+            bmi_read(&reg_intstatus, &tmp, 1);
+        } while ((tmp & 0b10000000) != 0x80 && ++intentos < INTENTOS_DRDY);
+        if ((tmp & 0b10000000) != 0x80) {
+            printf("DRDY no llego en la muestra %d, se repite la anterior\n", i);
+        }
+        //Leyendo datos de acelerómetro
+        ret = bmi_read(&addr_acc_x_msb, &tmp, 1);
+        acc_x = tmp;
+        acc_z = tmp;
+        acc_y = tmp;
+        ret = bmi_read(&addr_acc_x_lsb, &tmp, 1);
+        acc_x = (acc_z << 8) | tmp;
+        data_acc_x[i] = acc_x;
+        ret = bmi_read(&addr_acc_y_msb, &tmp, 1);
+        ret = bmi_read(&addr_acc_y_lsb, &tmp, 1);
+        acc_y = (acc_z << 8) | tmp;
+        data_acc_y[i] = acc_y;
+        ret = bmi_read(&addr_acc_z_msb, &tmp, 1);
+        ret = bmi_read(&addr_acc_z_lsb, &tmp, 1);
+        acc_z = (acc_z << 8) | tmp;
+        data_acc_z[i] = acc_z; 
+
+        // Leyendo datos de giroscopio
+        ret = bmi_read(&addr_gyr_x_msb, &tmp, 1);
+        gyr_x = tmp;
+        ret = bmi_read(&addr_gyr_x_lsb, &tmp, 1);
+        gyr_x = (acc_z << 8) | tmp;
+        data_gyr_x[i] = gyr_x;
+        ret = bmi_read(&addr_gyr_y_msb, &tmp, 1);
+        gyr_y = tmp;
+        ret = bmi_read(&addr_gyr_y_lsb, &tmp, 1);
+        gyr_y = (acc_z << 8) | tmp;
+        data_gyr_y[i] = gyr_y;
+        ret = bmi_read(&addr_gyr_z_msb, &tmp, 1);
+        gyr_z = tmp;
+        ret = bmi_read(&addr_gyr_z_lsb, &tmp, 1);
+        gyr_z = (acc_z << 8) | tmp;
+        data_gyr_z[i] = gyr_z;
+
+        //Calculamos el RMS de los datos
+        //printf("Calculando RMS de los datos\n");
+        rms_acc_x += (acc_x * acc_x) / window;
+        rms_acc_y += (acc_y * acc_y) / window;
+        rms_acc_z += (acc_z * acc_z) / window;
+        rms_gyr_x += (gyr_x * gyr_x) / window;
+        rms_gyr_y += (gyr_y * gyr_y) / window;
+        rms_gyr_z += (gyr_z * gyr_z) / window;
     
-            printf("acc_z: %f g\n", (int16_t)acc_z * (8.000 / 32768));
-
-            char send_acc_x[20];
-            char send_acc_y[20];
-            char send_acc_z[20];
-            sprintf(send_acc_x, "%f", (int16_t)acc_x * (8.000 / 32768));
-            sprintf(send_acc_y, "%f", (int16_t)acc_y * (8.000 / 32768));
-            sprintf(send_acc_z, "%f", (int16_t)acc_z * (8.000 / 32768));
-            uart_write_bytes(UART_NUM, send_acc_x, strlen(send_acc_x));
-            uart_write_bytes(UART_NUM, " ", 1);
-            uart_write_bytes(UART_NUM, send_acc_y, strlen(send_acc_y));
-            uart_write_bytes(UART_NUM, " ", 1);
-            uart_write_bytes(UART_NUM, send_acc_z, strlen(send_acc_z));
-            uart_write_bytes(UART_NUM, " ", 1);
-
-            char send_gyr_x[20];
-            char send_gyr_y[20];
-            char send_gyr_z[20];
-            sprintf(send_gyr_x, "%f", (int16_t)gyr_x * (2000.000 / 32768));
-            sprintf(send_gyr_y, "%f", (int16_t)gyr_y * (2000.000 / 32768));
-            sprintf(send_gyr_z, "%f", (int16_t)gyr_z * (2000.000 / 32768));
-            uart_write_bytes(UART_NUM, send_gyr_z, strlen(send_gyr_z));
-            uart_write_bytes(UART_NUM, " ", 1);
-            uart_write_bytes(UART_NUM, send_gyr_y, strlen(send_gyr_y));
-            uart_write_bytes(UART_NUM, " ", 1);
-            uart_write_bytes(UART_NUM, send_gyr_x, strlen(send_gyr_x));
-            uart_write_bytes(UART_NUM, " ", 1);
+        if (modo_binario && enviar_cuentas) {
+            // El computador convierte las cuentas: nada de floats ni printf por muestra
+            cuentas[i][0] = (int16_t)acc_x;
+            cuentas[i][1] = (int16_t)acc_y;
+            cuentas[i][2] = (int16_t)acc_z;
+            cuentas[i][3] = (int16_t)gyr_x;
+            cuentas[i][4] = (int16_t)gyr_y;
+            cuentas[i][5] = (int16_t)gyr_z;
+            if (ret != ESP_OK) {
+                printf("Error lectura: %s \n", esp_err_to_name(ret));
+            }
+            continue;
+        }
 
+
+        if (modo_binario) {
+            muestras[i][0] = (int16_t)acc_x * (8.000 / 32768);
+            muestras[i][1] = (int16_t)acc_y * (8.000 / 32768);
+            muestras[i][2] = (int16_t)acc_z * (8.000 / 32768);
+            muestras[i][3] = (int16_t)gyr_x * (2000.000 / 32768);
+            muestras[i][4] = (int16_t)gyr_y * (2000.000 / 32768);
+            muestras[i][5] = (int16_t)gyr_z * (2000.000 / 32768);
             if (ret != ESP_OK) {
                 printf("Error lectura: %s \n", esp_err_to_name(ret));
             }
+            continue;
+        }
+
+        char send_acc_x[20];
+        char send_acc_y[20];
+        char send_acc_z[20];
+        sprintf(send_acc_x, "%f", (int16_t)acc_x * (8.000 / 32768));
+        sprintf(send_acc_y, "%f", (int16_t)acc_y * (8.000 / 32768));
+        sprintf(send_acc_z, "%f", (int16_t)acc_z * (8.000 / 32768));
+        uart_write_bytes(UART_NUM, send_acc_x, strlen(send_acc_x));
+        uart_write_bytes(UART_NUM, " ", 1);
+        uart_write_bytes(UART_NUM, send_acc_y, strlen(send_acc_y));
+        uart_write_bytes(UART_NUM, " ", 1);
+        uart_write_bytes(UART_NUM, send_acc_z, strlen(send_acc_z));
+        uart_write_bytes(UART_NUM, " ", 1);
+
+        char send_gyr_x[20];
+        char send_gyr_y[20];
+        char send_gyr_z[20];
+        sprintf(send_gyr_x, "%f", (int16_t)gyr_x * (2000.000 / 32768));
+        sprintf(send_gyr_y, "%f", (int16_t)gyr_y * (2000.000 / 32768));
+        sprintf(send_gyr_z, "%f", (int16_t)gyr_z * (2000.000 / 32768));
+        uart_write_bytes(UART_NUM, send_gyr_x, strlen(send_gyr_x));
+        uart_write_bytes(UART_NUM, " ", 1);
+        uart_write_bytes(UART_NUM, send_gyr_y, strlen(send_gyr_y));
+        uart_write_bytes(UART_NUM, " ", 1);
+        uart_write_bytes(UART_NUM, send_gyr_z, strlen(send_gyr_z));
+        uart_write_bytes(UART_NUM, " ", 1);
+        uart_write_bytes(UART_NUM, "\n", 1);
+
+        if (ret != ESP_OK) {
+            printf("Error lectura: %s \n", esp_err_to_name(ret));
         }
     }
+    if (solo_crudo) {
+        // RMS, FFT y peaks se calculan en el computador (analisis.py)
+        if (modo_binario) {
+            if (enviar_cuentas) {
+                enviar_frames_int16(FRAME_MUESTRAS_I16, 6, 6, &cuentas[0][0], window);
+            } else {
+                enviar_frames_float(FRAME_MUESTRAS_F32, 6, 6, &muestras[0][0], window);
+            }
+        }
+        free(muestras);
+        free(cuentas);
+        return;
+    }
     // Calculamos el RMS de los datos
     printf("Calculando RMS de los datos\n");
     float final_rms_acc_x = sqrt(rms_acc_x);
@@ -956,6 +1076,48 @@ void lectura(int window, int time) {
     qsort(data_gyr_y, window, sizeof(float), comparar);
     qsort(data_gyr_z, window, sizeof(float), comparar);
 
+    if (modo_binario) {
+        // Mismo contenido que el modo texto, pero en frames de floats sin formatear
+        float rms[6] = {final_rms_acc_x, final_rms_acc_y, final_rms_acc_z,
+                        final_rms_gyr_x, final_rms_gyr_y, final_rms_gyr_z};
+        float (*fft)[12] = malloc(window * sizeof(*fft));
+        if (fft == NULL) {
+            printf("Sin memoria para la FFT de %d muestras\n", window);
+            free(muestras);
+            free(cuentas);
+            return;
+        }
+        float peaks[5][6];
+        for (int i = 0; i < window; i++) {
+            fft[i][0] = fft_acc_x_real[i]; fft[i][1] = fft_acc_x_imag[i];
+            fft[i][2] = fft_acc_y_real[i]; fft[i][3] = fft_acc_y_imag[i];
+            fft[i][4] = fft_acc_z_real[i]; fft[i][5] = fft_acc_z_imag[i];
+            fft[i][6] = fft_gyr_x_real[i]; fft[i][7] = fft_gyr_x_imag[i];
+            fft[i][8] = fft_gyr_y_real[i]; fft[i][9] = fft_gyr_y_imag[i];
+            fft[i][10] = fft_gyr_z_real[i]; fft[i][11] = fft_gyr_z_imag[i];
+        }
+        for (int i = 0; i < 5; i++) {
+            peaks[i][0] = data_acc_x[i];
+            peaks[i][1] = data_acc_y[i];
+            peaks[i][2] = data_acc_z[i];
+            peaks[i][3] = data_gyr_x[i];
+            peaks[i][4] = data_gyr_y[i];
+            peaks[i][5] = data_gyr_z[i];
+        }
+        if (enviar_cuentas) {
+            enviar_frames_int16(FRAME_MUESTRAS_I16, 6, 6, &cuentas[0][0], window);
+        } else {
+            enviar_frames_float(FRAME_MUESTRAS_F32, 6, 6, &muestras[0][0], window);
+        }
+        enviar_frame(FRAME_RMS, 6, rms, sizeof(rms));
+        enviar_frames_float(FRAME_FFT, 6, 12, &fft[0][0], window);
+        enviar_frame(FRAME_PEAKS, 6, peaks, sizeof(peaks));
+        free(fft);
+        free(muestras);
+        free(cuentas);
+        return;
+    }
+
     // Enviamos los datos de RMS
     printf("Enviando RMS de los datos\n");
     char send_acc_x_rms[20];
@@ -1104,6 +1266,53 @@ int serial_read(char *buffer, int size){
     return len;
 }
 
+// Velocidades que se pueden pedir con BAUD<i> (igual que VELOCIDADES en protocolo.py)
+static const int velocidades[] = {115200, 230400, 460800, 921600, 1500000, 2000000};
+#define N_VELOCIDADES (sizeof(velocidades) / sizeof(velocidades[0]))
+
+// Cambia la UART a velocidades[indice] como pide enlace.py: responde OK a la velocidad
+// actual, cambia y atiende PRUEB (envia el patron de prueba) y CONFI. Si CONFI no llega
+// en PLAZO_BAUDIOS_MS se vuelve a la velocidad anterior
+void cambiar_baudios(int indice) {
+    static uint8_t patron[LARGO_PATRON];
+    char comando[6];
+    uint32_t anterior;
+    int confirmado = 0;
+
+    if (indice < 0 || indice >= (int)N_VELOCIDADES) {
+        return;
+    }
+    for (int i = 0; i < LARGO_PATRON; i++) {
+        patron[i] = i & 0xFF;
+    }
+    uart_get_baudrate(UART_NUM, &anterior);
+    uart_write_bytes(UART_NUM, "OK\0", 3);
+    uart_wait_tx_done(UART_NUM, pdMS_TO_TICKS(100));
+    uart_set_baudrate(UART_NUM, velocidades[indice]);
+    uart_flush_input(UART_NUM);
+
+    TickType_t limite = xTaskGetTickCount() + pdMS_TO_TICKS(PLAZO_BAUDIOS_MS);
+    while (!confirmado && xTaskGetTickCount() < limite) {
+        memset(comando, 0, sizeof(comando));
+        int len = uart_read_bytes(UART_NUM, (uint8_t*)comando, 6, pdMS_TO_TICKS(100));
+        if (len <= 0) {
+            continue;
+        }
+        if (strcmp(comando, "PRUEB") == 0) {
+            enviar_frame(FRAME_PRUEBA, 1, patron, LARGO_PATRON);
+        }
+        else if (strcmp(comando, "CONFI") == 0) {
+            uart_write_bytes(UART_NUM, "OK\0", 3);
+            confirmado = 1;
+        }
+    }
+    if (!confirmado) {
+        uart_wait_tx_done(UART_NUM, pdMS_TO_TICKS(100));
+        uart_set_baudrate(UART_NUM, anterior);
+        uart_flush_input(UART_NUM);
+    }
+}
+
 void app_main(void) {
     ESP_ERROR_CHECK(bmi_init());
     softreset();
@@ -1129,7 +1338,11 @@ void app_main(void) {
                 // printf("Ventana obtenida: %d\n", ventana);
                 // uart_write_bytes(UART_NUM, (char *)ventana, 6);
                 lectura(ventana, 1000);
-                uart_write_bytes(UART_NUM, "FINISH\0", 7);
+                if (modo_binario) {
+                    enviar_frame(FRAME_FIN, 6, NULL, 0);
+                } else {
+                    uart_write_bytes(UART_NUM, "FINISH\0", 7);
+                }
                 //printf("Lectura finalizada\n\n");
             }
             else if (strcmp(dataResponse1, "END") == 0) {
@@ -1139,6 +1352,57 @@ void app_main(void) {
                 //printf("ESP reiniciada\n\n");
                 break;
             }
+            else if (strcmp(dataResponse1, "BINAR") == 0) {
+                // El computador pide las ventanas en frames binarios
+                modo_binario = 1;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "TEXTO") == 0) {
+                modo_binario = 0;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "CRUDO") == 0) {
+                // El computador calcula RMS, FFT y peaks, solo se envian las muestras
+                solo_crudo = 1;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "COMPL") == 0) {
+                solo_crudo = 0;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "CUENT") == 0) {
+                // El computador convierte las cuentas int16 a g y grados/s (conversion.py)
+                enviar_cuentas = 1;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "FLOAT") == 0) {
+                enviar_cuentas = 0;
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+            }
+            else if (strcmp(dataResponse1, "STRM") == 0) {
+                // Modo continuo: se envian bloques de muestras sin esperar BEGIN hasta recibir STOP.
+                // RMS, FFT y peaks los calcula el computador sobre una ventana deslizante (continuo.py)
+                uart_write_bytes(UART_NUM, "OK\0", 3);
+                int crudo_anterior = solo_crudo;
+                solo_crudo = 1;
+                while (1) {
+                    lectura(FILAS_CONTINUO, 1000);
+                    int len = uart_read_bytes(UART_NUM, (uint8_t*)dataResponse1, 6, 0);
+                    if (len > 0 && strcmp(dataResponse1, "STOP") == 0) {
+                        break;
+                    }
+                }
+                solo_crudo = crudo_anterior;
+                if (modo_binario) {
+                    enviar_frame(FRAME_FIN, 6, NULL, 0);
+                } else {
+                    uart_write_bytes(UART_NUM, "FINISH\0", 7);
+                }
+            }
+            else if (strncmp(dataResponse1, "BAUD", 4) == 0) {
+                // El computador negocia una UART mas rapida (ver enlace.py)
+                cambiar_baudios(dataResponse1[4] - '0');
+            }
             else {
                 //printf("Iniciando cambio de ventana\n");
                 // Si caemos aca es porque la computadora quiere que cambiemos el valor de la ventana, valor que fue enviado en forma de string
@@ -0,0 +1,49 @@
+""" Magnitudes derivadas de los 6 ejes de la BMI270.
+
+analizar_movimiento toma la matriz canales x muestras de una ventana
+(ventana.crudo) y calcula de una vez para todos los ejes:
+
+    resumen        analisis.resumir: RMS, extremos, peaks y magnitud de la FFT
+                   con la frecuencia dominante de cada eje
+    magnitud_acc   norma de la aceleracion en cada muestra (g); quieto vale ~1
+    magnitud_gyr   norma de la velocidad angular en cada muestra (grados/s)
+    roll, pitch    inclinacion de cada muestra (grados) segun la direccion de
+                   la gravedad que mide el acelerometro
+
+La inclinacion solo vale cuando el sensor no acelera (el acelerometro mide la
+gravedad mas la aceleracion del movimiento) y no da el yaw: girar en torno a
+la vertical no cambia la direccion de la gravedad.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.analisis import resumir, magnitudes
+
+GRUPOS = {"acc": ("acc_x", "acc_y", "acc_z"), "gyr": ("gyr_x", "gyr_y", "gyr_z")}  # Ejes x, y, z de cada sensor
+
+Movimiento = namedtuple('Movimiento', ['resumen', 'magnitud_acc', 'magnitud_gyr', 'roll', 'pitch'])
+
+
+def indices_grupos(nombres, grupos=GRUPOS):
+    """ {grupo: filas de sus ejes x, y, z} segun el orden de nombres """
+    nombres = list(nombres)
+    return {grupo: [nombres.index(eje) for eje in ejes] for grupo, ejes in grupos.items()}
+
+
+def inclinacion(acc):
+    """ (roll, pitch) en grados a partir de acc (x, y, z en la primera
+    dimension); acc puede ser un vector o 3 x muestras """
+    x, y, z = np.asarray(acc, dtype=np.float64)
+    roll = np.degrees(np.arctan2(y, z))
+    pitch = np.degrees(np.arctan2(-x, np.hypot(y, z)))
+    return roll, pitch
+
+
+def analizar_movimiento(crudo, nombres, periodo=1.0):
+    """ Movimiento de una matriz canales x muestras cuyas filas se llaman nombres """
+    indices = indices_grupos(nombres)
+    normas = magnitudes(crudo, indices)
+    roll, pitch = inclinacion(np.asarray(crudo)[indices["acc"]])
+    return Movimiento(resumir(crudo, periodo), normas["acc"], normas["gyr"], roll, pitch)
@@ -0,0 +1,247 @@
+""" Orientacion de la BMI270 fusionando el acelerometro y el giroscopio.
+
+El giroscopio da bien los cambios rapidos pero al integrarlo se acumula su
+sesgo; el acelerometro da la inclinacion sin deriva (la gravedad, ver
+movimiento.inclinacion) pero con el ruido de cada movimiento. Los filtros de
+aca juntan los dos y entregan la orientacion de cada muestra:
+
+    Complementario  roll y pitch = alfa * (anterior + giro * periodo)
+                    + (1 - alfa) * inclinacion del acelerometro; el yaw solo
+                    se integra. Usa directo las velocidades de los ejes x e y
+                    como derivada de roll y pitch, lo que vale para
+                    inclinaciones moderadas.
+    Madgwick        cuaternion integrado con el giroscopio y corregido con un
+                    paso de descenso de gradiente hacia la gravedad medida
+                    (beta fija cuanto se corrige). Vale para cualquier
+                    orientacion.
+
+La recursion del complementario es lineal, asi que un bloque completo se
+resuelve con numpy: y[t] = alfa**(t+1) * y[-1] + alfa**t * cumsum(u[s] /
+alfa**s), por tramos cortos para que alfa**-s no pierda precision. Madgwick
+no es lineal y avanza muestra a muestra, pero su estado tiene una dimension
+extra de filtros independientes (por ejemplo una BMI270 por cada placa de
+dispositivos.py) que se actualizan todos juntos en cada paso.
+
+actualizar(acc, gyr) recibe muestras x 3 (o filtros x muestras x 3), acc en
+cualquier unidad (solo importa su direccion) y gyr en grados/s, y retorna
+una Estimacion con el cuaternion (w, x, y, z) y roll, pitch y yaw en grados
+de cada muestra. Sin magnetometro el yaw deriva con el sesgo del giroscopio.
+
+Con python orientacion.py se miden las muestras por segundo de cada filtro
+en un nucleo y su error contra una rotacion conocida; benchmark.py los mide
+junto a las demas etapas del receptor (orientacion_complementario y
+orientacion_madgwick).
+"""
+import argparse
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from movimiento import inclinacion
+
+ALFA = 0.98  # Peso del giroscopio en el filtro complementario
+BETA = 0.1  # Ganancia de la correccion con el acelerometro en Madgwick (rad/s)
+PRECISION_TRAMO = 1e8  # alfa**-s se mantiene bajo este valor en cada tramo del complementario
+
+# cuaterniones: (..., muestras, 4) con w, x, y, z; euler: (..., muestras, 3) con roll, pitch y yaw en grados
+Estimacion = namedtuple('Estimacion', ['cuaterniones', 'euler'])
+
+
+def euler(q):
+    """ Roll, pitch y yaw en grados (convencion ZYX) de cuaterniones (..., 4) """
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    roll = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = np.arcsin(np.clip(2 * (w * y - z * x), -1, 1))
+    yaw = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return np.degrees(np.stack([roll, pitch, yaw], axis=-1))
+
+
+def cuaternion(angulos):
+    """ Cuaterniones (..., 4) de roll, pitch y yaw en grados (..., 3) """
+    mitad = np.radians(np.asarray(angulos, dtype=np.float64)) / 2
+    cr, cp, cy = np.moveaxis(np.cos(mitad), -1, 0)
+    sr, sp, sy = np.moveaxis(np.sin(mitad), -1, 0)
+    return np.stack([cr * cp * cy + sr * sp * sy,
+                     sr * cp * cy - cr * sp * sy,
+                     cr * sp * cy + sr * cp * sy,
+                     cr * cp * sy - sr * sp * cy], axis=-1)
+
+
+def _inclinacion(acc):
+    """ (..., muestras, 2) con roll y pitch en grados de cada muestra de acc """
+    return np.stack(inclinacion(np.moveaxis(acc, -1, 0)), axis=-1)
+
+
+class Complementario:
+    """ Filtro complementario de roll y pitch, con el yaw integrado """
+
+    def __init__(self, periodo, alfa=ALFA):
+        if not 0 <= alfa <= 1:
+            raise ValueError(f"alfa debe estar entre 0 y 1 (alfa = {alfa})")
+        self.periodo = periodo
+        self.alfa = alfa
+        self.angulos = None  # (..., 3) roll, pitch y yaw de la ultima muestra; parte de la primera inclinacion
+        if 0 < alfa < 1:
+            self.tramo = max(1, int(np.log(PRECISION_TRAMO) / -np.log(alfa)))
+        else:
+            self.tramo = None  # Con alfa 0 o 1 no hay potencias que crezcan
+
+    def actualizar(self, acc, gyr):
+        acc = np.asarray(acc, dtype=np.float64)
+        gyr = np.asarray(gyr, dtype=np.float64)
+        if acc.shape[-2] == 0:
+            return Estimacion(np.empty(acc.shape[:-1] + (4,)), np.empty(acc.shape))
+        medida = _inclinacion(acc)
+        if self.angulos is None:
+            self.angulos = np.concatenate([medida[..., 0, :], np.zeros(medida.shape[:-2] + (1,))], axis=-1)
+        giro = gyr * self.periodo
+        # Entrada de la recursion y[t] = alfa * y[t - 1] + u[t] para roll y pitch
+        entrada = self.alfa * giro[..., :2] + (1 - self.alfa) * medida
+        inclinaciones = np.empty(medida.shape)
+        m = medida.shape[-2]
+        paso = self.tramo or m
+        anterior = self.angulos[..., :2]
+        for inicio in range(0, m, paso):
+            u = entrada[..., inicio:inicio + paso, :]
+            if self.alfa == 0:
+                y = u
+            elif self.alfa == 1:
+                y = anterior[..., np.newaxis, :] + np.cumsum(u, axis=-2)
+            else:
+                potencias = self.alfa ** np.arange(u.shape[-2])[:, np.newaxis]
+                y = potencias * (self.alfa * anterior[..., np.newaxis, :] + np.cumsum(u / potencias, axis=-2))
+            inclinaciones[..., inicio:inicio + paso, :] = y
+            anterior = y[..., -1, :]
+        yaw = self.angulos[..., np.newaxis, 2:] + np.cumsum(giro[..., 2:], axis=-2)
+        yaw = (yaw + 180) % 360 - 180
+        angulos = np.concatenate([inclinaciones, yaw], axis=-1)
+        self.angulos = angulos[..., -1, :]
+        return Estimacion(cuaternion(angulos), angulos)
+
+    def euler(self):
+        """ Roll, pitch y yaw de la ultima muestra (None si aun no llega ninguna) """
+        return self.angulos
+
+
+def _paso_madgwick(q, entrada, beta, periodo, sqrt):
+    """ Cuaternion q (w, x, y, z) tras una muestra; entrada tiene la velocidad
+    angular / 2 (rad/s), la aceleracion normalizada y si hubo gravedad """
+    w, x, y, z = q
+    gx, gy, gz, ax, ay, az, con_gravedad = entrada
+    # Derivada del cuaternion segun el giroscopio: 0.5 * q * (0, gx, gy, gz)
+    dw = -x * gx - y * gy - z * gz
+    dx = w * gx + y * gz - z * gy
+    dy = w * gy - x * gz + z * gx
+    dz = w * gz + x * gy - y * gx
+    # Gradiente de la diferencia entre la gravedad estimada y la medida
+    fx = 2 * (x * z - w * y) - ax
+    fy = 2 * (w * x + y * z) - ay
+    fz = 1 - 2 * (x * x + y * y) - az
+    sw = -2 * y * fx + 2 * x * fy
+    sx = 2 * z * fx + 2 * w * fy - 4 * x * fz
+    sy = -2 * w * fx + 2 * z * fy - 4 * y * fz
+    sz = 2 * x * fx + 2 * y * fy
+    # Sin gravedad (acc = 0) no se corrige; el 1e-12 evita dividir por cero cuando ya coinciden
+    correccion = con_gravedad * beta / (sqrt(sw * sw + sx * sx + sy * sy + sz * sz) + 1e-12)
+    w = w + (dw - correccion * sw) * periodo
+    x = x + (dx - correccion * sx) * periodo
+    y = y + (dy - correccion * sy) * periodo
+    z = z + (dz - correccion * sz) * periodo
+    norma = sqrt(w * w + x * x + y * y + z * z)
+    return w / norma, x / norma, y / norma, z / norma
+
+
+class Madgwick:
+    """ Filtro de Madgwick para IMU sin magnetometro (un cuaternion por filtro) """
+
+    def __init__(self, periodo, beta=BETA):
+        self.periodo = periodo
+        self.beta = beta
+        self.q = None  # (..., 4) cuaternion de la ultima muestra; parte de la primera inclinacion
+
+    def actualizar(self, acc, gyr):
+        acc = np.asarray(acc, dtype=np.float64)
+        gyr = np.radians(np.asarray(gyr, dtype=np.float64))
+        m = acc.shape[-2]
+        if self.q is None:
+            if m == 0:
+                return Estimacion(np.empty(acc.shape[:-1] + (4,)), np.empty(acc.shape))
+            roll, pitch = inclinacion(np.moveaxis(acc[..., 0, :], -1, 0))
+            self.q = cuaternion(np.stack([roll, pitch, np.zeros_like(roll)], axis=-1))
+        # Lo que no depende del estado se calcula para todo el bloque de una vez
+        norma = np.linalg.norm(acc, axis=-1, keepdims=True)
+        con_gravedad = (norma > 0)[..., 0]
+        acc = np.divide(acc, norma, out=np.zeros_like(acc), where=norma > 0)
+        entradas = np.concatenate([gyr * 0.5, acc, con_gravedad[..., np.newaxis]], axis=-1)
+        estado = tuple(np.moveaxis(self.q, -1, 0))
+        if self.q.ndim == 1:
+            # Un solo filtro: con floats de python cada paso es mucho mas rapido que con escalares de numpy
+            salida = []
+            for entrada in entradas.tolist():
+                estado = _paso_madgwick(estado, entrada, self.beta, self.periodo, math.sqrt)
+                salida.append(estado)
+            salida = np.array(salida).reshape(acc.shape[:-1] + (4,))
+        else:
+            salida = np.empty(acc.shape[:-1] + (4,))
+            for t in range(m):
+                estado = _paso_madgwick(estado, np.moveaxis(entradas[..., t, :], -1, 0), self.beta, self.periodo,
+                                        np.sqrt)
+                salida[..., t, :] = np.stack(estado, axis=-1)
+        self.q = np.stack(estado, axis=-1)
+        return Estimacion(salida, euler(salida))
+
+    def euler(self):
+        """ Roll, pitch y yaw de la ultima muestra (None si aun no llega ninguna) """
+        return None if self.q is None else euler(self.q)
+
+
+FILTROS = {"complementario": Complementario, "madgwick": Madgwick}
+
+
+def crear(nombre, periodo, **opciones):
+    """ El filtro llamado nombre ("complementario" o "madgwick") """
+    if nombre not in FILTROS:
+        raise ValueError(f"Filtro {nombre!r} invalido, debe ser uno de {list(FILTROS)}")
+    return FILTROS[nombre](periodo, **opciones)
+
+
+def oscilacion(n, periodo, amplitud=40.0, frecuencia=0.5, semilla=0):
+    """ acc, gyr y roll verdadero de un sensor que oscila en roll (amplitud
+    grados a frecuencia Hz) con ruido en ambos sensores """
+    rng = np.random.default_rng(semilla)
+    t = np.arange(n) * periodo
+    fase = 2 * np.pi * frecuencia * t
+    roll = amplitud * np.sin(fase)
+    acc = np.stack([np.zeros(n), np.sin(np.radians(roll)), np.cos(np.radians(roll))], axis=-1)
+    gyr = np.zeros((n, 3))
+    gyr[:, 0] = amplitud * 2 * np.pi * frecuencia * np.cos(fase)
+    return acc + rng.normal(0, 0.02, acc.shape), gyr + rng.normal(0, 0.5, gyr.shape), roll
+
+
+if __name__ == "__main__":
+    from comun.benchmark import medir
+
+    parser = argparse.ArgumentParser(description="Muestras por segundo de los filtros de orientacion")
+    parser.add_argument("--muestras", type=int, default=20000, help="Muestras por filtro en cada corrida")
+    parser.add_argument("--filtros", type=int, nargs="+", default=[1, 16],
+                        help="Filtros independientes actualizados juntos")
+    parser.add_argument("--periodo", type=float, default=0.01, help="Periodo de muestreo (s)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--tiempo", type=float, default=5.0, help="Segundos maximos por caso")
+    args = parser.parse_args()
+
+    acc, gyr, roll = oscilacion(args.muestras, args.periodo)
+    for nombre in FILTROS:
+        error = crear(nombre, args.periodo).actualizar(acc, gyr).euler[:, 0] - roll
+        error = np.abs((error + 180) % 360 - 180)[len(roll) // 10:]  # Sin el arranque
+        for filtros in args.filtros:
+            lote_acc, lote_gyr = acc, gyr
+            if filtros > 1:
+                lote_acc = np.broadcast_to(acc, (filtros,) + acc.shape)
+                lote_gyr = np.broadcast_to(gyr, (filtros,) + gyr.shape)
+            duraciones = medir(lambda: crear(nombre, args.periodo).actualizar(lote_acc, lote_gyr),
+                               args.repeticiones, args.tiempo)
+            tasa = filtros * args.muestras / np.median(duraciones)
+            print(f"{nombre:15s} filtros={filtros:<4d} {tasa:12,.0f} muestras/s  "
+                  f"error roll medio={error.mean():.2f} max={error.max():.2f} grados")
@@ -1,62 +1,106 @@
-import serial
-from struct import pack, unpack
-import matplotlib.pyplot as plt
-import bisect
+import argparse
 import sys
-from PyQt5 import QtGui, QtCore
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtWidgets import QMainWindow, QApplication, QLabel, QLineEdit, QVBoxLayout, QWidget, QPushButton, QHBoxLayout, QGridLayout, QTableView
+from struct import pack
+import numpy as np
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.protocolo import EnsambladorTexto, TIPO_FIN, TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16, COMANDO_BINARIO, COMANDO_CRUDO
+from comun.ventana import Ventana
+from conversion import Conversion, RANGO_ACC, RANGO_GYR, COMANDO_CUENTAS
+from movimiento import analizar_movimiento, inclinacion, indices_grupos
+from orientacion import FILTROS, crear
+from comun.analisis import analizar, verificar, plan_fft
+from comun.estadisticas import TopKCanales
+from comun.decimacion import decimar, eje_tiempo, estilo_marcador
+from comun.lector import LectorSerial, ErrorLector
+# pyserial, matplotlib y PyQt5 se importan recien cuando se usan (conectar,
+# graficarXYZ e interfaz.py): importar este modulo no abre el puerto ni carga la interfaz
 
 
 # Se configura el puerto y el BAUD_Rate
 PORT = 'COM3'  # Esto depende del sistema operativo
 BAUD_RATE = 115200  # Debe coincidir con la configuracion de la ESP32
+BAUDIOS_MAXIMO = None # Al conectar se sube la velocidad hasta estos baudios si el enlace lo soporta (ver enlace.py), None para no negociar
 TIME = 1 # Tiempo de espera entre una medicion y otra
-
-
-# Se abre la conexion serial
-ser = serial.Serial(PORT, BAUD_RATE, timeout = 1)
+ODR = 800 # Muestras por segundo de la BMI270 (Fodr en bmi270.c); el filtro de orientacion integra el giroscopio cada 1 / ODR segundos
+MODO_BINARIO = False # True si la ESP32 tiene el firmware con frames binarios (ver protocolo.py)
+TIMEOUT = 10 # Segundos maximos de espera por una respuesta de la ESP32
+SOLO_CRUDO = False # True: la ESP32 solo envia las muestras y el computador calcula RMS, FFT y peaks (ver analisis.py)
+MODO_CUENTAS = False # True: la ESP32 envia las cuentas int16 del sensor y el computador las convierte (ver conversion.py). Requiere MODO_BINARIO e implica SOLO_CRUDO
+RANGO_ACC_G = RANGO_ACC # Rango del acelerometro configurado en la ESP32 (+-g)
+RANGO_GYR_DPS = RANGO_GYR # Rango del giroscopio configurado en la ESP32 (+-grados/s)
+CALIBRACION = None # JSON con el sesgo y la ganancia de cada eje (ver conversion.py), None sin calibracion
+DETECCION = None # JSON con las reglas de deteccion de anomalias que se revisan mientras llegan las muestras (ver deteccion.py), None para no revisar
+ORIENTACION = None # "complementario" o "madgwick": estima la orientacion con cada bloque de muestras que llega (ver orientacion.py), None para no estimarla
+VERIFICAR_ANALISIS = False # True: compara el RMS, la FFT y los peaks de la ESP32 con los calculados en el computador
+CARPETA_DATOS = None # Carpeta donde se guardan todas las ventanas recibidas (ver almacenamiento.py), None para no guardar
+REDUCCION_DATOS = None # Muestras por bloque del nivel reducido (minimo y maximo) que se guarda junto a los datos, None para no guardarlo
+GUARDAR_PNG = False # True: ademas de los graficos de la interfaz se guardan acc.png y gyr.png
+CAPTURA = None # Archivo donde se graban los bytes de la sesion (ver captura.py), None para no grabar
+REPRODUCIR = None # Archivo de captura que se reproduce en vez de abrir PORT, None para usar la ESP32
+VELOCIDAD_REPRODUCCION = None # 1 para reproducir al ritmo original, None para lo mas rapido posible
+VENTANA_CONTINUO = 800 # Muestras de la ventana deslizante del modo continuo
+SALTO_CONTINUO = 400 # Cada cuantas muestras se muestran las estadisticas en el modo continuo
+CANALES = ("acc_x", "acc_y", "acc_z", "gyr_x", "gyr_y", "gyr_z") # Orden de los valores en cada linea
+
+
+# La conexion serial se abre en conectar()
+ser = None
+lector = None
+escritor = None
+conversion = None
+detector = None
+filtro = None
+
+class AdquisicionCancelada(Exception):
+    """ Se cancelo la lectura de una ventana (ver HiloAdquisicion) """
 
 # Funciones
-def insertar_ordenado(lista, dato):
-    """ Funcion para insertar un dato en una lista ordenada """
-    bisect.insort(lista, -dato)
+def conectar():
+    """ Funcion que abre el puerto (o la captura a reproducir), parte el hilo
+    lector y configura el modo de la ESP32 """
+    global ser, lector, escritor, conversion, detector, filtro
+    if REPRODUCIR is not None:
+        from comun.captura import SerialReproductor
+        ser = SerialReproductor(REPRODUCIR, VELOCIDAD_REPRODUCCION)
+    else:
+        import serial
+        ser = serial.serial_for_url(PORT, BAUD_RATE, timeout = 1) # Acepta tambien urls como socket:// (ver simulador.py)
+    if CAPTURA is not None:
+        from comun.captura import SerialGrabador
+        ser = SerialGrabador(ser, CAPTURA)
+    # Un solo hilo lee el puerto y deja las lineas y frames en colas (ver lector.py)
+    lector = LectorSerial(ser)
+    lector.start()
+    if BAUDIOS_MAXIMO is not None:
+        from comun.enlace import negociar_baudios, describir
+        print(describir(negociar_baudios(ser, lector, BAUDIOS_MAXIMO)))
+    # Las ventanas se escriben a disco desde otro hilo para no frenar la lectura
+    if CARPETA_DATOS is not None:
+        from comun.almacenamiento import EscritorAlmacen
+        escritor = EscritorAlmacen(CARPETA_DATOS, CANALES, reduccion=REDUCCION_DATOS)
+        escritor.start()
+    if DETECCION is not None:
+        from comun.deteccion import Detector
+        detector = Detector.desde_archivo(DETECCION, CANALES, periodo=TIME)
+    if ORIENTACION is not None:
+        filtro = crear(ORIENTACION, 1 / ODR)
+    if MODO_BINARIO:
+        activar_modo_binario()
+    if MODO_CUENTAS:
+        if not MODO_BINARIO:
+            raise ValueError("MODO_CUENTAS requiere MODO_BINARIO")
+        if CALIBRACION is not None:
+            conversion = Conversion.desde_archivo(CALIBRACION, CANALES, RANGO_ACC_G, RANGO_GYR_DPS)
+        else:
+            conversion = Conversion(CANALES, RANGO_ACC_G, RANGO_GYR_DPS)
+        activar_cuentas()
+    if SOLO_CRUDO or MODO_CUENTAS:
+        activar_solo_crudo()
 
 def send_message(message):
     """ Funcion para enviar un mensaje a la ESP32 """
     ser.write(message)
 
-def receive_response():
-    """ Funcion para recibir un mensaje de la ESP32 """
-    response = ser.readline()
-    return response
-
-def receive_data():
-    """ Funcion que recibe tres floats (fff) de la ESP32 
-    y los imprime en consola """
-    respuesta_encriptada = receive_response()
-    #Para poder ver los datos que envía la ESP:
-    print(f"Data = {respuesta_encriptada}")
-    data = unpack("fff", respuesta_encriptada)
-    print(f'Received: {data}')
-
-    if b'FINISH' in respuesta_encriptada:
-        return None, None, None, None
-
-    datos = respuesta_encriptada.decode('utf-8').split(" ")
-
-    if len(datos) == 6: #Estamos viendo mediciones
-
-        return float(datos[0]), float(datos[1]), float(datos[2]), float(datos[3])
-    
-    elif len(datos) == 12:
-
-        return (float(datos[0]), float(datos[1])),\
-                (float(datos[2]), float(datos[3])),\
-                (float(datos[4]), float(datos[5])),\
-                (float(datos[6]), float(datos[7]))
-
 def send_end_message():
     """ Funcion para enviar un mensaje de finalizacion a la ESP32 """
     end_message = pack('4s', 'END\0'.encode())
@@ -66,21 +110,21 @@ def cambiar_ventana(new_size):
     largo_mensaje = len(str(new_size))
     change_message = pack(f'{largo_mensaje}s', f'{new_size}\0'.encode()) #pack('9s', '6\0')
     ser.write(change_message)
+    # Los buffers de la FFT del nuevo tamano quedan listos antes de la primera ventana (ver analisis.plan_fft)
+    plan_fft(int(new_size), (len(CANALES),))
 
 def terminar_conexion():
     # Se envia el mensaje de termino de comunicacion
     send_end_message()
     # Esperamos que la ESP32 responda
-    while True:
-        if ser.in_waiting > 0:
-            try:
-                message = receive_response()
-                # print(message)
-                if b"CLOSED" in message:
-                    break
-            except:
-                continue
+    try:
+        lector.esperar_respuesta(b"CLOSED", TIMEOUT)
+    except (TimeoutError, ErrorLector) as e:
+        print(f"No se recibio CLOSED de la ESP32: {e}")
+    lector.detener()
     ser.close()
+    if escritor is not None:
+        escritor.detener()
 
 # Funciones auxiliares
 
@@ -90,291 +134,289 @@ def comenzar_lectura():
     message = pack('6s','BEGIN\0'.encode()) #Minuto 30 del aux 2
     send_message(message)
 
+    respuesta = lector.esperar_respuesta(b"OK", TIMEOUT)
+    print(respuesta)
+
+def leyendo(al_recibir=None, cancelado=None, al_alertar=None):
+    """ Funcion que recibe una ventana en modo texto y la retorna como Ventana.
+    al_recibir(muestras) se llama con cada bloque de muestras apenas se
+    confirma, al_alertar(alertas) con las alertas del detector que provoco
+    y si cancelado() retorna True se descarta el resto de la ventana """
+    # Las lineas se parsean de a lote, con todo lo que ya llego (ver protocolo.ParserTexto)
+    ensamblador = EnsambladorTexto(len(CANALES), SOLO_CRUDO)
+    # Los peaks se siguen a medida que llegan las muestras
+    seguidor = TopKCanales(CANALES)
+    orientacion = []
+    recibidas = 0
+    terminada = False
+    while not terminada:
+        if cancelado is not None and cancelado():
+            # Se lee hasta el FINISH para que la siguiente ventana empiece limpia
+            lector.esperar_respuesta(b"FINISH", TIMEOUT)
+            raise AdquisicionCancelada()
+        muestras, terminada = ensamblador.agregar_lineas(lector.leer_lineas(TIMEOUT, hasta=b"FINISH"))
+        if len(muestras):
+            seguidor.agregar_bloque(muestras, np.arange(recibidas, recibidas + len(muestras)) * TIME)
+            recibidas += len(muestras)
+            revisar_alertas(muestras, al_alertar)
+            actualizar_orientacion(muestras, orientacion)
+            if al_recibir is not None:
+                al_recibir(muestras)
+    parser = ensamblador.parser
+    if parser.descartadas:
+        print(f"Lineas descartadas: {parser.malformadas} malformadas, {parser.truncadas} truncadas, "
+              f"{parser.sobrantes} con valores de mas")
+    ventana = Ventana.desde_arreglos(*ensamblador.ventana(), nombres=CANALES)
+    ventana.detalle_peaks = seguidor.detalle()
+    if orientacion:
+        ventana.derivadas["orientacion"] = np.concatenate(orientacion)
+    return ventana
+
+def activar_modo_binario():
+    """ Funcion para pedirle a la ESP32 que envie las ventanas en frames binarios """
+    send_message(COMANDO_BINARIO)
+
+    lector.esperar_respuesta(b"OK", TIMEOUT)
+
+def activar_solo_crudo():
+    """ Funcion para pedirle a la ESP32 que solo envie las muestras """
+    send_message(COMANDO_CRUDO)
+
+    lector.esperar_respuesta(b"OK", TIMEOUT)
+
+def activar_cuentas():
+    """ Funcion para pedirle a la ESP32 que envie las cuentas int16 sin convertir """
+    send_message(COMANDO_CUENTAS)
+
+    lector.esperar_respuesta(b"OK", TIMEOUT)
+
+def revisar_analisis(ventana):
+    """ Funcion que avisa si el RMS, la FFT o los peaks de la ESP32 no
+    coinciden con los calculados en el computador """
+    for seccion, (error, canales) in verificar(ventana).items():
+        if canales:
+            print(f"ADVERTENCIA: {seccion} de la ESP32 no coincide en {canales} (error maximo {error})")
+
+def revisar_alertas(muestras, al_alertar=None):
+    """ Funcion que pasa un bloque de muestras por el detector apenas llega
+    e imprime las alertas (y se las entrega a al_alertar) """
+    if detector is None:
+        return
+    from comun.deteccion import mensaje
+    alertas = detector.agregar_bloque(muestras)
+    for alerta in alertas:
+        print(mensaje(alerta))
+    if alertas and al_alertar is not None:
+        al_alertar(alertas)
+
+def actualizar_orientacion(muestras, bloques=None):
+    """ Funcion que pasa un bloque de muestras por el filtro de orientacion
+    y agrega a bloques (si se da) el roll, pitch y yaw de cada muestra """
+    if filtro is None:
+        return
+    ejes = indices_grupos(CANALES)
+    euler = filtro.actualizar(muestras[:, ejes["acc"]], muestras[:, ejes["gyr"]]).euler
+    if bloques is not None:
+        bloques.append(euler)
+
+def leyendo_binario(al_recibir=None, cancelado=None, al_alertar=None):
+    """ Funcion que recibe una ventana en frames binarios (ver protocolo.py)
+    y la retorna como Ventana. al_recibir, cancelado y al_alertar como en leyendo() """
+    frames = []
+    seguidor = TopKCanales(CANALES)
+    orientacion = []
+    recibidas = 0
     while True:
-        if ser.in_waiting > 0: #verifica si hay datos en el puerto serial
-            respuesta = receive_response()
-            print(respuesta)
-            try:
-                if b"OK" in respuesta:
-                    break
-            except:
-                continue
-
-def leyendo():
-    #Creamos un arreglo para guardar los datos
-    acc_x = []
-    acc_y = []
-    acc_z = []
-    gyr_x = []
-    gyr_y = []
-    gyr_z = []
-    #peaks_acc_x = []
-    #peaks_acc_y = []
-    #peaks_acc_z = []
-    #peaks_gyr_x = []
-    #peaks_gyr_y = []
-    #peaks_gyr_z = []
-    # Se lee data por la conexion serial
-    #listen_forever()
-    while True:
-        if ser.in_waiting > 0: #verifica si hay datos en el puerto serial
-            try:
-                ax, ay, az, gx, gy, gz = receive_data()
-                if ax is None:
-                    window_size =int((len(acc_x) - 6) / 2)
-                    data = {
-                        "ventana_ax": acc_x[:window_size],
-                        "ventana_ay": acc_y[:window_size],
-                        "ventana_az": acc_z[:window_size],
-                        "ventana_gx": gyr_x[:window_size],
-                        "ventana_gy": gyr_y[:window_size],
-                        "ventana_gz": gyr_z[:window_size],
-
-                        "axRMS": acc_x[window_size],
-                        "ayRMS": acc_y[window_size],
-                        "azRMS": acc_z[window_size],
-                        "gxRMS": gyr_x[window_size],
-                        "gyRMS": gyr_y[window_size],
-                        "gzRMS": gyr_z[window_size],
-
-                        "peaks_ax": acc_x[2*window_size +1 :],
-                        "peaks_ay": acc_y[2*window_size +1 :],
-                        "peaks_az": acc_z[2*window_size +1 :],
-                        "peaks_gx": gyr_x[2*window_size +1 :],
-                        "peaks_gy": gyr_y[2*window_size +1 :],
-                        "peaks_gz": gyr_z[2*window_size +1 :],
-
-                        "FFT_ax": acc_x[window_size + 1: 2 * window_size + 1],
-                        "FFT_ay": acc_y[window_size + 1: 2 * window_size + 1],
-                        "FFT_az": acc_z[window_size + 1: 2 * window_size + 1],
-                        "FFT_gx": gyr_x[window_size + 1: 2 * window_size + 1],
-                        "FFT_gy": gyr_y[window_size + 1: 2 * window_size + 1],
-                        "FFT_gz": gyr_z[window_size + 1: 2 * window_size + 1],
-                    }
-                    return data
-                acc_x.append(ax)
-                acc_y.append(ay)
-                acc_z.append(az)
-                gyr_x.append(gx)
-                gyr_y.append(gy)
-                gyr_z.append(gz)
-            except:
-                continue
+        if cancelado is not None and cancelado():
+            while lector.leer_frame(TIMEOUT).tipo != TIPO_FIN:
+                pass
+            raise AdquisicionCancelada()
+        frame = lector.leer_frame(TIMEOUT)
+        if frame.tipo == TIPO_MUESTRAS_I16 and conversion is not None:
+            # Cada bloque de cuentas se convierte de una vez, antes de graficarlo o buscar sus peaks
+            frame = conversion.convertir_frame(frame)
+        if frame.tipo == TIPO_FIN:
+            ventana = Ventana.desde_frames(frames, nombres=CANALES)
+            ventana.detalle_peaks = seguidor.detalle()
+            if orientacion:
+                ventana.derivadas["orientacion"] = np.concatenate(orientacion)
+            return ventana
+        if frame.tipo in (TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16):
+            tiempos = np.arange(recibidas, recibidas + len(frame.datos)) * TIME
+            seguidor.agregar_bloque(frame.datos, tiempos)
+            recibidas += len(frame.datos)
+            revisar_alertas(frame.datos, al_alertar)
+            actualizar_orientacion(frame.datos, orientacion)
+            if al_recibir is not None:
+                al_recibir(frame.datos)
+        frames.append(frame)
 
 def graficarXYZ(listax, listay, listaz, variable, title, filename):
+    import matplotlib.pyplot as plt
     plt.clf()
-    x = [i*TIME for i in range(len(listax))]
-    plt.plot(x, listax, marker='o', linestyle='-', color='b', label='X')
-    plt.plot(x, listay, marker='o', linestyle='-', color='r', label='Y')
-    plt.plot(x, listaz, marker='o', linestyle='-', color='g', label='Z')
+    # Con ventanas largas se dibujan a lo mas decimacion.MAX_PUNTOS puntos por eje (sin perder los peaks)
+    x = eje_tiempo(len(listax), TIME)
+    for lista, color, etiqueta in ((listax, 'b', 'X'), (listay, 'r', 'Y'), (listaz, 'g', 'Z')):
+        x_eje, y_eje = decimar(x, np.asarray(lista))
+        plt.plot(x_eje, y_eje, marker=estilo_marcador(len(x_eje)), linestyle='-', color=color, label=etiqueta)
     plt.xlabel('Tiempo (s)')
     plt.ylabel(variable)
     plt.title(title)
     plt.legend()
     plt.savefig(filename)
 
-def mostrar_datos(datos):
-    acc_x = datos["ventana_ax"]
-    acc_y = datos["ventana_ay"]
-    acc_z = datos["ventana_az"]
-    gyr_x = datos["ventana_gx"]
-    gyr_y = datos["ventana_gy"]
-    gyr_z = datos["ventana_gz"]
-
-    axRMS = datos["axRMS"]
-    ayRMS = datos["ayRMS"]
-    azRMS = datos["azRMS"]
-    gxRMS = datos["gxRMS"]
-    gyRMS = datos["gyRMS"]
-    gzRMS = datos["gzRMS"]
-
-    peaks_ax = datos["peaks_ax"]
-    peaks_ay = datos["peaks_ay"]
-    peaks_az = datos["peaks_az"]
-    peaks_gx = datos["peaks_gx"]
-    peaks_gy = datos["peaks_gy"]
-    peaks_gz = datos["peaks_gz"]
-
-    FFT_ax = datos["FFT_ax"]
-    FFT_ay = datos["FFT_ay"]
-    FFT_az = datos["FFT_az"]
-    FFT_gx = datos["FFT_gx"]
-    FFT_gy = datos["FFT_gy"]
-    FFT_gz = datos["FFT_gz"]
-
-    graficarXYZ(acc_x, acc_y, acc_z, "Aceleración", "Aceleración en los ejes x, y, z", "acc.png")
-
-    graficarXYZ(gyr_x, gyr_y, gyr_z, "Giroscopio", "Giroscopio en los ejes x, y, z", "gyr.png")
-
-    print("Tamaño de la ventana: ", len(acc_x), "\n")
-    print(f"La transformada de fourier para la aceleración en el eje x fue: \n{FFT_ax}\n")
-    print(f"La transformada de fourier para la aceleración en el eje y fue: \n{FFT_ay}\n")
-    print(f"La transformada de fourier para la aceleración en el eje z fue: \n{FFT_az}\n")
-    print(f"La transformada de fourier para el giroscopio en el eje x fue: \n{FFT_gx}\n")
-    print(f"La transformada de fourier para el giroscopio en el eje y fue: \n{FFT_gy}\n")
-    print(f"La transformada de fourier para el giroscopio en el eje z fue: \n{FFT_gz}\n")
-
-    table_data = [
-            [     "", "RMS", "Peak 1", "Peak 2", "Peak 3", "Peak 4", "Peak 5"],
-            ["acc_x", axRMS, peaks_ax[0], peaks_ax[1], peaks_ax[2], peaks_ax[3], peaks_ax[4]],
-            ["acc_y", axRMS, peaks_ay[0], peaks_ay[1], peaks_ay[2], peaks_ay[3], peaks_ay[4]],
-            ["acc_z", azRMS, peaks_az[0], peaks_az[1], peaks_az[2], peaks_az[3], peaks_az[4]],
-            ["gyr_x", gxRMS, peaks_gx[0], peaks_gx[1], peaks_gx[2], peaks_gx[3], peaks_gx[4]],
-            ["gyr_y", gyRMS, peaks_gy[0], peaks_gy[1], peaks_gy[2], peaks_gy[3], peaks_gy[4]],
-            ["gyr_z", gzRMS, peaks_gz[0], peaks_gz[1], peaks_gz[2], peaks_gz[3], peaks_gz[4]],
-            ]
-    return table_data
-
-def solicitar_ventana():
+def mostrar_datos(ventana):
+    acc = ventana.crudo[0:3]
+    gyr = ventana.crudo[3:6]
+
+    if GUARDAR_PNG:
+        graficarXYZ(acc[0], acc[1], acc[2], "Aceleración", "Aceleración en los ejes x, y, z", "acc.png")
+
+        graficarXYZ(gyr[0], gyr[1], gyr[2], "Giroscopio", "Giroscopio en los ejes x, y, z", "gyr.png")
+
+    print("Tamaño de la ventana: ", len(ventana), "\n")
+    for i, nombre in enumerate(ventana.nombres):
+        sensor = "la aceleración" if nombre.startswith("acc") else "el giroscopio"
+        print(f"La transformada de fourier para {sensor} en el eje {nombre[-1]} fue: \n{ventana.fft[i]}\n")
+    if not len(ventana):
+        return
+    # Todos los ejes de una vez (ver movimiento.py)
+    movimiento = analizar_movimiento(ventana.crudo, ventana.nombres, TIME)
+    for i, nombre in enumerate(ventana.nombres):
+        print(f"{nombre}: RMS {ventana.rms[i]}, los 5 datos mas altos fueron {ventana.peaks[i]}, "
+              f"frecuencia dominante {movimiento.resumen.frecuencia_dominante[i]:g} Hz")
+    for sensor, norma in (("aceleración", movimiento.magnitud_acc), ("velocidad angular", movimiento.magnitud_gyr)):
+        print(f"Magnitud de la {sensor}: media {norma.mean():.4f}, máximo {norma.max():.4f}")
+    roll, pitch = inclinacion(acc.mean(axis=1))
+    print(f"Inclinación media: roll {roll:.2f}°, pitch {pitch:.2f}°")
+    if "orientacion" in ventana.derivadas:
+        # Roll, pitch y yaw en grados de cada muestra (muestras x 3)
+        roll, pitch, yaw = ventana.derivadas["orientacion"][-1]
+        print(f"Orientación al final de la ventana ({ORIENTACION}): roll {roll:.2f}°, pitch {pitch:.2f}°, yaw {yaw:.2f}°")
+
+def solicitar_ventana(al_recibir=None, cancelado=None, al_alertar=None):
     print("Indicandole al ESP32 que comience a leer")
     comenzar_lectura()
+    if detector is not None:
+        # Entre una ventana y otra la ESP32 deja de medir: la pendiente y las bandas parten de nuevo
+        detector.interrumpir()
     print("Recibiendo datos...")
-    return leyendo()
-
-
-
-# Interfaz
-class MainWindow(QMainWindow):
-
-    def __init__(self):
-        super().__init__()
-        self.title = "Tarea 4 Sistemas Embedidos y Sensores"
-        self.setWindowTitle(self.title)
-        self.data = None
-        self.input = None
-        self.ventana = 0
-
-        self.button_vent = QPushButton("Cambiar Ventana")
-        self.button_vent.clicked.connect(self.request_cambio_ventana)
-
-        self.button_request = QPushButton("Solicitar ventana de datos")
-        self.button_request.clicked.connect(self.request_ventana)
-
-        self.button_cierre = QPushButton("Cerrar la conexión")
-        self.button_cierre.clicked.connect(self.request_cierre)
-        self.button_cierre.setStyleSheet("background-color : #d4817b")
-
-        self.base_layout = QHBoxLayout()
-        self.base_layout.addWidget(self.button_request)
-        self.base_layout.addWidget(self.button_vent)
-        self.base_layout.addWidget(self.button_cierre)
-
-        self.main_layout = QVBoxLayout()
-        self.main_layout.addLayout(self.base_layout)
-        self.container = QWidget()
-        self.container.setLayout(self.main_layout)
-
-        self.setCentralWidget(self.container)
-
-    def inicio_app(self):
-        self.main_layout.removeWidget(self.data)
-        self.data.deleteLater()
-        info_ventana = QLabel(f"La ventana de datos es de {self.ventana}")
-        self.main_layout.addWidget(info_ventana)
-        self.data = info_ventana
-        
-    def request_cambio_ventana(self):
-        new_data = InputWindow(self)
-        if self.main_layout.count() >= 2:
-            self.main_layout.replaceWidget(self.data, new_data)
-            self.data.deleteLater()
-        else:
-            self.main_layout.addWidget(new_data)
-        self.data = new_data
-        
-
-    def cambio_ventana(self):
-        if self.input.text().isnumeric():
-            cambiar_ventana(self.input.text())
-            self.ventana = int(self.input.text())
-            self.inicio_app()
-        else:
-            print("no es un número")
-
-    def request_ventana(self):
-        new_data = DataWindow()
-        if self.main_layout.count() >= 2:
-            self.main_layout.replaceWidget(self.data, new_data)
-            self.data.deleteLater()
-            self.inicio_app
-        else:
-            self.main_layout.addWidget(new_data)
-        self.data = new_data
+    if MODO_BINARIO:
+        ventana = leyendo_binario(al_recibir, cancelado, al_alertar)
+    else:
+        ventana = leyendo(al_recibir, cancelado, al_alertar)
+    if SOLO_CRUDO or MODO_CUENTAS:
+        analizar(ventana)
+    elif VERIFICAR_ANALISIS:
+        revisar_analisis(ventana)
+    if escritor is not None:
+        escritor.agregar(ventana)
+    return ventana
+
+
+def mostrar_resultado(resultado):
+    """ Funcion que imprime las estadisticas de la ventana deslizante """
+    print(f"Ultimas {VENTANA_CONTINUO} muestras (hasta la muestra {resultado.muestra}):")
+    for i, nombre in enumerate(CANALES):
+        print(f"  {nombre}: media {resultado.media[i]:.4f}, RMS {resultado.rms[i]:.4f}, "
+              f"los 5 datos mas altos fueron {resultado.peaks[i]}")
+    angulos = None if filtro is None else filtro.euler()
+    if angulos is not None:
+        roll, pitch, yaw = angulos
+        print(f"  Orientación: roll {roll:.2f}°, pitch {pitch:.2f}°, yaw {yaw:.2f}°")
+
+def recibir_continuo(muestras):
+    """ Funcion que pasa cada bloque del modo continuo por el detector y el filtro de orientacion """
+    revisar_alertas(muestras)
+    actualizar_orientacion(muestras)
+
+def modo_continuo():
+    """ Funcion que recibe muestras sin parar (STRM) y muestra las estadisticas
+    de la ventana deslizante hasta que se presione Ctrl+C """
+    from comun.continuo import FlujoContinuo
+    if detector is not None:
+        detector.interrumpir()
+    # Con MODO_CUENTAS los bloques de cuentas int16 se convierten antes de las estadisticas
+    flujo = FlujoContinuo(ser, lector, len(CANALES), VENTANA_CONTINUO, SALTO_CONTINUO, MODO_BINARIO, TIMEOUT,
+                          al_recibir=recibir_continuo, conversion=conversion)
+    flujo.iniciar()
+    print("Modo continuo, presione Ctrl+C para detener")
+    try:
+        for resultado in flujo.resultados():
+            mostrar_resultado(resultado)
+    except KeyboardInterrupt:
+        for resultado in flujo.detener():
+            mostrar_resultado(resultado)
+    if flujo.descartadas:
+        print(f"Se descartaron {flujo.descartadas} lineas corruptas")
+
+
+
+def consola(n_ventanas):
+    """ Funcion que pide n_ventanas ventanas y las muestra en la consola, sin abrir la interfaz """
+    for _ in range(n_ventanas):
+        try:
+            ventana = solicitar_ventana()
+        except (TimeoutError, ErrorLector, ValueError) as e:
+            print(f"ERROR: No se pudo recibir la ventana: {e}")
+            break
+        mostrar_datos(ventana)
+    terminar_conexion()
+
+def main(argv=None):
+    global PORT, BAUD_RATE, BAUDIOS_MAXIMO, MODO_BINARIO, SOLO_CRUDO, MODO_CUENTAS, CALIBRACION, DETECCION, ORIENTACION, ODR, CARPETA_DATOS, REDUCCION_DATOS, GUARDAR_PNG, CAPTURA, REPRODUCIR, VENTANA_CONTINUO, SALTO_CONTINUO
+    parser = argparse.ArgumentParser(description="Receptor de la BMI270 (tarea 4)")
+    parser.add_argument("--puerto", default=PORT, help="Puerto o url de pyserial (socket://, ...)")
+    parser.add_argument("--baudios", type=int, default=BAUD_RATE)
+    parser.add_argument("--baudios-maximo", type=int, default=BAUDIOS_MAXIMO,
+                        help="Negociar con la ESP32 la velocidad mas alta que funcione, hasta estos baudios")
+    parser.add_argument("--binario", action="store_true", default=MODO_BINARIO, help="Pedir frames binarios")
+    parser.add_argument("--solo-crudo", action="store_true", default=SOLO_CRUDO, help="Calcular RMS, FFT y peaks en el computador")
+    parser.add_argument("--cuentas", action="store_true", default=MODO_CUENTAS,
+                        help="Pedir las cuentas int16 del sensor y convertirlas en el computador (implica --binario)")
+    parser.add_argument("--calibracion", default=CALIBRACION, help="JSON con el sesgo y la ganancia de cada eje")
+    parser.add_argument("--deteccion", default=DETECCION, help="JSON con las reglas de deteccion de anomalias")
+    parser.add_argument("--orientacion", default=ORIENTACION, choices=list(FILTROS),
+                        help="Estimar la orientacion con este filtro mientras llegan las muestras")
+    parser.add_argument("--odr", type=float, default=ODR, help="Muestras por segundo configuradas en la BMI270")
+    parser.add_argument("--datos", default=CARPETA_DATOS, help="Carpeta donde se guardan las ventanas")
+    parser.add_argument("--reduccion", type=int, default=REDUCCION_DATOS,
+                        help="Guardar tambien el minimo y maximo de cada bloque de estas muestras")
+    parser.add_argument("--png", action="store_true", default=GUARDAR_PNG, help="Guardar acc.png y gyr.png")
+    parser.add_argument("--captura", default=CAPTURA, help="Archivo donde se graba la sesion")
+    parser.add_argument("--reproducir", default=REPRODUCIR, help="Captura que se reproduce en vez de abrir el puerto")
+    parser.add_argument("--ventanas", type=int, default=None,
+                        help="Pide esta cantidad de ventanas, las muestra en la consola y termina (sin la interfaz)")
+    parser.add_argument("--continuo", action="store_true",
+                        help="Recibe muestras sin parar y muestra la ventana deslizante hasta Ctrl+C (sin la interfaz)")
+    parser.add_argument("--ventana-continuo", type=int, default=VENTANA_CONTINUO,
+                        help="Muestras de la ventana deslizante del modo continuo")
+    parser.add_argument("--salto-continuo", type=int, default=SALTO_CONTINUO,
+                        help="Cada cuantas muestras se muestran las estadisticas en el modo continuo")
+    args = parser.parse_args(argv)
+    PORT, BAUD_RATE, MODO_BINARIO, SOLO_CRUDO = args.puerto, args.baudios, args.binario, args.solo_crudo
+    BAUDIOS_MAXIMO, REDUCCION_DATOS = args.baudios_maximo, args.reduccion
+    MODO_CUENTAS, CALIBRACION, DETECCION, ORIENTACION = args.cuentas, args.calibracion, args.deteccion, args.orientacion
+    ODR = args.odr
+    MODO_BINARIO = MODO_BINARIO or MODO_CUENTAS
+    CARPETA_DATOS, GUARDAR_PNG, CAPTURA, REPRODUCIR = args.datos, args.png, args.captura, args.reproducir
+    VENTANA_CONTINUO, SALTO_CONTINUO = args.ventana_continuo, args.salto_continuo
+
+    conectar()
+    if args.ventanas is not None:
+        consola(args.ventanas)
+        return 0
+    if args.continuo:
+        try:
+            modo_continuo()
+        except (TimeoutError, ErrorLector, ValueError) as e:
+            print(f"ERROR: Se interrumpio el modo continuo: {e}")
+        terminar_conexion()
+        return 0
+    # PyQt5 y matplotlib se cargan solo para la interfaz
+    from interfaz import ejecutar
+    return ejecutar(sys.modules[__name__])
 
 
-    def request_cierre(self):
-        terminar_conexion()
-        self.close()
-        sys.exit()
-    
-class DataWindow(QWidget):
-    def __init__(self):
-        super().__init__()
-        data = solicitar_ventana()
-        table_data = mostrar_datos(data)
-
-        self.label_acc = QLabel()
-        pixmap_acc = QPixmap('acc.png')
-        self.label_acc.setPixmap(pixmap_acc)
-
-        self.label_gyr = QLabel()
-        pixmap_gyr = QPixmap('gyr.png')
-        self.label_gyr.setPixmap(pixmap_gyr)
-
-        tabla = TableModel(table_data)
-        self.table = QTableView()
-        self.table.resizeColumnsToContents()
-        self.table.resizeRowsToContents()
-        self.table.setMinimumSize(730,250)
-
-        self.table.setModel(tabla)
-
-        fotos = QHBoxLayout()
-        fotos.addWidget(self.table)
-        fotos.addWidget(self.label_acc)
-        fotos.addWidget(self.label_gyr)
-
-        self.setLayout(fotos)
-
-class InputWindow(QWidget):
-    def __init__(self, window: MainWindow):
-        super().__init__()
-        new_layout = QHBoxLayout()
-        label = QLabel("Ingrese la nueva ventana de datos:")
-        window.input = QLineEdit()
-        button_cambio_vent = QPushButton("Cambiar Ventana")
-        button_cambio_vent.clicked.connect(window.cambio_ventana)
-        button_cambio_vent.setStyleSheet("background-color : #84e091")
-
-        new_layout.addWidget(label)
-        new_layout.addWidget(window.input)
-        new_layout.addWidget(button_cambio_vent)
-        
-        self.setLayout(new_layout)
-
-class TableModel(QtCore.QAbstractTableModel):
-
-    def __init__(self, data):
-        super().__init__()
-        self._data = data
-
-    def data(self, index, role):
-        if role == Qt.DisplayRole:
-            # See below for the nested-list data structure.
-            # .row() indexes into the outer list,
-            # .column() indexes into the sub-list
-            return self._data[index.row()][index.column()]
-
-    def rowCount(self, index):
-        # The length of the outer list.
-        return len(self._data)
-
-    def columnCount(self, index):
-        # The following takes the first sub-list, and returns
-        # the length (only works if all rows are an equal length)
-        return len(self._data[0])
-    
-app = QApplication(sys.argv)
-w = MainWindow()
-w.show()
-sys.exit(app.exec_())
+if __name__ == "__main__":
+    sys.exit(main())
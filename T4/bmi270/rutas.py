@@ -0,0 +1,10 @@
+""" Agrega la raiz del repositorio a sys.path para que los scripts de esta
+carpeta importen el paquete comun (el codigo del computador que comparten
+T1 y T4; ver comun/__init__.py). Se importa antes de cualquier modulo de comun.
+"""
+import os
+import sys
+
+RAIZ = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
@@ -0,0 +1,194 @@
+""" Modelos de Qt para las tablas de la interfaz.
+
+Antes cada ventana armaba una lista de listas nueva con los textos de la
+tabla, la envolvia en un TableModel nuevo y se reemplazaba todo el widget.
+Aca los modelos se crean una sola vez y guardan los valores en arreglos de
+numpy; los textos se arman solo para las celdas que la vista pide:
+
+    TablaVentana       RMS y peaks de una ventana, una fila por canal. mostrar()
+                       compara con lo que habia y emite dataChanged solo por las
+                       celdas que cambiaron.
+    HistorialVentanas  una fila por ventana recibida (hora, muestras y RMS de
+                       cada canal). Las filas se entregan a la vista de a
+                       LOTE_FILAS con canFetchMore/fetchMore, asi miles de
+                       ventanas (por ejemplo las de un Almacen) no traban la vista.
+"""
+import time
+
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+import rutas  # Agrega la raiz del repositorio al path para importar comun
+from comun.protocolo import N_PEAKS
+
+LOTE_FILAS = 256  # Filas que se entregan a la vista en cada fetchMore
+
+
+def peaks_con_indices(ventana):
+    """ (peaks, indices) de una Ventana, canales x k. Sin detalle_peaks los
+    indices quedan en -1; con detalle, los peaks que faltan (ventanas con
+    menos muestras que peaks) quedan en nan """
+    indices = np.full(ventana.peaks.shape, -1, dtype=np.int64)
+    peaks = np.array(ventana.peaks, dtype=np.float64)
+    if ventana.detalle_peaks is not None:
+        peaks[:] = np.nan
+        for i, detalle in enumerate(ventana.detalle_peaks):
+            for j, (valor, indice, _) in enumerate(detalle):
+                peaks[i, j] = valor
+                indices[i, j] = indice
+    return peaks, indices
+
+
+class TablaVentana(QAbstractTableModel):
+    """ RMS y peaks de una ventana; las columnas son RMS, Peak 1, ..., Peak k """
+
+    def __init__(self, nombres, n_peaks=N_PEAKS, periodo=1.0, parent=None):
+        super().__init__(parent)
+        self.nombres = tuple(nombres)
+        self.periodo = periodo  # Segundos entre muestras, para el tiempo de cada peak
+        self._valores = np.full((len(self.nombres), 1 + n_peaks), np.nan)
+        self._indices = np.full((len(self.nombres), n_peaks), -1, dtype=np.int64)
+
+    def mostrar(self, rms, peaks, indices=None):
+        """ Cambia los valores de la tabla. indices (canales x k, -1 si no se
+        sabe) es la muestra de cada peak """
+        valores = np.column_stack([np.asarray(rms, dtype=np.float64), np.asarray(peaks, dtype=np.float64)])
+        indices = np.full(self._indices.shape, -1, dtype=np.int64) if indices is None else np.asarray(indices)
+        # nan == nan es False, asi que las celdas vacias se comparan aparte
+        iguales = (valores == self._valores) | (np.isnan(valores) & np.isnan(self._valores))
+        iguales[:, 1:] &= indices == self._indices
+        self._valores = valores
+        self._indices = indices
+        for fila in np.flatnonzero(~iguales.all(axis=1)):
+            columnas = np.flatnonzero(~iguales[fila])
+            self.dataChanged.emit(self.index(fila, columnas[0]), self.index(fila, columnas[-1]))
+
+    def mostrar_ventana(self, ventana):
+        """ Muestra el RMS y los peaks de una Ventana """
+        self.mostrar(ventana.rms, *peaks_con_indices(ventana))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._valores.shape[0]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._valores.shape[1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        fila, columna = index.row(), index.column()
+        valor = self._valores[fila, columna]
+        indice = self._indices[fila, columna - 1] if columna > 0 else -1
+        if role == Qt.DisplayRole:
+            if np.isnan(valor):
+                return ""
+            if indice >= 0:
+                return f"{valor:.4f} (t = {indice * self.periodo:g} s)"
+            return float(valor)
+        if role == Qt.ToolTipRole and indice >= 0:
+            return f"Muestra {indice} de la ventana"
+
+    def headerData(self, seccion, orientacion, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientacion == Qt.Vertical:
+            return self.nombres[seccion]
+        return "RMS" if seccion == 0 else f"Peak {seccion}"
+
+
+class HistorialVentanas(QAbstractTableModel):
+    """ Una fila por ventana recibida, con las columnas Hora, Muestras y el RMS de cada canal """
+
+    def __init__(self, nombres, n_peaks=N_PEAKS, lote=LOTE_FILAS, parent=None):
+        super().__init__(parent)
+        self.nombres = tuple(nombres)
+        self.lote = lote
+        canales = len(self.nombres)
+        self._tiempos = np.empty(1024, dtype=np.float64)
+        self._muestras = np.empty(1024, dtype=np.int64)
+        self._rms = np.empty((1024, canales), dtype=np.float32)
+        self._peaks = np.empty((1024, canales, n_peaks), dtype=np.float32)
+        self._indices = np.empty((1024, canales, n_peaks), dtype=np.int64)
+        self._n = 0  # Ventanas guardadas
+        self._cargadas = 0  # Ventanas que ya se entregaron a la vista
+
+    def __len__(self):
+        return self._n
+
+    def _crecer(self, m):
+        """ Deja espacio para m ventanas mas, duplicando la capacidad """
+        if self._n + m <= len(self._tiempos):
+            return
+        capacidad = max(2 * len(self._tiempos), self._n + m)
+        for nombre in ("_tiempos", "_muestras", "_rms", "_peaks", "_indices"):
+            viejo = getattr(self, nombre)
+            nuevo = np.empty((capacidad,) + viejo.shape[1:], dtype=viejo.dtype)
+            nuevo[:self._n] = viejo[:self._n]
+            setattr(self, nombre, nuevo)
+
+    def cargar(self, tiempos, muestras, rms, peaks, indices=None):
+        """ Agrega muchas ventanas de una vez; la vista las pide con fetchMore """
+        m = len(tiempos)
+        self._crecer(m)
+        fin = self._n + m
+        self._tiempos[self._n:fin] = tiempos
+        self._muestras[self._n:fin] = muestras
+        self._rms[self._n:fin] = rms
+        self._peaks[self._n:fin] = peaks
+        self._indices[self._n:fin] = -1 if indices is None else indices
+        self._n = fin
+
+    def cargar_almacen(self, almacen):
+        """ Agrega las ventanas guardadas en un almacenamiento.Almacen """
+        if almacen.nombres != self.nombres:
+            raise ValueError(f"El almacen tiene los canales {almacen.nombres}, no {self.nombres}")
+        self.cargar(almacen.tiempos, almacen.indice['largo'], almacen.rms, almacen.peaks)
+
+    def agregar(self, ventana, tiempo=None):
+        """ Agrega una Ventana recien recibida """
+        al_dia = self._cargadas == self._n
+        peaks, indices = peaks_con_indices(ventana)
+        self.cargar([time.time() if tiempo is None else tiempo], [len(ventana)], [ventana.rms], [peaks], [indices])
+        if al_dia:
+            # Si la vista ya tenia todas las filas la nueva se muestra de inmediato
+            self.beginInsertRows(QModelIndex(), self._cargadas, self._cargadas)
+            self._cargadas += 1
+            self.endInsertRows()
+
+    def resumen(self, fila):
+        """ (rms, peaks, indices) de una ventana, como los recibe TablaVentana.mostrar """
+        return self._rms[fila], self._peaks[fila], self._indices[fila]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._cargadas < self._n
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        m = min(self.lote, self._n - self._cargadas)
+        if m <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._cargadas, self._cargadas + m - 1)
+        self._cargadas += m
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._cargadas
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 2 + len(self.nombres)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        fila, columna = index.row(), index.column()
+        if columna == 0:
+            return time.strftime("%H:%M:%S", time.localtime(self._tiempos[fila]))
+        if columna == 1:
+            return int(self._muestras[fila])
+        return float(self._rms[fila, columna - 2])
+
+    def headerData(self, seccion, orientacion, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientacion == Qt.Vertical:
+            return seccion + 1
+        return ("Hora", "Muestras")[seccion] if seccion < 2 else f"RMS {self.nombres[seccion - 2]}"
@@ -0,0 +1,9 @@
+""" Codigo del computador que comparten los receptores de T1 (BME688) y T4 (BMI270).
+
+Aca va lo que no depende del sensor, empezando por el protocolo con la ESP32.
+Lo propio de cada sensor (su receiver.py y los modulos que solo usa ese
+sensor) queda en su carpeta, que importa este paquete despues de import rutas.
+
+Los modulos con consola se corren desde la raiz del repositorio con
+python -m comun.<modulo>.
+"""
@@ -0,0 +1,308 @@
+""" Almacenamiento en disco de las ventanas recibidas.
+
+Cada carpeta de almacenamiento tiene un archivo por columna, a los que solo
+se les agregan datos al final:
+
+    esquema.json         nombres de los canales, numero de peaks y tamano de bloque reducido
+    indice.bin           por ventana: tiempo (float64), inicio y largo de sus muestras
+    crudo_<canal>.f32    muestras de cada canal, una ventana tras otra
+    fft_<canal>.c64      FFT de cada canal (n valores por ventana, mismo inicio que las muestras)
+    rms.f32              canales floats por ventana
+    peaks.f32            canales x N_PEAKS floats por ventana
+    reducido_<canal>.f32 opcional (EscritorAlmacen(..., reduccion=tam)): minimo y maximo
+                         de cada bloque de tam muestras (decimacion.bloques_min_max),
+                         ceil(largo / tam) pares por ventana
+
+EscritorAlmacen escribe desde su propio hilo: agregar() solo deja una copia
+de la ventana en una cola, asi el lector serial nunca espera al disco. Las
+ventanas se escriben en lotes y se hace fsync cada intervalo_fsync segundos.
+indice.bin se escribe despues de las columnas, entonces una ventana existe
+solo si esta en el indice; al abrir para escribir se recortan los restos de
+una escritura interrumpida.
+
+Almacen lee la carpeta con numpy.memmap, sin cargar ni reparsear nada:
+
+    almacen = Almacen('datos')
+    almacen.columna('acc_x')        # todas las muestras de acc_x
+    almacen.ventana(-1)             # la ultima ventana como Ventana
+    almacen.entre(t0, t1)           # ventanas recibidas entre t0 y t1
+    almacen.reducida('acc_x')       # minimo y maximo por bloque de todo acc_x
+
+El nivel reducido sirve para graficar o recorrer sesiones largas sin leer
+todas las muestras; las muestras originales siguen en crudo_<canal>.f32.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .protocolo import N_PEAKS
+from .ventana import Ventana
+from .decimacion import bloques_min_max
+
+DTYPE_INDICE = np.dtype([('tiempo', '<f8'), ('inicio', '<i8'), ('largo', '<i4')])
+TAM_LOTE = 64  # Maximo de ventanas por escritura
+INTERVALO_FSYNC = 5  # Segundos entre cada fsync
+_FIN = None  # Marca que se pone en la cola para detener el hilo
+
+
+class ErrorAlmacen(Exception):
+    """ Error al escribir o leer una carpeta de almacenamiento """
+
+
+def _columnas(nombres, reduccion=None):
+    """ Nombre de archivo y dtype de cada columna """
+    columnas = {}
+    for nombre in nombres:
+        columnas[f"crudo_{nombre}"] = np.dtype('<f4')
+        columnas[f"fft_{nombre}"] = np.dtype('<c8')
+        if reduccion is not None:
+            columnas[f"reducido_{nombre}"] = np.dtype('<f4')
+    columnas["rms"] = np.dtype('<f4')
+    columnas["peaks"] = np.dtype('<f4')
+    return columnas
+
+
+def _bloques(largos, reduccion):
+    """ Bloques del nivel reducido de cada ventana """
+    return -(-np.asarray(largos, dtype=np.int64) // reduccion)
+
+
+def _largos(indice, canales, n_peaks, reduccion):
+    """ Elementos de cada columna que corresponden a las ventanas del indice;
+    las de muestras (crudo_ y fft_) no aparecen y usan la clave None """
+    ventanas = len(indice)
+    largos = {"rms": ventanas * canales, "peaks": ventanas * canales * n_peaks,
+              None: int(indice['inicio'][-1] + indice['largo'][-1]) if ventanas else 0}
+    if reduccion is not None:
+        largos["reducido"] = 2 * int(_bloques(indice['largo'], reduccion).sum())
+    return largos
+
+
+def _largo(largos, columna):
+    if columna.startswith("reducido_"):
+        return largos["reducido"]
+    return largos.get(columna, largos[None])
+
+
+def _ruta(carpeta, columna):
+    extension = "c64" if columna.startswith("fft_") else "f32"
+    return os.path.join(carpeta, f"{columna}.{extension}")
+
+
+def _mapear(ruta, dtype, largo=None):
+    """ memmap de solo lectura de los primeros largo elementos del archivo """
+    disponibles = os.path.getsize(ruta) // dtype.itemsize if os.path.exists(ruta) else 0
+    largo = disponibles if largo is None else min(largo, disponibles)
+    if largo == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(ruta, dtype=dtype, mode='r', shape=(largo,))
+
+
+def _leer_esquema(carpeta):
+    ruta = os.path.join(carpeta, "esquema.json")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta) as archivo:
+        return json.load(archivo)
+
+
+class EscritorAlmacen(threading.Thread):
+    """ Hilo que agrega ventanas al final de una carpeta de almacenamiento """
+
+    def __init__(self, carpeta, nombres, n_peaks=N_PEAKS, tam_lote=TAM_LOTE, intervalo_fsync=INTERVALO_FSYNC,
+                 reduccion=None):
+        super().__init__(daemon=True)
+        self.carpeta = carpeta
+        self.nombres = tuple(nombres)
+        self.n_peaks = n_peaks
+        self.reduccion = reduccion  # Muestras por bloque del nivel reducido, None sin nivel reducido
+        self.tam_lote = tam_lote
+        self.intervalo_fsync = intervalo_fsync
+        self.error = None
+        self.ventanas_escritas = 0
+        self._cola = queue.Queue()
+
+        os.makedirs(carpeta, exist_ok=True)
+        esquema = _leer_esquema(carpeta)
+        if esquema is None:
+            with open(os.path.join(carpeta, "esquema.json"), "w") as archivo:
+                json.dump({"nombres": list(self.nombres), "n_peaks": n_peaks, "reduccion": reduccion}, archivo)
+        elif tuple(esquema["nombres"]) != self.nombres or esquema["n_peaks"] != n_peaks:
+            raise ErrorAlmacen(f"{carpeta} tiene canales {esquema['nombres']} y {esquema['n_peaks']} peaks, "
+                               f"no {list(self.nombres)} y {n_peaks}")
+        elif esquema.get("reduccion") != reduccion:
+            raise ErrorAlmacen(f"{carpeta} tiene nivel reducido {esquema.get('reduccion')}, no {reduccion}")
+        self._recortar()
+        self._archivos = {columna: open(_ruta(carpeta, columna), "ab")
+                          for columna in _columnas(self.nombres, reduccion)}
+        self._indice = open(os.path.join(carpeta, "indice.bin"), "ab")
+
+    def _recortar(self):
+        """ Deja cada columna del largo que indica el indice, descartando lo
+        que haya quedado de una escritura interrumpida """
+        ruta_indice = os.path.join(self.carpeta, "indice.bin")
+        if not os.path.exists(ruta_indice):
+            open(ruta_indice, "wb").close()
+        ventanas = os.path.getsize(ruta_indice) // DTYPE_INDICE.itemsize
+        indice = _mapear(ruta_indice, DTYPE_INDICE, ventanas)
+        largos = _largos(indice, len(self.nombres), self.n_peaks, self.reduccion)
+        del indice
+        with open(ruta_indice, "r+b") as archivo:
+            archivo.truncate(ventanas * DTYPE_INDICE.itemsize)
+        for columna, dtype in _columnas(self.nombres, self.reduccion).items():
+            ruta = _ruta(self.carpeta, columna)
+            with open(ruta, "a+b") as archivo:
+                archivo.truncate(_largo(largos, columna) * dtype.itemsize)
+        self._muestras = largos[None]
+
+    def agregar(self, ventana, tiempo=None):
+        """ Deja una copia de la ventana para escribirla; no espera al disco """
+        if self.error is not None:
+            raise ErrorAlmacen(f"Se detuvo la escritura en {self.carpeta}: {self.error}")
+        if ventana.nombres != self.nombres or ventana.peaks.shape[1] != self.n_peaks:
+            raise ErrorAlmacen(f"La ventana no coincide con el esquema de {self.carpeta}")
+        self._cola.put((time.time() if tiempo is None else tiempo, ventana.datos.copy(), len(ventana)))
+
+    def run(self):
+        ultimo_fsync = time.monotonic()
+        pendiente = False
+        terminar = False
+        try:
+            while not terminar:
+                try:
+                    lote = [self._cola.get(timeout=self.intervalo_fsync)]
+                except queue.Empty:
+                    lote = []
+                while lote and len(lote) < self.tam_lote:
+                    try:
+                        lote.append(self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                if _FIN in lote:
+                    terminar = True
+                    lote = lote[:lote.index(_FIN)]
+                if lote:
+                    self._escribir(lote)
+                    pendiente = True
+                if pendiente and (terminar or time.monotonic() - ultimo_fsync >= self.intervalo_fsync):
+                    self._sincronizar()
+                    ultimo_fsync = time.monotonic()
+                    pendiente = False
+        except Exception as e:
+            self.error = e
+        finally:
+            for archivo in list(self._archivos.values()) + [self._indice]:
+                archivo.close()
+
+    def _escribir(self, lote):
+        """ Escribe un lote de ventanas: una sola escritura por columna """
+        partes = {columna: [] for columna in self._archivos}
+        registros = np.empty(len(lote), dtype=DTYPE_INDICE)
+        for j, (tiempo, datos, n) in enumerate(lote):
+            ventana = Ventana(len(self.nombres), n, self.n_peaks, self.nombres)
+            ventana.datos[:] = datos
+            reducido = None if self.reduccion is None else bloques_min_max(ventana.crudo, self.reduccion)
+            for i, nombre in enumerate(self.nombres):
+                partes[f"crudo_{nombre}"].append(ventana.crudo[i].tobytes())
+                partes[f"fft_{nombre}"].append(ventana.fft[i].tobytes())
+                if reducido is not None:
+                    partes[f"reducido_{nombre}"].append(reducido[i].tobytes())
+            partes["rms"].append(ventana.rms.tobytes())
+            partes["peaks"].append(ventana.peaks.tobytes())
+            registros[j] = (tiempo, self._muestras, n)
+            self._muestras += n
+        for columna, archivo in self._archivos.items():
+            archivo.write(b"".join(partes[columna]))
+            archivo.flush()
+        # El indice va al final: una ventana solo existe cuando sus columnas ya estan escritas
+        self._indice.write(registros.tobytes())
+        self._indice.flush()
+        self.ventanas_escritas += len(lote)
+
+    def _sincronizar(self):
+        for archivo in self._archivos.values():
+            os.fsync(archivo.fileno())
+        os.fsync(self._indice.fileno())
+
+    def detener(self):
+        """ Escribe lo que quede en la cola, hace fsync y termina el hilo """
+        self._cola.put(_FIN)
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+class Almacen:
+    """ Lectura de una carpeta de almacenamiento con numpy.memmap """
+
+    def __init__(self, carpeta):
+        esquema = _leer_esquema(carpeta)
+        if esquema is None:
+            raise ErrorAlmacen(f"{carpeta} no es una carpeta de almacenamiento (falta esquema.json)")
+        self.carpeta = carpeta
+        self.nombres = tuple(esquema["nombres"])
+        self.n_peaks = esquema["n_peaks"]
+        self.reduccion = esquema.get("reduccion")  # Las carpetas antiguas no tienen nivel reducido
+        self.actualizar()
+
+    def actualizar(self):
+        """ Vuelve a mapear los archivos para ver las ventanas escritas despues de abrir """
+        self.indice = _mapear(os.path.join(self.carpeta, "indice.bin"), DTYPE_INDICE)
+        ventanas = len(self.indice)
+        canales = len(self.nombres)
+        largos = _largos(self.indice, canales, self.n_peaks, self.reduccion)
+        self._columnas = {}
+        for columna, dtype in _columnas(self.nombres, self.reduccion).items():
+            self._columnas[columna] = _mapear(_ruta(self.carpeta, columna), dtype, _largo(largos, columna))
+        self.rms = self._columnas["rms"].reshape(ventanas, canales)
+        self.peaks = self._columnas["peaks"].reshape(ventanas, canales, self.n_peaks)
+        if self.reduccion is not None:
+            # Primer bloque reducido de cada ventana (y el total al final)
+            self._inicio_bloques = np.concatenate([[0], np.cumsum(_bloques(self.indice['largo'], self.reduccion))])
+
+    def __len__(self):
+        return len(self.indice)
+
+    @property
+    def tiempos(self):
+        return self.indice['tiempo']
+
+    def columna(self, nombre):
+        """ Todas las muestras guardadas de un canal (memmap, sin copiar) """
+        return self._columnas[f"crudo_{nombre}"]
+
+    def fft(self, nombre):
+        """ Todas las FFT guardadas de un canal, una ventana tras otra """
+        return self._columnas[f"fft_{nombre}"]
+
+    def reducida(self, nombre, i=None):
+        """ Minimo y maximo por bloque de reduccion muestras de un canal, como
+        arreglo bloques x 2; de todas las ventanas o solo de la ventana i """
+        if self.reduccion is None:
+            raise ErrorAlmacen(f"{self.carpeta} no tiene nivel reducido")
+        pares = self._columnas[f"reducido_{nombre}"].reshape(-1, 2)
+        if i is None:
+            return pares
+        i = range(len(self))[i]
+        return pares[self._inicio_bloques[i]:self._inicio_bloques[i + 1]]
+
+    def ventana(self, i):
+        """ Retorna la ventana i como Ventana (una copia) """
+        tiempo, inicio, largo = self.indice[i]
+        ventana = Ventana(len(self.nombres), int(largo), self.n_peaks, self.nombres)
+        for j, nombre in enumerate(self.nombres):
+            ventana.crudo[j] = self.columna(nombre)[inicio:inicio + largo]
+            ventana.fft[j] = self.fft(nombre)[inicio:inicio + largo]
+        ventana.rms[:] = self.rms[i]
+        ventana.peaks[:] = self.peaks[i]
+        return ventana
+
+    def entre(self, desde=None, hasta=None):
+        """ Indices (range) de las ventanas con desde <= tiempo < hasta """
+        tiempos = self.tiempos
+        inicio = 0 if desde is None else int(np.searchsorted(tiempos, desde, side='left'))
+        fin = len(tiempos) if hasta is None else int(np.searchsorted(tiempos, hasta, side='left'))
+        return range(inicio, fin)
@@ -0,0 +1,195 @@
+""" Calculo de RMS, peaks y FFT de una ventana en el computador.
+
+La ESP32 calcula la FFT con una DFT de doble ciclo (O(n^2), con cos y sin
+por termino) y manda la parte real e imaginaria en texto, lo que duplica lo
+que se envia por la UART. Con el comando CRUDO la ESP32 solo envia las
+muestras y aca se calcula todo de una vez para todos los canales con numpy.
+verificar() compara lo calculado aca con lo que haya enviado la ESP32.
+
+El tamano de la ventana cambia en ejecucion (cambiar_ventana), pero casi
+siempre llegan muchas ventanas seguidas del mismo tamano. Lo que depende solo
+del tamano y de los canales se prepara una vez en un PlanFFT: la funcion de
+ventana (Hann o Hamming), el eje de frecuencias y los buffers de la entrada
+y de la salida, asi una ventana repetida no reserva memoria. Los planes se
+guardan en un cache LRU de MAX_PLANES tamanos (plan_fft). Los coeficientes
+(twiddles) de la FFT no se guardan aca: numpy.fft ya los guarda por tamano.
+
+resumir() entrega de una vez, para todos los canales de una matriz canales x
+muestras, lo que antes se calculaba canal por canal (RMS, media, extremos,
+peaks y magnitud de la FFT con su frecuencia dominante) y magnitudes() la
+norma por muestra de grupos de canales (los 3 ejes del acelerometro, por
+ejemplo). Cada calculo es una sola llamada de numpy sobre toda la matriz,
+asi el costo crece con el total de muestras y no con el numero de canales.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from .protocolo import N_PEAKS
+
+VENTANAS = {"rectangular": None, "hann": np.hanning, "hamming": np.hamming}  # Funciones de ventana para la FFT
+MAX_PLANES = 8  # Tamanos de ventana (con sus canales) que se guardan en el cache
+# numpy.fft acepta out= recien desde numpy 2.0; antes el resultado se copia al buffer del plan
+RFFT_CON_OUT = np.lib.NumpyVersion(np.__version__) >= "2.0.0"
+
+# Un valor por canal, salvo peaks (canales x k) y magnitud_fft (canales x
+# frecuencias, sin las negativas, con frecuencias en Hz)
+Resumen = namedtuple('Resumen', ['rms', 'media', 'minimo', 'maximo', 'peaks', 'magnitud_fft', 'frecuencias',
+                                 'frecuencia_dominante'])
+
+
+def calcular_rms(crudo):
+    """ RMS de cada canal (fila) de crudo """
+    return np.sqrt(np.mean(np.square(crudo, dtype=np.float64), axis=-1))
+
+
+def calcular_peaks(crudo, k=N_PEAKS):
+    """ Los k valores mas altos de cada canal, de mayor a menor.
+    Si la ventana tiene menos de k muestras se rellena con nan """
+    n = crudo.shape[-1]
+    peaks = np.full(crudo.shape[:-1] + (k,), np.nan, dtype=np.float32)
+    m = min(k, n)
+    if m == 0:
+        return peaks
+    mayores = np.partition(crudo, n - m, axis=-1)[..., n - m:]
+    peaks[..., :m] = -np.sort(-mayores, axis=-1)
+    return peaks
+
+
+class PlanFFT:
+    """ Lo que se prepara una vez para las FFT de n muestras de los canales
+    de forma: la funcion de ventana, el eje de frecuencias y los buffers """
+
+    def __init__(self, n, forma, ventana="rectangular", periodo=1.0):
+        if ventana not in VENTANAS:
+            raise ValueError(f"Ventana {ventana!r} invalida, debe ser una de {list(VENTANAS)}")
+        self.n = n
+        self.forma = tuple(forma)
+        self.periodo = periodo
+        funcion = VENTANAS[ventana]
+        self.ventana = None if funcion is None else funcion(n).astype(np.float32)
+        # Con una funcion de ventana se normaliza por su suma para que la amplitud de un tono no cambie
+        self.normalizacion = n if self.ventana is None else float(self.ventana.sum())
+        self.frecuencias = np.fft.rfftfreq(n, periodo)  # Hz de cada valor de la FFT sin las negativas
+        self.frecuencias_completas = np.fft.fftfreq(n, periodo)  # Hz de los n valores que envia la ESP32
+        self._entrada = np.empty(self.forma + (n,), dtype=np.float32)
+        self._espectro = np.empty(self.forma + (n // 2 + 1,), dtype=np.complex64)
+        self._completa = np.empty(self.forma + (n,), dtype=np.complex64)
+        self._lock = threading.Lock()  # Los buffers son compartidos (el simulador corre en otro hilo)
+
+    def fft(self, crudo, completa=True, out=None):
+        """ Como calcular_fft, pero el resultado queda en out (que puede ser
+        una vista como ventana.fft) o en un buffer del plan que se reutiliza
+        en la siguiente llamada """
+        with self._lock:
+            datos = crudo
+            if self.ventana is not None:
+                datos = np.multiply(crudo, self.ventana, out=self._entrada)
+            elif crudo.dtype != np.float32:
+                datos = self._entrada
+                datos[...] = crudo
+            if RFFT_CON_OUT:
+                espectro = np.fft.rfft(datos, axis=-1, out=self._espectro)
+            else:
+                espectro = self._espectro
+                espectro[...] = np.fft.rfft(datos, axis=-1)
+            espectro /= self.normalizacion
+            if not completa:
+                if out is None:
+                    return espectro
+                out[...] = espectro
+                return out
+            resultado = self._completa if out is None else out
+            m = espectro.shape[-1]
+            resultado[..., :m] = espectro
+            resultado[..., m:] = np.conj(espectro[..., 1:self.n - m + 1][..., ::-1])
+            return resultado
+
+
+_planes = OrderedDict()
+_lock_planes = threading.Lock()
+
+
+def plan_fft(n, forma, ventana="rectangular", periodo=1.0):
+    """ El PlanFFT de ese tamano del cache, creandolo si no esta (se descarta
+    el que lleva mas tiempo sin usarse) """
+    clave = (n, tuple(forma), ventana, periodo)
+    with _lock_planes:
+        plan = _planes.get(clave)
+        if plan is not None:
+            _planes.move_to_end(clave)
+            return plan
+        plan = _planes[clave] = PlanFFT(n, forma, ventana, periodo)
+        if len(_planes) > MAX_PLANES:
+            _planes.popitem(last=False)
+        return plan
+
+
+def calcular_fft(crudo, completa=True, ventana="rectangular"):
+    """ FFT de cada canal, normalizada por n igual que calcularFFT de la ESP32.
+    Se calcula con rfft; con completa=True se agregan las frecuencias negativas
+    (conjugadas) para tener los n valores que envia la ESP32. Con ventana
+    "hann" o "hamming" las muestras se multiplican antes por esa funcion """
+    n = crudo.shape[-1]
+    resultado = np.empty(crudo.shape[:-1] + (n if completa else n // 2 + 1,), dtype=np.complex64)
+    return plan_fft(n, crudo.shape[:-1], ventana).fft(crudo, completa, resultado)
+
+
+def analizar(ventana):
+    """ Calcula RMS, FFT y peaks a partir de ventana.crudo y los guarda en la ventana """
+    ventana.rms[:] = calcular_rms(ventana.crudo)
+    # La FFT se escribe directo en la ventana, con el plan de su tamano
+    plan_fft(len(ventana), ventana.crudo.shape[:-1]).fft(ventana.crudo, out=ventana.fft)
+    ventana.peaks[:] = calcular_peaks(ventana.crudo, ventana.peaks.shape[-1])
+    return ventana
+
+
+def resumir(crudo, periodo=1.0, k=N_PEAKS, ventana="rectangular"):
+    """ Resumen de una matriz canales x muestras, todos los canales a la vez.
+    periodo son los segundos entre muestras (para el eje de frecuencias) y
+    ventana la funcion que se aplica antes de la FFT """
+    crudo = np.asarray(crudo)
+    n = crudo.shape[-1]
+    if n == 0:
+        # Sin muestras no hay extremos ni FFT: los valores por canal quedan en nan
+        return Resumen(*(np.full(crudo.shape[:-1], np.nan) for _ in range(4)), calcular_peaks(crudo, k),
+                       np.empty(crudo.shape[:-1] + (0,), dtype=np.float32), np.empty(0),
+                       np.full(crudo.shape[:-1], np.nan))
+    plan = plan_fft(n, crudo.shape[:-1], ventana, periodo)
+    espectro = plan.fft(crudo, False, np.empty(crudo.shape[:-1] + (n // 2 + 1,), dtype=np.complex64))
+    magnitud = np.abs(espectro)
+    # La componente continua no cuenta para la frecuencia dominante
+    dominante = plan.frecuencias[np.argmax(magnitud[..., 1:], axis=-1) + 1] if n > 1 else np.zeros(crudo.shape[:-1])
+    return Resumen(calcular_rms(crudo), crudo.mean(axis=-1), crudo.min(axis=-1), crudo.max(axis=-1),
+                   calcular_peaks(crudo, k), magnitud, plan.frecuencias, dominante)
+
+
+def magnitudes(crudo, grupos):
+    """ Norma por muestra de cada grupo de canales de crudo (canales x
+    muestras). grupos es {nombre: indices de sus filas}, todos del mismo
+    largo; retorna {nombre: arreglo con la norma de cada muestra} """
+    nombres = list(grupos)
+    indices = np.array([grupos[nombre] for nombre in nombres])
+    normas = np.sqrt(np.square(np.asarray(crudo, dtype=np.float64)[indices]).sum(axis=1))
+    return dict(zip(nombres, normas))
+
+
+def verificar(ventana, rtol=1e-3, atol=1e-3):
+    """ Compara el RMS, la FFT y los peaks que envio la ESP32 con los calculados
+    aca. Retorna {seccion: (error maximo, canales que no coinciden)} """
+    calculado = {
+        "rms": calcular_rms(ventana.crudo),
+        "fft": calcular_fft(ventana.crudo),
+        "peaks": calcular_peaks(ventana.crudo, ventana.peaks.shape[-1]),
+    }
+    enviado = {"rms": ventana.rms, "fft": ventana.fft, "peaks": ventana.peaks}
+    resultado = {}
+    for seccion, valores in calculado.items():
+        esperado = enviado[seccion]
+        error = np.abs(valores - esperado)
+        distintos = ~np.isclose(esperado, valores, rtol=rtol, atol=atol, equal_nan=True)
+        distintos = distintos.reshape(len(ventana.nombres), -1).any(axis=1)
+        error_maximo = float(np.nanmax(error)) if error.size else 0.0
+        resultado[seccion] = (error_maximo, [ventana.nombres[i] for i in np.flatnonzero(distintos)])
+    return resultado
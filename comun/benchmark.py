@@ -0,0 +1,334 @@
+""" Mediciones de rendimiento de la cadena recepcion -> parseo -> analisis -> graficos.
+
+Cada etapa se corre con ventanas sinteticas de varios tamanos y numeros de
+canales (4 para la BME688, 6 para la BMI270) y se reporta, por caso:
+
+    muestras_por_segundo   filas de la ventana procesadas por segundo (mediana)
+    p50_ms, p99_ms         latencia por ventana
+    rss_pico_mb            memoria maxima del proceso hasta ese momento
+
+Etapas:
+    parseo_texto      bytes del modo texto -> DivisorLineas -> EnsambladorTexto (en lotes) -> Ventana
+    parseo_binario    bytes de frames -> DecodificadorFrames -> Ventana.desde_frames
+    analisis          RMS, FFT y peaks en el computador (analisis.analizar)
+    resumen           analisis.resumir: RMS, extremos, peaks y magnitud de la FFT de todos los canales
+    extremo_a_extremo BEGIN -> ventana completa contra la ESP32 simulada (simulador.py)
+    captura           los bytes recibidos de una captura (captura.py), si se da --captura
+    inicio            con --inicio: segundos para importar receiver.py y sus dependencias
+                      pesadas en un interprete nuevo, y desde lanzar
+                      "receiver.py --ventanas 1" hasta que el BEGIN llega al puerto
+
+Se corre desde el benchmark.py de T1 o T4, que indican su receiver.py y sus
+canales y agregan sus propias etapas (graficos con las funciones de su
+receiver.py y, en T4, orientacion). Los resultados se guardan en JSON para
+comparar entre versiones:
+
+    python benchmark.py --tamanos 20 1000 100000 --salida resultados.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from .protocolo import (DecodificadorFrames, EnsambladorTexto, codificar_frame, LOTE_LINEAS, TIPO_MUESTRAS_F32, TIPO_RMS,
+                       TIPO_FFT, TIPO_PEAKS, TIPO_FIN)
+from .lector import DivisorLineas
+from .ventana import Ventana
+from .analisis import analizar, resumir, calcular_rms, calcular_fft, calcular_peaks
+
+TAMANOS = (20, 1000, 100000)
+CANALES = (4, 6)
+ETAPAS = ("parseo_texto", "parseo_binario", "analisis", "resumen", "extremo_a_extremo")
+FILAS_POR_FRAME = 64
+# Lo que se mide en la etapa inicio: el receptor y lo que carga perezosamente (T4 agrega su interfaz)
+MODULOS_INICIO = ("receiver", "serial", "matplotlib.pyplot")
+
+
+def rss_pico_mb():
+    """ Memoria residente maxima del proceso en MB (None si no se puede medir) """
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo entrega en KB y macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def medir(funcion, repeticiones, tiempo_maximo):
+    """ Corre funcion hasta repeticiones veces (al menos 3) o hasta gastar
+    tiempo_maximo segundos; retorna la duracion de cada corrida """
+    duraciones = []
+    inicio = time.perf_counter()
+    while len(duraciones) < repeticiones:
+        t0 = time.perf_counter()
+        funcion()
+        duraciones.append(time.perf_counter() - t0)
+        if len(duraciones) >= 3 and time.perf_counter() - inicio > tiempo_maximo:
+            break
+    return np.array(duraciones)
+
+
+def resumen(etapa, canales, n, duraciones, **extra):
+    mediana = float(np.median(duraciones))
+    resultado = {
+        "etapa": etapa,
+        "canales": canales,
+        "n": n,
+        "repeticiones": len(duraciones),
+        "muestras_por_segundo": n / mediana if n and mediana > 0 else None,
+        "p50_ms": mediana * 1000,
+        "p99_ms": float(np.percentile(duraciones, 99)) * 1000,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+    resultado.update(extra)
+    return resultado
+
+
+def muestras_sinteticas(canales, n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return rng.standard_normal((n, canales)).astype(np.float32)
+
+
+def bytes_texto(muestras):
+    """ Una ventana completa como la envia la ESP32 en modo texto """
+    def linea(valores):
+        return " ".join(f"{valor:f}" for valor in valores) + "\n"
+    fft = calcular_fft(muestras.T).T
+    partes = [linea(fila) for fila in muestras]
+    partes.append(linea(calcular_rms(muestras.T)))
+    partes += [linea(fila) for fila in np.stack([fft.real, fft.imag], axis=-1).reshape(len(fft), -1)]
+    partes += [linea(fila) for fila in calcular_peaks(muestras.T).T]
+    return "".join(partes).encode() + b"FINISH\0"
+
+
+def bytes_binario(muestras):
+    """ Una ventana completa como la envia la ESP32 en frames """
+    fft = calcular_fft(muestras.T).T
+    partes = [codificar_frame(TIPO_MUESTRAS_F32, i, muestras[i:i + FILAS_POR_FRAME])
+              for i in range(0, len(muestras), FILAS_POR_FRAME)]
+    partes.append(codificar_frame(TIPO_RMS, 0, calcular_rms(muestras.T)))
+    partes += [codificar_frame(TIPO_FFT, i, fft[i:i + FILAS_POR_FRAME]) for i in range(0, len(fft), FILAS_POR_FRAME)]
+    partes.append(codificar_frame(TIPO_PEAKS, 0, calcular_peaks(muestras.T).T))
+    partes.append(codificar_frame(TIPO_FIN, 0, canales=muestras.shape[1]))
+    return b"".join(partes)
+
+
+def trozos(datos, tam=4096):
+    """ Los bytes en bloques como los entrega LectorSerial """
+    return [datos[i:i + tam] for i in range(0, len(datos), tam)]
+
+
+def parsear_texto(bloques, canales):
+    divisor = DivisorLineas()
+    ensamblador = EnsambladorTexto(canales)
+    lineas = []
+    for bloque in bloques:
+        # Como leer_lineas cuando el lector tiene varios bloques en la cola
+        lineas += divisor.alimentar(bloque)
+        if len(lineas) < LOTE_LINEAS and b"FINISH" not in lineas[-1:]:
+            continue
+        if ensamblador.agregar_lineas(lineas)[1]:
+            return Ventana.desde_arreglos(*ensamblador.ventana())
+        lineas = []
+    raise ValueError("La ventana de texto no termino en FINISH")
+
+
+def parsear_binario(bloques):
+    decodificador = DecodificadorFrames()
+    frames = []
+    for bloque in bloques:
+        for frame in decodificador.alimentar(bloque):
+            if frame.tipo == TIPO_FIN:
+                return Ventana.desde_frames(frames)
+            frames.append(frame)
+    raise ValueError("La ventana binaria no termino en un frame FIN")
+
+
+def extremo_a_extremo(canales, n, binario, repeticiones, tiempo_maximo):
+    """ Ventanas pedidas a la ESP32 simulada. Se usa un pty si se puede: con
+    socket:// pyserial reporta in_waiting de a 1 byte y se mediria eso """
+    from .simulador import ESP32Simulada
+    from .dispositivos import Dispositivo
+    simulador = ESP32Simulada(canales, n, semilla=0)
+    puerto = simulador.abrir_tcp() if os.name == "nt" else simulador.abrir_pty()
+    dispositivo = Dispositivo(puerto, canales, binario=binario)
+    dispositivo.conectar()
+    try:
+        return medir(dispositivo.solicitar_ventana, repeticiones, tiempo_maximo)
+    finally:
+        dispositivo.terminar_conexion()
+        simulador.detener()
+
+
+def medir_captura(ruta, canales, repeticiones, tiempo_maximo):
+    """ Parseo de todos los bytes recibidos en una captura, en los bloques grabados """
+    from .captura import leer_captura, RECIBIDO
+    bloques = [datos for _, direccion, datos in leer_captura(ruta) if direccion == RECIBIDO]
+    contador = {}
+
+    def parsear():
+        divisor = DivisorLineas()
+        decodificador = DecodificadorFrames(guardar_texto=True)
+        ensamblador = EnsambladorTexto(canales)
+        ventanas = muestras = 0
+        for bloque in bloques:
+            for frame in decodificador.alimentar(bloque):
+                if frame.tipo == TIPO_MUESTRAS_F32:
+                    muestras += len(frame.datos)
+                elif frame.tipo == TIPO_FIN:
+                    ventanas += 1
+            lineas = divisor.alimentar(decodificador.tomar_texto())
+            while lineas:
+                fin = next((i for i, linea in enumerate(lineas) if b'FINISH' in linea), len(lineas))
+                if ensamblador.agregar_lineas(lineas[:fin + 1])[1]:
+                    muestras += len(ensamblador.ventana()[0])
+                    ventanas += 1
+                    ensamblador = EnsambladorTexto(canales)
+                lineas = lineas[fin + 1:]
+        contador.update(ventanas=ventanas, muestras=muestras)
+
+    duraciones = medir(parsear, repeticiones, tiempo_maximo)
+    return resumen("captura", canales, contador["muestras"], duraciones,
+                   ventanas=contador["ventanas"], bytes=sum(len(b) for b in bloques))
+
+
+def importar(modulo, directorio):
+    """ Segundos que toma importar modulo en un interprete nuevo que corre en directorio """
+    codigo = f"import time; t = time.perf_counter(); import {modulo}; print(time.perf_counter() - t)"
+    proceso = subprocess.run([sys.executable, "-c", codigo], cwd=directorio, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise ImportError(proceso.stderr.strip().splitlines()[-1])
+    return float(proceso.stdout.split()[-1])
+
+
+def primer_begin(directorio, timeout=30):
+    """ Segundos desde lanzar el receiver.py de directorio con --ventanas 1
+    hasta que escribe BEGIN en un pty """
+    import select
+    import tty
+    maestro, esclavo = os.openpty()
+    tty.setraw(maestro)
+    tty.setraw(esclavo)
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, "receiver.py", "--puerto", os.ttyname(esclavo), "--ventanas", "1"],
+                               cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    recibido = b""
+    try:
+        while b"BEGIN" not in recibido:
+            restante = timeout - (time.perf_counter() - inicio)
+            listos, _, _ = select.select([maestro], [], [], max(restante, 0))
+            if not listos:
+                raise TimeoutError(f"receiver.py no envio BEGIN en {timeout} s")
+            recibido += os.read(maestro, 1024)
+        return time.perf_counter() - inicio
+    finally:
+        proceso.kill()
+        proceso.wait()
+        os.close(maestro)
+        os.close(esclavo)
+
+
+def medir_inicio(directorio, modulos, repeticiones, tiempo_maximo):
+    """ Etapa inicio del receiver.py de directorio: cada medicion corre en un proceso nuevo """
+    resultados = []
+    for modulo in modulos:
+        try:
+            importar(modulo, directorio)  # Se descarta la primera: compila los .pyc y llena el cache de disco
+        except ImportError as e:
+            print(f"{'importar ' + modulo:28s} no disponible: {e}")
+            continue
+        duraciones = medir(lambda: importar(modulo, directorio), repeticiones, tiempo_maximo)
+        resultados.append(resumen("inicio", None, 0, duraciones, medicion=f"importar {modulo}"))
+        imprimir(resultados[-1])
+    if os.name != "nt":
+        duraciones = medir(lambda: primer_begin(directorio), repeticiones, tiempo_maximo)
+        resultados.append(resumen("inicio", None, 0, duraciones, medicion="hasta el primer BEGIN"))
+        imprimir(resultados[-1])
+    return resultados
+
+
+def correr(tamanos=TAMANOS, canales=CANALES, etapas=ETAPAS, repeticiones=20, tiempo_maximo=5.0, captura=None,
+           inicio=None, modulos_inicio=MODULOS_INICIO, etapas_propias=None):
+    """ Corre cada etapa para cada combinacion y retorna la lista de resultados.
+    inicio es la carpeta del receiver.py cuyo inicio se mide (None para no medirlo)
+    y etapas_propias un dict nombre -> funcion(ventana) con las etapas de cada receptor """
+    resultados = medir_inicio(inicio, modulos_inicio, repeticiones, tiempo_maximo) if inicio else []
+    for c in canales:
+        for n in tamanos:
+            muestras = muestras_sinteticas(c, n)
+            ventana = Ventana.desde_arreglos(muestras, None, None, None)
+            casos = {
+                "parseo_texto": lambda b=trozos(bytes_texto(muestras)), c=c: parsear_texto(b, c),
+                "parseo_binario": lambda b=trozos(bytes_binario(muestras)): parsear_binario(b),
+                "analisis": lambda v=ventana: analizar(v),
+                "resumen": lambda v=ventana: resumir(v.crudo),
+            }
+            for nombre, funcion in (etapas_propias or {}).items():
+                casos[nombre] = lambda v=ventana, f=funcion: f(v)
+            for etapa in etapas:
+                if etapa == "extremo_a_extremo":
+                    for binario in (False, True):
+                        duraciones = extremo_a_extremo(c, n, binario, repeticiones, tiempo_maximo)
+                        resultados.append(resumen(etapa, c, n, duraciones, binario=binario))
+                        imprimir(resultados[-1])
+                    continue
+                resultados.append(resumen(etapa, c, n, medir(casos[etapa], repeticiones, tiempo_maximo)))
+                imprimir(resultados[-1])
+    if captura is not None:
+        for c in canales:
+            resultados.append(medir_captura(captura, c, repeticiones, tiempo_maximo))
+            imprimir(resultados[-1])
+    return resultados
+
+
+def imprimir(resultado):
+    etiqueta = resultado["etapa"] + (" (binario)" if resultado.get("binario") else "")
+    rss = resultado["rss_pico_mb"]
+    if "medicion" in resultado:
+        print(f"{resultado['medicion']:28s} p50={resultado['p50_ms']:9.3f} ms  p99={resultado['p99_ms']:9.3f} ms")
+        return
+    print(f"{etiqueta:28s} canales={resultado['canales']} n={resultado['n']:<7d} "
+          f"{resultado['muestras_por_segundo'] or 0:14.0f} muestras/s  p50={resultado['p50_ms']:9.3f} ms  "
+          f"p99={resultado['p99_ms']:9.3f} ms  rss={'?' if rss is None else f'{rss:.1f}'} MB")
+
+
+def main(argv=None, directorio=None, canales=CANALES, modulos_inicio=MODULOS_INICIO, etapas_propias=None):
+    """ CLI del benchmark; directorio es la carpeta del receiver.py de la etapa inicio
+    y etapas_propias las etapas que agrega su benchmark.py (ver correr) """
+    etapas = ETAPAS + tuple(etapas_propias or {})
+    parser = argparse.ArgumentParser(description="Benchmark de la cadena de recepcion y analisis")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS), help="Muestras por ventana")
+    parser.add_argument("--canales", type=int, nargs="+", default=list(canales))
+    parser.add_argument("--etapas", nargs="+", default=list(etapas), choices=etapas)
+    parser.add_argument("--repeticiones", type=int, default=20, help="Maximo de ventanas por caso")
+    parser.add_argument("--tiempo", type=float, default=5.0, help="Segundos maximos por caso (minimo 3 ventanas)")
+    parser.add_argument("--captura", default=None, help="Archivo de captura para medir el parseo de una sesion real")
+    parser.add_argument("--inicio", action="store_true", help="Medir tambien el tiempo de inicio de receiver.py")
+    parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados")
+    args = parser.parse_args(argv)
+    if args.inicio and directorio is None:
+        parser.error("--inicio necesita la carpeta de un receiver.py (correr el benchmark.py de T1 o T4)")
+
+    resultados = correr(args.tamanos, args.canales, args.etapas, args.repeticiones, args.tiempo, args.captura,
+                        directorio if args.inicio else None, modulos_inicio, etapas_propias)
+    if args.salida:
+        with open(args.salida, "w") as archivo:
+            json.dump({
+                "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "plataforma": platform.platform(),
+                "resultados": resultados,
+            }, archivo, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+""" Grabacion y reproduccion de los bytes de una sesion serial.
+
+SerialGrabador envuelve el puerto (serial.Serial) y guarda en un archivo de
+captura cada bloque leido o escrito, con su hora. SerialReproductor se usa en
+lugar del puerto y entrega los bytes grabados a LectorSerial, asi el mismo
+receiver.py (leyendo, leyendo_binario, ...) procesa una sesion sin la ESP32, al
+ritmo original (velocidad=1), mas rapido o lo mas rapido posible (None).
+
+Formato del archivo: la cabecera MAGIA y luego un registro por bloque
+
+    | tiempo (float64) | direccion (uint8) | largo (uint32) | bytes (largo) |
+
+con direccion RECIBIDO (de la ESP32) o ENVIADO (del computador).
+"""
+import struct
+import threading
+import time
+
+MAGIA = b'ESPCAP1\n'
+REGISTRO = struct.Struct('<dBI')
+RECIBIDO = 0
+ENVIADO = 1
+
+
+def leer_captura(ruta):
+    """ Generador con (tiempo, direccion, bytes) de cada bloque de la captura """
+    with open(ruta, 'rb') as archivo:
+        if archivo.read(len(MAGIA)) != MAGIA:
+            raise ValueError(f"{ruta} no es un archivo de captura")
+        while True:
+            cabecera = archivo.read(REGISTRO.size)
+            if len(cabecera) < REGISTRO.size:
+                return  # Fin del archivo (o un registro cortado al final)
+            tiempo, direccion, largo = REGISTRO.unpack(cabecera)
+            datos = archivo.read(largo)
+            if len(datos) < largo:
+                return
+            yield tiempo, direccion, datos
+
+
+class SerialGrabador:
+    """ Envuelve un puerto serial y graba todo lo que pasa por el """
+
+    def __init__(self, ser, ruta):
+        self.ser = ser
+        self._archivo = open(ruta, 'wb')
+        self._archivo.write(MAGIA)
+        self._lock = threading.Lock()  # read se llama desde el hilo lector y write desde la interfaz
+
+    def _grabar(self, direccion, datos):
+        with self._lock:
+            if not self._archivo.closed:
+                self._archivo.write(REGISTRO.pack(time.time(), direccion, len(datos)) + datos)
+
+    def read(self, size=1):
+        datos = self.ser.read(size)
+        if datos:
+            self._grabar(RECIBIDO, datos)
+        return datos
+
+    def write(self, datos):
+        self._grabar(ENVIADO, bytes(datos))
+        return self.ser.write(datos)
+
+    @property
+    def baudrate(self):
+        return self.ser.baudrate
+
+    @baudrate.setter
+    def baudrate(self, baudios):
+        # Sin esto el cambio de baudios de enlace.py quedaria en el envoltorio y no en el puerto
+        self.ser.baudrate = baudios
+
+    def close(self):
+        self.ser.close()
+        with self._lock:
+            self._archivo.close()
+
+    def __getattr__(self, nombre):
+        # in_waiting, timeout, is_open, ... se leen del puerto real
+        return getattr(self.ser, nombre)
+
+
+class SerialReproductor:
+    """ Objeto con la interfaz de serial.Serial que entrega los bytes de una captura.
+
+    Con esperar_escrituras=True los bytes que la ESP32 envio despues de una
+    escritura del computador solo se entregan cuando el computador vuelve a
+    escribir (por ejemplo, la ventana no llega antes de enviar BEGIN). Al
+    terminar la captura read() se comporta como un puerto sin datos """
+
+    def __init__(self, ruta, velocidad=None, esperar_escrituras=True, timeout=1):
+        self.velocidad = velocidad
+        self.esperar_escrituras = esperar_escrituras
+        self.timeout = timeout
+        self.baudrate = 115200  # enlace.py puede cambiarlo, pero no cambia nada en la reproduccion
+        self.is_open = True
+        self.enviados = []  # Lo que escribio el computador durante la reproduccion
+        self._eventos = list(leer_captura(ruta))
+        self._i = 0
+        self._pendiente = b''
+        self._escrituras = 0
+        self._condicion = threading.Condition()
+        self._base_real = None
+        self._base_captura = None
+
+    @property
+    def in_waiting(self):
+        return len(self._pendiente)
+
+    @property
+    def terminado(self):
+        """ True cuando ya se entregaron todos los bytes de la captura """
+        return self._i >= len(self._eventos) and not self._pendiente
+
+    def read(self, size=1):
+        while not self._pendiente:
+            if self._i >= len(self._eventos) or not self.is_open:
+                time.sleep(self.timeout)
+                return b''
+            tiempo, direccion, datos = self._eventos[self._i]
+            if direccion == ENVIADO:
+                if self.esperar_escrituras:
+                    with self._condicion:
+                        if not self._condicion.wait_for(lambda: self._escrituras > 0, self.timeout):
+                            return b''
+                        self._escrituras -= 1
+                    self._base_real = None  # El tiempo esperando al computador no cuenta
+                self._i += 1
+                continue
+            self._esperar_hasta(tiempo)
+            self._pendiente = datos
+            self._i += 1
+        datos = self._pendiente[:size]
+        self._pendiente = self._pendiente[size:]
+        return datos
+
+    def _esperar_hasta(self, tiempo):
+        """ Con velocidad espera a que corresponda entregar el bloque grabado en tiempo """
+        if self.velocidad is None:
+            return
+        if self._base_real is None:
+            self._base_real = time.monotonic()
+            self._base_captura = tiempo
+        espera = self._base_real + (tiempo - self._base_captura) / self.velocidad - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def write(self, datos):
+        self.enviados.append(bytes(datos))
+        with self._condicion:
+            self._escrituras += 1
+            self._condicion.notify_all()
+        return len(datos)
+
+    def close(self):
+        self.is_open = False
+        with self._condicion:
+            self._condicion.notify_all()
@@ -0,0 +1,182 @@
+""" Modo continuo: la ESP32 envia muestras sin parar y el computador calcula
+las estadisticas sobre una ventana deslizante.
+
+Con BEGIN cada ventana es un viaje completo BEGIN -> OK -> muestras -> FINISH
+y el enlace queda sin uso entre una ventana y la siguiente. Con STRM\\0 la
+ESP32 envia bloques de muestras (solo crudo, en texto o en frames) hasta
+recibir STOP\\0, al que responde con FINISH o un frame FIN.
+
+EstadisticasDeslizantes guarda las ultimas n muestras en un buffer circular
+y mantiene la suma y la suma de cuadrados de cada canal, asi la media, la
+varianza y el RMS cuestan O(1) por muestra. Cada salto de H muestras se
+entrega un Resultado. Para los peaks la ventana se divide en tramos de
+mcd(n, H) muestras, cada uno con su TopKCanales (estadisticas.py, O(log k)
+por muestra); al completar un salto solo se juntan los k mayores de cada
+tramo en vez de recorrer las n muestras.
+"""
+import math
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .protocolo import (ParserTexto, N_PEAKS, TIPO_FIN, TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16, COMANDO_CONTINUO,
+                       COMANDO_DETENER)
+from .lector import TIMEOUT
+from .estadisticas import TopKCanales
+
+# muestra: numero de muestras recibidas hasta este resultado. media, varianza
+# y rms tienen un valor por canal; peaks e indices_peaks son canales x k, con
+# el indice de cada peak contado desde la primera muestra del flujo
+Resultado = namedtuple('Resultado', ['muestra', 'tiempo', 'media', 'varianza', 'rms', 'peaks', 'indices_peaks'])
+
+
+class EstadisticasDeslizantes:
+    """ Media, varianza, RMS y peaks de las ultimas n muestras, cada salto muestras """
+
+    def __init__(self, canales, n, salto, k=N_PEAKS):
+        if n <= 0 or salto <= 0:
+            raise ValueError(f"La ventana y el salto deben ser positivos (n = {n}, salto = {salto})")
+        self.n = n
+        self.salto = salto
+        self.k = min(k, n)
+        self.buffer = np.zeros((n, canales))  # Buffer circular, una fila por muestra
+        self.posicion = 0  # Fila donde va la siguiente muestra (la mas antigua)
+        self.muestras = 0
+        self._suma = np.zeros(canales)
+        self._cuadrados = np.zeros(canales)
+        self._faltan = salto  # Muestras que faltan para el siguiente resultado
+        # Los saltos y las vueltas del buffer caen siempre al final de un tramo
+        self.tramo = math.gcd(n, salto)
+        self._top_tramo = TopKCanales(range(canales), min(self.k, self.tramo))
+        self._tramos = deque(maxlen=n // self.tramo)  # (valores, indices) canales x k de cada tramo completo
+
+    def agregar(self, fila):
+        """ Agrega una muestra de cada canal; retorna los resultados que se completaron """
+        return self.agregar_bloque(np.asarray(fila)[np.newaxis])
+
+    def agregar_bloque(self, muestras):
+        """ Agrega un bloque de muestras x canales; retorna los resultados que se completaron """
+        muestras = np.asarray(muestras, dtype=np.float64)
+        resultados = []
+        i = 0
+        while i < len(muestras):
+            # Parte del bloque que no pasa por el final del buffer, del tramo ni del siguiente salto
+            m = min(len(muestras) - i, self.n - self.posicion, self._faltan,
+                    self.tramo - self.muestras % self.tramo)
+            bloque = muestras[i:i + m]
+            self._top_tramo.agregar_bloque(bloque)
+            # Las filas que aun no se llenan valen cero, asi que restarlas no cambia las sumas
+            saliente = self.buffer[self.posicion:self.posicion + m]
+            self._suma += bloque.sum(axis=0) - saliente.sum(axis=0)
+            self._cuadrados += np.square(bloque).sum(axis=0) - np.square(saliente).sum(axis=0)
+            saliente[:] = bloque
+            self.posicion = (self.posicion + m) % self.n
+            self.muestras += m
+            self._faltan -= m
+            i += m
+            if self.muestras % self.tramo == 0:
+                self._cerrar_tramo()
+            if self.posicion == 0:
+                # Cada vuelta del buffer se recalculan las sumas para no acumular error de redondeo
+                self._suma = self.buffer.sum(axis=0)
+                self._cuadrados = np.square(self.buffer).sum(axis=0)
+            if self._faltan == 0:
+                self._faltan = self.salto
+                if self.muestras >= self.n:
+                    resultados.append(self.resultado())
+        return resultados
+
+    def _cerrar_tramo(self):
+        """ Guarda los peaks del tramo que termino, con el indice de cada uno
+        contado desde la primera muestra del flujo """
+        inicio = self.muestras - self.tramo
+        detalle = self._top_tramo.detalle()
+        valores = np.array([[valor for valor, _, _ in peaks] for peaks in detalle])
+        indices = np.array([[inicio + indice for _, indice, _ in peaks] for peaks in detalle])
+        self._tramos.append((valores, indices))
+        self._top_tramo.reiniciar()
+
+    def resultado(self):
+        """ Estadisticas de las ultimas n muestras """
+        media = self._suma / self.n
+        cuadrado_medio = self._cuadrados / self.n
+        varianza = np.maximum(cuadrado_medio - np.square(media), 0)
+        # Los k mayores de la ventana estan entre los k mayores de cada tramo
+        valores = np.concatenate([valores for valores, _ in self._tramos], axis=1)
+        indices = np.concatenate([indices for _, indices in self._tramos], axis=1)
+        orden = np.argsort(-valores, axis=1, kind="stable")[:, :self.k]
+        return Resultado(self.muestras, time.time(), media, varianza, np.sqrt(cuadrado_medio),
+                         np.take_along_axis(valores, orden, axis=1), np.take_along_axis(indices, orden, axis=1))
+
+
+class FlujoContinuo:
+    """ Adquisicion continua desde una ESP32 ya conectada (ser y su LectorSerial) """
+
+    def __init__(self, ser, lector, canales, n, salto, binario=False, timeout=TIMEOUT, al_recibir=None,
+                 conversion=None):
+        self.ser = ser
+        self.lector = lector
+        self.canales = canales
+        self.binario = binario
+        self.timeout = timeout
+        self.al_recibir = al_recibir  # Se llama con cada bloque de muestras apenas llega (ver deteccion.py)
+        self.conversion = conversion  # Con convertir_frame(frame) para las cuentas int16 (conversion.py en T4)
+        self.estadisticas = EstadisticasDeslizantes(canales, n, salto)
+        self.parser = ParserTexto(canales)  # Cuenta las lineas descartadas segun la falla
+        self._filas_fft = 0
+        self._terminado = False
+
+    @property
+    def descartadas(self):
+        # En el modo continuo una linea con los valores de una fila de la FFT tambien esta de mas
+        return self.parser.descartadas + self._filas_fft
+
+    def iniciar(self):
+        """ Le pide a la ESP32 que empiece a enviar muestras """
+        self._terminado = False
+        self.ser.write(COMANDO_CONTINUO)
+        self.lector.esperar_respuesta(b"OK", self.timeout)
+
+    def detener(self):
+        """ Le pide a la ESP32 que deje de enviar y retorna los resultados
+        de las muestras que alcanzaron a llegar """
+        self.ser.write(COMANDO_DETENER)
+        return list(self.resultados())
+
+    def resultados(self):
+        """ Generador con un Resultado por salto. Termina cuando la ESP32
+        confirma el STOP """
+        while True:
+            muestras = self._leer_bloque()
+            if muestras is None:
+                return
+            if self.al_recibir is not None and len(muestras):
+                self.al_recibir(muestras)
+            yield from self.estadisticas.agregar_bloque(muestras)
+
+    def _leer_bloque(self):
+        """ Retorna las muestras del siguiente frame o de las lineas que ya
+        llegaron, parseadas en lote (None al terminar) """
+        if self.binario:
+            frame = self.lector.leer_frame(self.timeout)
+            if frame.tipo == TIPO_FIN:
+                return None
+            if frame.tipo == TIPO_MUESTRAS_I16:
+                if self.conversion is None:
+                    raise ValueError("Llegaron cuentas int16 y el flujo no tiene una conversion a unidades fisicas")
+                frame = self.conversion.convertir_frame(frame)
+            if frame.tipo == TIPO_MUESTRAS_F32:
+                return frame.datos
+            return np.empty((0, self.canales))
+
+        if self._terminado:
+            return None
+        lineas = self.lector.leer_lineas(self.timeout, hasta=b'FINISH')
+        if b'FINISH' in lineas[-1]:
+            # Las muestras que llegaron antes del FINISH se entregan primero
+            self._terminado = True
+            lineas = lineas[:-1]
+        lote = self.parser.parsear(lineas)
+        self._filas_fft += len(lote.filas_fft)
+        return lote.filas
@@ -0,0 +1,92 @@
+""" Reduccion de ventanas largas antes de graficarlas o guardarlas.
+
+Con decenas de miles de muestras por ventana dibujar cada punto (con
+marker='o') es lo que mas tarda, y la pantalla no tiene tantos pixeles. Aca
+cada serie se reduce a lo mas MAX_PUNTOS puntos sin perder los peaks:
+
+    min_max   el minimo y el maximo de cada tramo, en el orden en que aparecen
+              (la forma de la senal y sus extremos quedan iguales)
+    lttb      Largest-Triangle-Three-Buckets: un punto por tramo, el que forma
+              el triangulo mas grande con sus vecinos (mas parecido a la
+              senal original, pero puede saltarse un extremo aislado)
+
+bloques_min_max da el minimo y maximo por bloque de tamano fijo, que es lo que
+guarda el nivel reducido de almacenamiento.py. Los datos originales no se
+tocan: los graficos y el almacenamiento reciben copias reducidas.
+"""
+import numpy as np
+
+MAX_PUNTOS = 2000  # Puntos por serie que se dibujan como maximo
+MAX_MARCADORES = 200  # Con mas puntos se dibujan solo las lineas
+
+
+def eje_tiempo(n, periodo=1.0):
+    """ Tiempo de cada una de las n muestras """
+    return np.arange(n) * periodo
+
+
+def estilo_marcador(n):
+    """ El marker para plt.plot segun cuantos puntos se dibujan """
+    return 'o' if n <= MAX_MARCADORES else ''
+
+
+def min_max(x, y, max_puntos=MAX_PUNTOS):
+    """ Reduce (x, y) a lo mas max_puntos puntos guardando el minimo y el
+    maximo de cada tramo, en el orden en que aparecen """
+    n = len(y)
+    if n <= max_puntos:
+        return x, y
+    tramos = max_puntos // 2
+    largo = -(-n // tramos)  # Division hacia arriba
+    relleno = np.pad(y, (0, tramos * largo - n), mode='edge').reshape(tramos, largo)
+    inicio = np.arange(tramos)[:, np.newaxis] * largo
+    indices = np.sort(np.stack([relleno.argmin(axis=1), relleno.argmax(axis=1)], axis=1), axis=1) + inicio
+    indices = np.minimum(indices.ravel(), n - 1)
+    return x[indices], y[indices]
+
+
+def lttb(x, y, max_puntos=MAX_PUNTOS):
+    """ Reduce (x, y) a max_puntos puntos con Largest-Triangle-Three-Buckets.
+    El primer y el ultimo punto se mantienen; cada tramo se resuelve con numpy """
+    n = len(y)
+    if n <= max_puntos or max_puntos < 3:
+        return x, y
+    x_f = np.asarray(x, dtype=np.float64)
+    y_f = np.asarray(y, dtype=np.float64)
+    bordes = np.linspace(1, n - 1, max_puntos - 1).astype(np.int64)
+    bordes = np.append(bordes, n)
+    indices = np.empty(max_puntos, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(max_puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # El vertice del tramo siguiente es su promedio
+        cx = x_f[fin:bordes[i + 2]].mean()
+        cy = y_f[fin:bordes[i + 2]].mean()
+        area = np.abs((x_f[a] - cx) * (y_f[inicio:fin] - y_f[a]) - (x_f[a] - x_f[inicio:fin]) * (cy - y_f[a]))
+        a = inicio + int(area.argmax())
+        indices[i + 1] = a
+    return x[indices], y[indices]
+
+
+METODOS = {"min_max": min_max, "lttb": lttb}
+
+
+def decimar(x, y, max_puntos=MAX_PUNTOS, metodo="min_max"):
+    """ Reduce (x, y) con el metodo indicado ("min_max" o "lttb") """
+    return METODOS[metodo](x, y, max_puntos)
+
+
+def bloques_min_max(datos, tam):
+    """ Minimo y maximo de cada bloque de tam muestras a lo largo del ultimo
+    eje (el ultimo bloque puede ser mas corto). datos es (..., n) y el
+    resultado (..., ceil(n / tam), 2) con [minimo, maximo] """
+    datos = np.asarray(datos)
+    n = datos.shape[-1]
+    bloques = -(-n // tam)
+    if n == 0:
+        return np.empty(datos.shape[:-1] + (0, 2), dtype=datos.dtype)
+    relleno = np.pad(datos, [(0, 0)] * (datos.ndim - 1) + [(0, bloques * tam - n)], mode='edge')
+    relleno = relleno.reshape(datos.shape[:-1] + (bloques, tam))
+    return np.stack([relleno.min(axis=-1), relleno.max(axis=-1)], axis=-1)
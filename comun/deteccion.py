@@ -0,0 +1,297 @@
+""" Deteccion de anomalias muestra a muestra, dentro de la adquisicion.
+
+Los receptores solo muestran cada ventana cuando termina de llegar. Un
+Detector revisa cada bloque de muestras apenas llega (en leyendo,
+leyendo_binario o el modo continuo) con un conjunto de reglas:
+
+    Umbral         el valor sale de [minimo, maximo]
+    Pendiente      la diferencia con la muestra anterior, dividida por el
+                   periodo, supera un maximo en valor absoluto
+    PuntajeZ       (valor - media) / desviacion contra las n muestras
+                   anteriores supera un limite en valor absoluto
+    EnergiaBanda   la potencia de las ultimas n muestras entre dos
+                   frecuencias supera un limite (por ejemplo vibracion en
+                   los ejes del acelerometro)
+
+Cada regla se evalua sobre todas las muestras del bloque de una vez con
+numpy, pero con el mismo resultado que muestra a muestra: cada Alerta trae
+el indice de la muestra que la provoco. Una alerta se emite cuando la
+condicion empieza a cumplirse en un canal y no se repite hasta que deja de
+cumplirse.
+
+El costo por muestra no depende del largo de las ventanas: PuntajeZ guarda
+las n muestras anteriores en un buffer circular con su suma y suma de
+cuadrados (como continuo.EstadisticasDeslizantes) y EnergiaBanda mantiene la
+DFT deslizante de los bins de la banda,
+
+    S_k(t) = S_k(t - 1) + (x[t] - x[t - n]) * exp(-2j * pi * k * t / n)
+
+asi cuesta O(bins de la banda) por muestra en vez de una FFT de n puntos.
+Ambas recalculan sus sumas desde el buffer cada n muestras para no acumular
+error de redondeo.
+
+Las reglas se pueden guardar en un JSON, una lista con el tipo de cada una
+y sus parametros:
+
+    [{"tipo": "umbral", "canales": ["acc_z"], "minimo": -2.0, "maximo": 2.0},
+     {"tipo": "pendiente", "canales": ["temperatura"], "maximo": 0.5},
+     {"tipo": "puntaje_z", "canales": ["presion"], "n": 60, "limite": 4},
+     {"tipo": "banda", "canales": ["acc_x", "acc_y"], "n": 128, "banda": [10, 20], "limite": 0.05}]
+"""
+import json
+from collections import namedtuple
+
+import numpy as np
+
+FILAS_POR_TRAMO = 1024  # Muestras que se revisan de una vez
+
+# muestra: indice de la muestra desde que se creo el Detector. valor es lo que
+# se comparo (el valor, la pendiente, el puntaje z o la potencia) y limite el
+# umbral que supero
+Alerta = namedtuple('Alerta', ['muestra', 'canal', 'tipo', 'valor', 'limite'])
+
+
+class Regla:
+    """ Base de las reglas: evalua un bloque de muestras x canales y emite
+    una alerta en cada canal cuando la condicion empieza a cumplirse """
+    tipo = None
+
+    def __init__(self, canales):
+        self.canales = [canales] if isinstance(canales, str) else list(canales)
+        self.indices = None  # Columnas de los canales, las fija el Detector
+        self._activa = np.zeros(len(self.canales), dtype=bool)
+
+    def revisar(self, muestras, inicio):
+        """ Retorna las alertas del bloque (muestras x todos los canales);
+        inicio es el indice de su primera muestra """
+        condicion, valores, limites = self.evaluar(np.asarray(muestras, dtype=np.float64)[:, self.indices])
+        if not len(condicion):
+            return []
+        anterior = np.concatenate([self._activa[np.newaxis], condicion[:-1]])
+        self._activa = condicion[-1].copy()
+        filas, columnas = np.nonzero(condicion & ~anterior)
+        limites = np.broadcast_to(limites, condicion.shape)
+        return [Alerta(inicio + int(fila), self.canales[columna], self.tipo, float(valores[fila, columna]),
+                       float(limites[fila, columna]))
+                for fila, columna in zip(filas, columnas)]
+
+    def evaluar(self, bloque):
+        """ (condicion, valores, limites) para cada muestra y canal del bloque """
+        raise NotImplementedError
+
+    def interrumpir(self):
+        """ El flujo se corto (por ejemplo entre dos ventanas): lo que
+        depende de muestras consecutivas empieza de nuevo """
+        self._activa[:] = False
+
+
+class Umbral(Regla):
+    """ El valor sale de [minimo, maximo] (cualquiera de los dos puede ser None) """
+    tipo = "umbral"
+
+    def __init__(self, canales, minimo=None, maximo=None):
+        super().__init__(canales)
+        if minimo is None and maximo is None:
+            raise ValueError("El umbral necesita un minimo o un maximo")
+        self.minimo = -np.inf if minimo is None else minimo
+        self.maximo = np.inf if maximo is None else maximo
+
+    def evaluar(self, bloque):
+        sobre = bloque > self.maximo
+        return sobre | (bloque < self.minimo), bloque, np.where(sobre, self.maximo, self.minimo)
+
+
+class Pendiente(Regla):
+    """ |x[t] - x[t - 1]| / periodo supera maximo """
+    tipo = "pendiente"
+
+    def __init__(self, canales, maximo, periodo=1.0):
+        super().__init__(canales)
+        self.maximo = maximo
+        self.periodo = periodo
+        self._ultima = np.full(len(self.canales), np.nan)  # La primera muestra no tiene pendiente
+
+    def evaluar(self, bloque):
+        pendiente = np.diff(bloque, axis=0, prepend=self._ultima[np.newaxis]) / self.periodo
+        if len(bloque):
+            self._ultima = bloque[-1].copy()
+        return np.abs(pendiente) > self.maximo, pendiente, self.maximo
+
+    def interrumpir(self):
+        super().interrumpir()
+        self._ultima[:] = np.nan
+
+
+class _Deslizante(Regla):
+    """ Base de las reglas que miran las n muestras anteriores: un buffer
+    circular donde la muestra t queda en la fila t % n """
+
+    def __init__(self, canales, n):
+        super().__init__(canales)
+        if n <= 1:
+            raise ValueError(f"La ventana debe tener al menos 2 muestras (n = {n})")
+        self.n = n
+        self.buffer = np.zeros((n, len(self.canales)))
+        self.muestras = 0
+        self._sin_recalcular = 0
+
+    def _salientes(self, bloque):
+        """ La muestra t - n de cada muestra t del bloque (cero si aun no hay n) """
+        m = len(bloque)
+        filas = (self.muestras + np.arange(min(m, self.n))) % self.n
+        return np.concatenate([self.buffer[filas], bloque[:max(m - self.n, 0)]])
+
+    def _guardar(self, bloque):
+        """ Deja el bloque en el buffer; retorna True cada n muestras, cuando
+        hay que recalcular las sumas """
+        m = len(bloque)
+        k = min(m, self.n)
+        self.buffer[(self.muestras + m - k + np.arange(k)) % self.n] = bloque[m - k:]
+        self.muestras += m
+        self._sin_recalcular += m
+        if self._sin_recalcular >= self.n:
+            self._sin_recalcular = 0
+            return True
+        return False
+
+    def interrumpir(self):
+        super().interrumpir()
+        self.buffer[:] = 0
+        self.muestras = 0
+        self._sin_recalcular = 0
+
+
+class PuntajeZ(_Deslizante):
+    """ |x[t] - media| / desviacion supera limite, con la media y la
+    desviacion de las n muestras anteriores a t. No alerta hasta tener n """
+    tipo = "puntaje_z"
+
+    def __init__(self, canales, n, limite=3.0, desviacion_minima=1e-9):
+        super().__init__(canales, n)
+        self.limite = limite
+        self.desviacion_minima = desviacion_minima  # Con una senal constante cualquier cambio seria infinito
+        self._suma = np.zeros(len(self.canales))
+        self._cuadrados = np.zeros(len(self.canales))
+
+    def evaluar(self, bloque):
+        salientes = self._salientes(bloque)
+        entrantes = bloque - salientes
+        cuadrados = np.square(bloque) - np.square(salientes)
+        # Sumas de las n anteriores a cada muestra: la acumulada sin la muestra misma
+        suma = self._suma + np.cumsum(entrantes, axis=0) - entrantes
+        suma_cuadrados = self._cuadrados + np.cumsum(cuadrados, axis=0) - cuadrados
+        media = suma / self.n
+        desviacion = np.sqrt(np.maximum(suma_cuadrados / self.n - np.square(media), 0))
+        puntaje = (bloque - media) / np.maximum(desviacion, self.desviacion_minima)
+        llenas = (self.muestras + np.arange(len(bloque)) >= self.n)[:, np.newaxis]
+        if len(bloque):
+            self._suma = suma[-1] + entrantes[-1]
+            self._cuadrados = suma_cuadrados[-1] + cuadrados[-1]
+        if self._guardar(bloque):
+            self._suma = self.buffer.sum(axis=0)
+            self._cuadrados = np.square(self.buffer).sum(axis=0)
+        return llenas & (np.abs(puntaje) > self.limite), puntaje, self.limite
+
+    def interrumpir(self):
+        # La linea base no depende de que las muestras sean consecutivas
+        self._activa[:] = False
+
+
+class EnergiaBanda(_Deslizante):
+    """ Potencia (media de los cuadrados) de las componentes entre banda[0]
+    y banda[1] Hz en las ultimas n muestras, con una DFT deslizante. Una
+    senoidal de amplitud A dentro de la banda da A**2 / 2 """
+    tipo = "banda"
+
+    def __init__(self, canales, n, banda, limite, periodo=1.0):
+        super().__init__(canales, n)
+        self.limite = limite
+        self.periodo = periodo
+        frecuencias = np.arange(n // 2 + 1) / (n * periodo)
+        self.bins = np.flatnonzero((frecuencias >= banda[0]) & (frecuencias <= banda[1]) & (frecuencias > 0))
+        if not len(self.bins):
+            raise ValueError(f"La banda {banda} Hz no tiene bins con n = {n} y periodo = {periodo} s")
+        # Los bins del medio aparecen dos veces en la FFT completa; el de Nyquist una
+        self.pesos = np.where(2 * self.bins == n, 1.0, 2.0) / n ** 2
+        self.giros = np.exp(-2j * np.pi * np.outer(np.arange(n), self.bins) / n)  # n x bins
+        self._dft = np.zeros((len(self.bins), len(self.canales)), dtype=np.complex128)
+
+    def evaluar(self, bloque):
+        diferencias = bloque - self._salientes(bloque)
+        giros = self.giros[(self.muestras + np.arange(len(bloque))) % self.n]  # muestras x bins
+        dft = self._dft + np.cumsum(giros[:, :, np.newaxis] * diferencias[:, np.newaxis, :], axis=0)
+        potencia = np.einsum('mbc,b->mc', np.square(np.abs(dft)), self.pesos)
+        llenas = (self.muestras + np.arange(len(bloque)) >= self.n - 1)[:, np.newaxis]
+        if len(bloque):
+            self._dft = dft[-1]
+        if self._guardar(bloque):
+            self._dft = self.giros.T @ self.buffer
+        return llenas & (potencia > self.limite), potencia, self.limite
+
+    def interrumpir(self):
+        super().interrumpir()
+        self._dft[:] = 0
+
+
+TIPOS = {regla.tipo: regla for regla in (Umbral, Pendiente, PuntajeZ, EnergiaBanda)}
+
+
+class Detector:
+    """ Aplica un conjunto de reglas a cada bloque de muestras que llega """
+
+    def __init__(self, nombres, reglas):
+        self.nombres = tuple(nombres)
+        self.reglas = list(reglas)
+        for regla in self.reglas:
+            desconocidos = set(regla.canales) - set(self.nombres)
+            if desconocidos:
+                raise ValueError(f"La regla {regla.tipo} tiene canales desconocidos: {sorted(desconocidos)}")
+            regla.indices = [self.nombres.index(canal) for canal in regla.canales]
+        self.muestras = 0
+        self.alertas = 0
+
+    @classmethod
+    def desde_archivo(cls, ruta, nombres, periodo=1.0):
+        """ Crea el detector con las reglas guardadas en un JSON. Las reglas
+        que dependen del tiempo usan periodo si no traen el suyo """
+        with open(ruta) as archivo:
+            configuracion = json.load(archivo)
+        reglas = []
+        for opciones in configuracion:
+            opciones = dict(opciones)
+            tipo = opciones.pop("tipo", None)
+            if tipo not in TIPOS:
+                raise ValueError(f"Tipo de regla {tipo!r} invalido, debe ser uno de {list(TIPOS)}")
+            if tipo in ("pendiente", "banda"):
+                opciones.setdefault("periodo", periodo)
+            reglas.append(TIPOS[tipo](**opciones))
+        return cls(nombres, reglas)
+
+    def agregar_bloque(self, muestras):
+        """ Revisa un bloque de muestras x canales; retorna sus alertas
+        ordenadas por muestra """
+        muestras = np.asarray(muestras)
+        alertas = []
+        # De a tramos para acotar la memoria de EnergiaBanda (muestras x bins x canales)
+        for inicio in range(0, len(muestras), FILAS_POR_TRAMO):
+            tramo = muestras[inicio:inicio + FILAS_POR_TRAMO]
+            for regla in self.reglas:
+                alertas += regla.revisar(tramo, self.muestras)
+            self.muestras += len(tramo)
+        self.alertas += len(alertas)
+        return sorted(alertas, key=lambda alerta: alerta.muestra)
+
+    def agregar(self, fila):
+        """ Revisa una sola muestra de cada canal """
+        return self.agregar_bloque(np.asarray(fila)[np.newaxis])
+
+    def interrumpir(self):
+        """ Avisa que las siguientes muestras no siguen a las anteriores """
+        for regla in self.reglas:
+            regla.interrumpir()
+
+
+def mensaje(alerta):
+    """ Texto de una alerta para la consola o la interfaz """
+    return (f"ALERTA {alerta.tipo} en {alerta.canal}, muestra {alerta.muestra}: "
+            f"{alerta.valor:.6g} (limite {alerta.limite:.6g})")
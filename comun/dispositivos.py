@@ -0,0 +1,183 @@
+""" Adquisicion desde varias ESP32 conectadas al mismo computador.
+
+receiver.py trabaja con un solo PORT fijo. Aca cada placa es un Dispositivo
+con su propio puerto y LectorSerial, y el GestorDispositivos corre la
+adquisicion de cada una en un hilo (pyserial suelta el GIL mientras espera
+el puerto, asi que los hilos no compiten entre ellos). Todas las ventanas
+salen por una sola cola, con la hora de llegada y el id de la placa.
+
+Uso desde la consola (busca las placas solo si no se le dan puertos):
+
+    python -m comun.dispositivos --canales 6 COM3 COM4   (desde la raiz del repositorio)
+"""
+import argparse
+import queue
+import threading
+import time
+from collections import namedtuple
+from struct import pack
+
+from .protocolo import EnsambladorTexto, unir_frames, TIPO_FIN, COMANDO_BINARIO
+from .lector import LectorSerial, ErrorLector, TIMEOUT
+
+BAUD_RATE = 115200  # Debe coincidir con la configuracion de la ESP32
+
+# pyserial se importa recien al buscar puertos o conectar, asi el gestor se puede usar y
+# probar sin el
+
+# VID USB de los conversores de las placas ESP32: CP210x, CH340, FTDI y el USB propio de Espressif
+VIDS_ESP32 = {0x10C4, 0x1A86, 0x0403, 0x303A}
+
+VentanaDispositivo = namedtuple('VentanaDispositivo', ['tiempo', 'dispositivo', 'muestras', 'rms', 'fft', 'peaks'])
+
+
+def buscar_puertos(vids=VIDS_ESP32):
+    """ Funcion que retorna los puertos seriales que parecen ser una ESP32 """
+    from serial.tools import list_ports
+    return sorted(p.device for p in list_ports.comports() if p.vid in vids)
+
+
+class Dispositivo:
+    """ Una ESP32 conectada a un puerto serial """
+
+    def __init__(self, puerto, canales, baudios=BAUD_RATE, binario=False, timeout=TIMEOUT, id=None):
+        self.puerto = puerto
+        self.canales = canales
+        self.baudios = baudios
+        self.binario = binario
+        self.timeout = timeout
+        self.id = id if id is not None else puerto
+        self.ser = None
+        self.lector = None
+
+    def conectar(self):
+        """ Abre el puerto y parte el hilo lector """
+        import serial
+        self.ser = serial.serial_for_url(self.puerto, self.baudios, timeout=1)
+        self.lector = LectorSerial(self.ser)
+        self.lector.start()
+        if self.binario:
+            self.ser.write(COMANDO_BINARIO)
+            self.lector.esperar_respuesta(b"OK", self.timeout)
+
+    def solicitar_ventana(self):
+        """ Pide una ventana y retorna (muestras, rms, fft, peaks) """
+        self.ser.write(pack('6s', 'BEGIN\0'.encode()))
+        self.lector.esperar_respuesta(b"OK", self.timeout)
+        if self.binario:
+            frames = []
+            while True:
+                frame = self.lector.leer_frame(self.timeout)
+                if frame.tipo == TIPO_FIN:
+                    return unir_frames(frames)
+                frames.append(frame)
+
+        ensamblador = EnsambladorTexto(self.canales)
+        while not ensamblador.agregar(self.lector.leer_linea(self.timeout)):
+            pass
+        return ensamblador.ventana()
+
+    def cambiar_ventana(self, new_size):
+        """ Cambia el tamano de la ventana guardado en la ESP32 """
+        largo_mensaje = len(str(new_size))
+        self.ser.write(pack(f'{largo_mensaje}s', f'{new_size}\0'.encode()))
+
+    def terminar_conexion(self):
+        """ Envia END\\0, espera CLOSED y cierra el puerto """
+        if self.ser is None:
+            return
+        try:
+            self.ser.write(pack('4s', 'END\0'.encode()))
+            self.lector.esperar_respuesta(b"CLOSED", self.timeout)
+        finally:
+            self.lector.detener()
+            self.ser.close()
+            self.ser = None
+
+
+class GestorDispositivos:
+    """ Corre la adquisicion de varias ESP32 en paralelo y junta sus ventanas """
+
+    def __init__(self, dispositivos):
+        self.dispositivos = list(dispositivos)
+        self.ventanas = queue.Queue()
+        self.errores = {}
+        self._detener = threading.Event()
+        self._hilos = []
+
+    @classmethod
+    def desde_puertos(cls, puertos=None, canales=6, **opciones):
+        """ Crea un Dispositivo por puerto; sin puertos usa buscar_puertos() """
+        if puertos is None:
+            puertos = buscar_puertos()
+        return cls(Dispositivo(puerto, canales, **opciones) for puerto in puertos)
+
+    def iniciar(self, n_ventanas=None):
+        """ Conecta cada placa y parte un hilo que pide ventanas sin parar
+        (o n_ventanas por placa) """
+        for dispositivo in self.dispositivos:
+            hilo = threading.Thread(target=self._adquirir, args=(dispositivo, n_ventanas), daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def _adquirir(self, dispositivo, n_ventanas):
+        try:
+            dispositivo.conectar()
+            pedidas = 0
+            while not self._detener.is_set() and (n_ventanas is None or pedidas < n_ventanas):
+                muestras, rms, fft, peaks = dispositivo.solicitar_ventana()
+                self.ventanas.put(VentanaDispositivo(time.time(), dispositivo.id, muestras, rms, fft, peaks))
+                pedidas += 1
+        except Exception as e:
+            # Una placa con problemas no detiene a las demas: cualquier error (tambien un
+            # ValueError por una linea mal formada) queda en errores en vez de matar el hilo
+            self.errores[dispositivo.id] = e
+
+    def activos(self):
+        """ Numero de placas que siguen adquiriendo """
+        return sum(hilo.is_alive() for hilo in self._hilos)
+
+    def leer(self, timeout=None):
+        """ Generador con las ventanas de todas las placas en orden de llegada.
+        Termina cuando todas las placas terminaron """
+        while True:
+            try:
+                yield self.ventanas.get(timeout=0.5 if timeout is None else timeout)
+            except queue.Empty:
+                if timeout is not None or not self.activos():
+                    return
+
+    def detener(self):
+        """ Deja de pedir ventanas y cierra la conexion con cada placa """
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join()
+        for dispositivo in self.dispositivos:
+            try:
+                dispositivo.terminar_conexion()
+            except (ErrorLector, TimeoutError, OSError) as e:  # serial.SerialException es un OSError
+                self.errores.setdefault(dispositivo.id, e)  # Se guarda el primer error de la placa
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adquisicion desde varias ESP32")
+    parser.add_argument("puertos", nargs="*", help="Puertos a usar (por defecto se buscan)")
+    parser.add_argument("--canales", type=int, default=6, help="6 para la BMI270, 4 para la BME688")
+    parser.add_argument("--baudios", type=int, default=BAUD_RATE)
+    parser.add_argument("--binario", action="store_true", help="Pedir frames binarios")
+    parser.add_argument("--ventanas", type=int, default=None, help="Ventanas por placa")
+    args = parser.parse_args()
+
+    gestor = GestorDispositivos.desde_puertos(args.puertos or None, args.canales,
+                                              baudios=args.baudios, binario=args.binario)
+    print(f"Usando {len(gestor.dispositivos)} placas: {[d.id for d in gestor.dispositivos]}")
+    gestor.iniciar(args.ventanas)
+    try:
+        for ventana in gestor.leer():
+            print(f"{ventana.tiempo:.3f} {ventana.dispositivo}: {len(ventana.muestras)} muestras, RMS {ventana.rms}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gestor.detener()
+        for id_dispositivo, error in gestor.errores.items():
+            print(f"ERROR en {id_dispositivo}: {error}")
@@ -0,0 +1,93 @@
+""" Negociacion de la velocidad de la UART con la ESP32.
+
+BAUD_RATE tiene que coincidir a mano con el firmware, y a 115200 baudios la
+UART es la que limita cuantas muestras por segundo llegan. Al conectarse se
+puede subir la velocidad paso a paso por VELOCIDADES (protocolo.py):
+
+    1. se envia BAUD<i> a la velocidad actual y la ESP32 responde OK
+    2. ambos lados cambian a VELOCIDADES[i]
+    3. se envia PRUEB y la ESP32 responde con un frame TIPO_PRUEBA de
+       LARGO_PATRON bytes conocidos (con crc32, como todos los frames)
+    4. si el patron llego completo se envia CONFI y la ESP32 responde OK
+
+Si algo falla el computador deja de enviar, espera PLAZO_BAUDIOS (la ESP32
+vuelve sola a la velocidad anterior) y vuelve tambien. Se sube mientras las
+pruebas resulten, asi la velocidad final es la mas alta que paso la prueba.
+Con el tiempo del patron se estima el rendimiento real del enlace en bytes
+por segundo.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .protocolo import (comando_baudios, patron_prueba, COMANDO_PRUEBA, COMANDO_CONFIRMAR, VELOCIDADES,
+                       LARGO_PATRON, PLAZO_BAUDIOS, TIPO_PRUEBA, CABECERA, CRC)
+from .lector import ErrorLector
+
+# Una prueba por velocidad: si paso y cuantos bytes por segundo llegaron
+Prueba = namedtuple('Prueba', ['baudios', 'correcta', 'bytes_por_segundo'])
+Negociacion = namedtuple('Negociacion', ['baudios', 'bytes_por_segundo', 'pruebas'])
+
+
+def _probar(ser, lector, indice, timeout):
+    """ Pasa a VELOCIDADES[indice] y verifica el enlace con el patron de prueba.
+    Retorna los bytes por segundo o None si fallo (y se volvio a la velocidad anterior) """
+    anterior = ser.baudrate
+    ser.write(comando_baudios(indice))
+    lector.esperar_respuesta(b"OK", timeout)
+    # La ESP32 cambia apenas termina de enviar el OK
+    ser.baudrate = VELOCIDADES[indice]
+    cambio = time.monotonic()
+    confirmado = False
+    try:
+        inicio = time.perf_counter()
+        ser.write(COMANDO_PRUEBA)
+        frame = lector.leer_frame(PLAZO_BAUDIOS / 2)
+        duracion = time.perf_counter() - inicio
+        if frame.tipo != TIPO_PRUEBA or not np.array_equal(frame.datos.ravel(), patron_prueba()):
+            raise ValueError("El patron de prueba llego distinto")
+        ser.write(COMANDO_CONFIRMAR)
+        lector.esperar_respuesta(b"OK", PLAZO_BAUDIOS / 2)
+        confirmado = True
+    except (TimeoutError, ValueError):
+        # Sin CONFI la ESP32 vuelve sola a la velocidad anterior cuando se cumple el plazo
+        time.sleep(max(0.0, cambio + PLAZO_BAUDIOS + 0.1 - time.monotonic()))
+        return None
+    finally:
+        # Tambien si el puerto fallo (ErrorLector): el puerto no queda en una velocidad sin confirmar
+        if not confirmado:
+            ser.baudrate = anterior
+    return (CABECERA.size + LARGO_PATRON + CRC.size) / duracion
+
+
+def negociar_baudios(ser, lector, maximo=None, timeout=PLAZO_BAUDIOS):
+    """ Sube la velocidad del puerto mientras la prueba resulte, hasta maximo
+    baudios. Retorna una Negociacion con la velocidad final, el rendimiento
+    medido en ella (None si no se cambio) y cada Prueba hecha """
+    pruebas = []
+    bytes_por_segundo = None
+    for indice, baudios in enumerate(VELOCIDADES):
+        if baudios <= ser.baudrate or (maximo is not None and baudios > maximo):
+            continue
+        try:
+            rendimiento = _probar(ser, lector, indice, timeout)
+        except (TimeoutError, ErrorLector):
+            # Sin OK al BAUD<i>: el firmware no sabe cambiar de velocidad
+            break
+        pruebas.append(Prueba(baudios, rendimiento is not None, rendimiento))
+        if rendimiento is None:
+            break
+        bytes_por_segundo = rendimiento
+    return Negociacion(ser.baudrate, bytes_por_segundo, pruebas)
+
+
+def describir(negociacion):
+    """ Texto con el resultado de la negociacion, para mostrar en la consola """
+    lineas = [f"  {prueba.baudios} baudios: " +
+              (f"correcta, {prueba.bytes_por_segundo / 1024:.1f} KiB/s" if prueba.correcta else "fallo")
+              for prueba in negociacion.pruebas]
+    rendimiento = negociacion.bytes_por_segundo
+    lineas.append(f"Enlace a {negociacion.baudios} baudios" +
+                  ("" if rendimiento is None else f" ({rendimiento / 1024:.1f} KiB/s medidos)"))
+    return "\n".join(lineas)
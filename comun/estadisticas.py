@@ -0,0 +1,88 @@
+""" Estadisticas que se actualizan muestra a muestra.
+
+TopK reemplaza a insertar_ordenado (bisect.insort sobre una lista negada,
+O(n) por insercion y guardando todos los valores): guarda solo los k valores
+mas altos en un heap de minimos, asi cada muestra cuesta O(log k) y sirve
+para ventanas de cualquier largo o para un flujo continuo.
+"""
+import heapq
+
+import numpy as np
+
+from .protocolo import N_PEAKS
+
+
+class TopK:
+    """ Los k valores mas altos de un canal, con su indice de muestra y tiempo """
+
+    def __init__(self, k=N_PEAKS):
+        self.k = k
+        self._heap = []  # (valor, indice, tiempo); el menor de los k queda en _heap[0]
+        self.muestras = 0
+
+    def agregar(self, valor, tiempo=None):
+        """ Agrega una muestra; O(log k) """
+        indice = self.muestras
+        self.muestras += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (valor, indice, tiempo))
+        elif valor > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (valor, indice, tiempo))
+
+    def agregar_bloque(self, valores, tiempos=None):
+        """ Agrega varias muestras seguidas. Con numpy se descartan de una vez
+        las que no superan al menor de los k actuales """
+        valores = np.asarray(valores)
+        inicio = self.muestras
+        candidatos = np.arange(len(valores))
+        if len(self._heap) == self.k:
+            candidatos = np.flatnonzero(valores > self._heap[0][0])
+        for i in candidatos:
+            self.muestras = inicio + int(i)
+            self.agregar(float(valores[i]), None if tiempos is None else float(tiempos[i]))
+        self.muestras = inicio + len(valores)
+
+    def peaks(self):
+        """ Lista de (valor, indice, tiempo) de mayor a menor """
+        return sorted(self._heap, reverse=True)
+
+    def valores(self):
+        """ Arreglo con los k valores de mayor a menor (nan si hay menos de k muestras) """
+        resultado = np.full(self.k, np.nan, dtype=np.float32)
+        peaks = self.peaks()
+        resultado[:len(peaks)] = [valor for valor, _, _ in peaks]
+        return resultado
+
+    def reiniciar(self):
+        self._heap = []
+        self.muestras = 0
+
+
+class TopKCanales:
+    """ Un TopK por canal, alimentado con filas de una muestra por canal """
+
+    def __init__(self, nombres, k=N_PEAKS):
+        self.nombres = tuple(nombres)
+        self.canales = [TopK(k) for _ in self.nombres]
+
+    def agregar(self, fila, tiempo=None):
+        """ Agrega una muestra de cada canal """
+        for seguidor, valor in zip(self.canales, fila):
+            seguidor.agregar(valor, tiempo)
+
+    def agregar_bloque(self, muestras, tiempos=None):
+        """ Agrega un bloque de muestras x canales (por ejemplo un frame) """
+        for i, seguidor in enumerate(self.canales):
+            seguidor.agregar_bloque(muestras[:, i], tiempos)
+
+    def detalle(self):
+        """ Lista por canal de (valor, indice, tiempo) de mayor a menor """
+        return [seguidor.peaks() for seguidor in self.canales]
+
+    def valores(self):
+        """ Arreglo canales x k con los valores (como Ventana.peaks) """
+        return np.array([seguidor.valores() for seguidor in self.canales])
+
+    def reiniciar(self):
+        for seguidor in self.canales:
+            seguidor.reiniciar()
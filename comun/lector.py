@@ -0,0 +1,173 @@
+""" Lectura del puerto serial en un hilo dedicado.
+
+En vez de preguntar por ser.in_waiting en un while True, un solo hilo hace
+lecturas bloqueantes (con el timeout del puerto) de bloques grandes, separa
+los frames binarios de las lineas de texto y los deja en colas thread-safe.
+Las lineas de cada bloque van juntas a la cola, asi leer_lineas() entrega de
+una vez todo lo que ya llego para parsearlo en lote (protocolo.ParserTexto).
+La CLI y la interfaz de Qt solo consumen esas colas (o se suscriben con
+callbacks), y los errores del puerto se reportan en vez de ignorarse.
+"""
+import collections
+import queue
+import threading
+
+from .protocolo import DecodificadorFrames
+
+TAM_BLOQUE = 4096  # Maximo de bytes por lectura
+TIMEOUT = 10  # Segundos maximos de espera por una respuesta de la ESP32
+_FIN = None  # Marca que se pone en las colas cuando el hilo termina
+
+
+class ErrorLector(Exception):
+    """ Error del puerto serial o del hilo lector """
+
+
+class DivisorLineas:
+    """ Separa un flujo de bytes en lineas terminadas en \\n o en \\0
+    (la ESP32 termina OK, FINISH y CLOSED con \\0).
+
+    Como las dos terminaciones se tratan igual, los \\0 se cambian por \\n al
+    llegar y cada bloque se separa con un solo split; en el buffer queda solo
+    la linea incompleta.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def alimentar(self, datos):
+        """ Agrega bytes y retorna la lista de lineas completas (sin terminador) """
+        datos = bytes(datos).replace(b'\0', b'\n')
+        fin = datos.rfind(b'\n')
+        if fin < 0:
+            self._buffer += datos
+            return []
+        lineas = (bytes(self._buffer) + datos[:fin]).split(b'\n')
+        self._buffer = bytearray(datos[fin + 1:])
+        return [linea for linea in lineas if linea]
+
+    def vaciar(self):
+        """ Retorna la linea incompleta que quede en el buffer (como hace
+        readline cuando se cumple el timeout) """
+        resto = bytes(self._buffer)
+        self._buffer.clear()
+        return resto
+
+
+class LectorSerial(threading.Thread):
+    """ Hilo que lee el puerto serial y reparte lineas y frames en colas """
+
+    def __init__(self, ser, tam_bloque=TAM_BLOQUE):
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.tam_bloque = tam_bloque
+        self.lineas = queue.Queue()  # Listas con las lineas de cada bloque leido
+        self.frames = queue.Queue()
+        self.error = None
+        self.bytes_recibidos = 0
+        self._divisor = DivisorLineas()
+        self._decodificador = DecodificadorFrames(guardar_texto=True)
+        self._callbacks = []
+        self._detener = threading.Event()
+        self._pendientes = collections.deque()  # Lineas ya sacadas de la cola que no se han leido
+
+    def suscribir(self, funcion):
+        """ Registra funcion(tipo, dato), que se llama desde el hilo lector con
+        tipo 'linea' o 'frame' por cada mensaje recibido """
+        self._callbacks.append(funcion)
+
+    def run(self):
+        try:
+            while not self._detener.is_set():
+                # read bloquea hasta que llegue al menos un byte o se cumpla el timeout del puerto
+                datos = self.ser.read(max(1, min(self.ser.in_waiting, self.tam_bloque)))
+                if datos:
+                    self.bytes_recibidos += len(datos)
+                    self._procesar(datos)
+                else:
+                    resto = self._divisor.vaciar()
+                    if resto:
+                        self._entregar_lineas([resto])
+        except Exception as e:
+            if not self._detener.is_set():
+                self.error = e
+        finally:
+            self.lineas.put(_FIN)
+            self.frames.put(_FIN)
+
+    def _procesar(self, datos):
+        for frame in self._decodificador.alimentar(datos):
+            self._entregar_frame(frame)
+        texto = self._decodificador.tomar_texto()
+        if texto:
+            lineas = self._divisor.alimentar(texto)
+            if lineas:
+                self._entregar_lineas(lineas)
+
+    def _entregar_frame(self, frame):
+        self.frames.put(frame)
+        for funcion in self._callbacks:
+            funcion('frame', frame)
+
+    def _entregar_lineas(self, lineas):
+        self.lineas.put(lineas)
+        for funcion in self._callbacks:
+            for linea in lineas:
+                funcion('linea', linea)
+
+    def _tomar(self, cola, timeout):
+        try:
+            dato = cola.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"La ESP32 no respondio en {timeout} segundos") from None
+        if dato is _FIN:
+            cola.put(_FIN)  # Para que las siguientes lecturas tambien fallen
+            raise ErrorLector(f"Se detuvo la lectura del puerto serial: {self.error}")
+        return dato
+
+    def leer_linea(self, timeout=TIMEOUT):
+        """ Retorna la siguiente linea recibida o lanza TimeoutError """
+        if not self._pendientes:
+            self._pendientes.extend(self._tomar(self.lineas, timeout))
+        return self._pendientes.popleft()
+
+    def leer_lineas(self, timeout=TIMEOUT, hasta=None):
+        """ Retorna todas las lineas que ya llegaron, esperando hasta timeout
+        por al menos una. Con hasta (por ejemplo b"FINISH") se retorna hasta
+        la primera linea que lo contenga y el resto queda para la siguiente lectura """
+        if not self._pendientes:
+            self._pendientes.extend(self._tomar(self.lineas, timeout))
+        while True:
+            try:
+                lote = self.lineas.get_nowait()
+            except queue.Empty:
+                break
+            if lote is _FIN:
+                self.lineas.put(_FIN)
+                break
+            self._pendientes.extend(lote)
+        lineas = list(self._pendientes)
+        self._pendientes.clear()
+        if hasta is not None:
+            fin = next((i for i, linea in enumerate(lineas) if hasta in linea), None)
+            if fin is not None:
+                self._pendientes.extend(lineas[fin + 1:])
+                lineas = lineas[:fin + 1]
+        return lineas
+
+    def leer_frame(self, timeout=TIMEOUT):
+        """ Retorna el siguiente frame binario recibido o lanza TimeoutError """
+        return self._tomar(self.frames, timeout)
+
+    def esperar_respuesta(self, esperado, timeout=TIMEOUT):
+        """ Descarta lineas hasta recibir una que contenga esperado (por ejemplo b"OK") """
+        while True:
+            linea = self.leer_linea(timeout)
+            if esperado in linea:
+                return linea
+
+    def detener(self):
+        """ Detiene el hilo; termina a mas tardar con el timeout del puerto """
+        self._detener.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
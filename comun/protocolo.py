@@ -0,0 +1,383 @@
+""" Formato binario de frames para la comunicacion con la ESP32.
+
+Cada frame enviado por la ESP32 tiene la forma (enteros en little-endian):
+
+    | sync (2) | tipo (1) | canales (1) | secuencia (2) | largo (2) | payload (largo) | crc32 (4) |
+
+El crc32 se calcula sobre la cabecera sin el sync mas el payload, y coincide
+con esp_rom_crc32_le(0, ...) de la ESP32 y con zlib.crc32 en el computador.
+El payload de muestras, RMS, FFT y peaks son floats de 32 bits intercalados
+por canal (una fila por muestra). El modo texto original sigue disponible
+para las placas que no tengan el firmware nuevo.
+"""
+import struct
+import warnings
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+SYNC = b'\xa5\x5a'
+CABECERA = struct.Struct('<2sBBHH')  # sync, tipo, canales, secuencia, largo
+CRC = struct.Struct('<I')
+# Ningun frame de la ESP32 pasa de este payload (la FFT de los 6 canales de la BMI270 en frames
+# de 64 filas ocupa 3072 bytes). Una cabecera con un largo mayor viene de un sync falso
+LARGO_MAXIMO = 4096
+
+# Tipos de frame
+TIPO_MUESTRAS_F32 = 1  # Muestras en float32, una fila por muestra
+TIPO_MUESTRAS_I16 = 2  # Cuentas crudas del sensor en int16
+TIPO_RMS = 3           # Un float32 por canal
+TIPO_FFT = 4           # Parte real e imaginaria intercaladas por canal
+TIPO_PEAKS = 5         # Los peaks de cada canal, una fila por peak
+TIPO_FIN = 6           # Fin de la ventana, sin payload
+TIPO_PRUEBA = 7        # Patron de prueba al cambiar los baudios (bytes 0, 1, ..., 255 repetidos)
+
+N_PEAKS = 5  # La ESP32 envia los 5 valores mas altos de cada canal
+
+# Comandos para cambiar el formato de la ESP32 (como BEGIN\0 y END\0)
+COMANDO_BINARIO = struct.pack('6s', 'BINAR\0'.encode())
+COMANDO_TEXTO = struct.pack('6s', 'TEXTO\0'.encode())
+# Con CRUDO la ESP32 solo envia las muestras (RMS, FFT y peaks se calculan en analisis.py)
+COMANDO_CRUDO = struct.pack('6s', 'CRUDO\0'.encode())
+COMANDO_COMPLETO = struct.pack('6s', 'COMPL\0'.encode())
+# Con STRM la ESP32 envia muestras sin parar hasta recibir STOP (ver continuo.py)
+COMANDO_CONTINUO = struct.pack('6s', 'STRM\0'.encode())
+COMANDO_DETENER = struct.pack('6s', 'STOP\0'.encode())
+# Cambio de baudios (ver enlace.py): BAUD<i> cambia a VELOCIDADES[i], PRUEB pide el
+# patron de prueba y CONFI deja la velocidad; sin CONFI la ESP32 vuelve a la anterior
+COMANDO_PRUEBA = struct.pack('6s', 'PRUEB\0'.encode())
+COMANDO_CONFIRMAR = struct.pack('6s', 'CONFI\0'.encode())
+VELOCIDADES = (115200, 230400, 460800, 921600, 1500000, 2000000)  # Igual que velocidades[] en el firmware
+LARGO_PATRON = 4096  # Bytes del patron de prueba
+PLAZO_BAUDIOS = 2.0  # Segundos que espera la ESP32 por CONFI antes de volver a la velocidad anterior
+
+_DTYPES = {
+    TIPO_MUESTRAS_F32: np.dtype('<f4'),
+    TIPO_MUESTRAS_I16: np.dtype('<i2'),
+    TIPO_RMS: np.dtype('<f4'),
+    TIPO_FFT: np.dtype('<f4'),
+    TIPO_PEAKS: np.dtype('<f4'),
+    TIPO_PRUEBA: np.dtype('u1'),
+}
+
+Frame = namedtuple('Frame', ['tipo', 'canales', 'secuencia', 'datos'])
+# Filas de un lote de lineas de texto: las de un valor por canal, las de la FFT
+# (re, im por canal) y cuantas de las primeras llegaron antes de la primera de la FFT
+LoteTexto = namedtuple('LoteTexto', ['filas', 'filas_fft', 'filas_antes_fft'])
+
+LOTE_LINEAS = 1024  # Lineas que EnsambladorTexto.agregar junta antes de parsearlas
+_SEPARADOR = 1e300  # Marca el fin de cada linea en ParserTexto: ningun float32 llega a este valor
+
+
+def comando_baudios(indice):
+    """ Comando para que la ESP32 pase a VELOCIDADES[indice] """
+    return struct.pack('6s', f'BAUD{indice}\0'.encode())
+
+
+def patron_prueba(largo=LARGO_PATRON):
+    """ Los bytes que envia la ESP32 en el frame TIPO_PRUEBA """
+    return (np.arange(largo) % 256).astype(np.uint8)
+
+
+def codificar_frame(tipo, secuencia, datos=None, canales=0):
+    """ Funcion que arma un frame a partir de un arreglo (filas x canales).
+    Se usa para probar el decodificador sin la ESP32 """
+    if datos is None:
+        payload = b''
+    else:
+        datos = np.asarray(datos)
+        if tipo == TIPO_FFT:
+            canales = datos.shape[-1]
+            datos = np.ascontiguousarray(datos, dtype=np.complex64).view(np.float32)
+        else:
+            canales = datos.shape[-1] if datos.ndim > 0 else 1
+        payload = np.ascontiguousarray(datos, dtype=_DTYPES[tipo]).tobytes()
+    cabecera = CABECERA.pack(SYNC, tipo, canales, secuencia & 0xFFFF, len(payload))
+    crc = zlib.crc32(payload, zlib.crc32(cabecera[2:]))
+    return cabecera + payload + CRC.pack(crc)
+
+
+class DecodificadorFrames:
+    """ Decodificador incremental de frames binarios.
+
+    Se le entregan los bytes a medida que llegan por el puerto serial con
+    alimentar() y retorna los frames completos. Por cada llamada se hace una
+    sola copia de los bytes consumidos; los arreglos de cada frame son vistas
+    (numpy.frombuffer) sobre esa copia. Los frames con crc malo o con un largo
+    mayor que LARGO_MAXIMO se descartan y se busca el siguiente sync.
+
+    Con guardar_texto=True los bytes que quedan fuera de los frames (por
+    ejemplo OK\0, FINISH\0 o las lineas del modo texto) se acumulan y se
+    pueden obtener con tomar_texto().
+    """
+
+    def __init__(self, guardar_texto=False):
+        self._buffer = bytearray()
+        self._texto = bytearray() if guardar_texto else None
+        self.frames_recibidos = 0
+        self.errores_crc = 0
+        self.errores_largo = 0
+        self.bytes_descartados = 0
+
+    def alimentar(self, datos):
+        """ Agrega bytes al buffer y retorna la lista de frames completos """
+        buffer = self._buffer
+        buffer += datos
+        encontrados = []
+        pos = 0
+        fin = len(buffer)
+        with memoryview(buffer) as vista:
+            while True:
+                inicio = buffer.find(SYNC, pos)
+                if inicio < 0:
+                    # Se guarda el ultimo byte si puede ser la mitad de un sync
+                    nuevo_pos = max(pos, fin - 1) if buffer.endswith(SYNC[:1]) else fin
+                    self._descartar(vista, pos, nuevo_pos)
+                    pos = nuevo_pos
+                    break
+                self._descartar(vista, pos, inicio)
+                pos = inicio
+                if fin - inicio < CABECERA.size:
+                    break
+                _, tipo, canales, secuencia, largo = CABECERA.unpack_from(buffer, inicio)
+                if largo > LARGO_MAXIMO:
+                    # Sync falso: sin esto se esperarian hasta 64 KB antes de revisar el crc
+                    self.errores_largo += 1
+                    self._descartar(vista, inicio, inicio + 1)
+                    pos = inicio + 1
+                    continue
+                fin_payload = inicio + CABECERA.size + largo
+                if fin - inicio < CABECERA.size + largo + CRC.size:
+                    break
+                crc, = CRC.unpack_from(buffer, fin_payload)
+                if zlib.crc32(vista[inicio + 2:fin_payload]) != crc:
+                    # Frame corrupto: se salta el sync y se sigue buscando
+                    self.errores_crc += 1
+                    self._descartar(vista, inicio, inicio + 1)
+                    pos = inicio + 1
+                    continue
+                encontrados.append((tipo, canales, secuencia, inicio + CABECERA.size, largo))
+                pos = fin_payload + CRC.size
+
+        if pos == 0:
+            return []
+        bloque = bytes(buffer[:pos])
+        del buffer[:pos]
+
+        frames = []
+        for tipo, canales, secuencia, offset, largo in encontrados:
+            frames.append(Frame(tipo, canales, secuencia,
+                                _decodificar_payload(bloque, tipo, canales, offset, largo)))
+        self.frames_recibidos += len(frames)
+        return frames
+
+    def tomar_texto(self):
+        """ Retorna y limpia los bytes recibidos fuera de los frames """
+        texto = bytes(self._texto)
+        self._texto.clear()
+        return texto
+
+    def _descartar(self, vista, inicio, fin):
+        self.bytes_descartados += fin - inicio
+        if self._texto is not None and fin > inicio:
+            self._texto += vista[inicio:fin]
+
+
+def _decodificar_payload(bloque, tipo, canales, offset, largo):
+    """ Funcion que interpreta el payload de un frame sin copiarlo """
+    if tipo not in _DTYPES or largo == 0:
+        return np.empty((0, max(canales, 1)), dtype=np.float32)
+    dtype = _DTYPES[tipo]
+    datos = np.frombuffer(bloque, dtype=dtype, count=largo // dtype.itemsize, offset=offset)
+    if tipo == TIPO_RMS:
+        return datos
+    if tipo == TIPO_FFT:
+        return datos.view(np.complex64).reshape(-1, canales)
+    return datos.reshape(-1, canales)
+
+
+def unir_frames(frames):
+    """ Funcion que junta los frames de una ventana y retorna
+    (muestras, rms, fft, peaks) como arreglos de numpy """
+    partes = {}
+    for frame in frames:
+        partes.setdefault(frame.tipo, []).append(frame.datos)
+
+    def juntar(tipo):
+        if tipo not in partes:
+            return None
+        if len(partes[tipo]) == 1:
+            return partes[tipo][0]
+        return np.concatenate(partes[tipo])
+
+    muestras = juntar(TIPO_MUESTRAS_F32)
+    if muestras is None:
+        muestras = juntar(TIPO_MUESTRAS_I16)
+    return muestras, juntar(TIPO_RMS), juntar(TIPO_FFT), juntar(TIPO_PEAKS)
+
+
+def unir_lineas(filas, filas_fft, canales, solo_muestras=False):
+    """ Funcion que ordena las lineas de una ventana en modo texto y retorna
+    (muestras, rms, fft, peaks) igual que unir_frames.
+    filas son las lineas con un valor por canal (muestras, RMS y peaks, en ese
+    orden) y filas_fft las lineas con parte real e imaginaria de cada canal.
+    Con solo_muestras=True (ESP32 en modo CRUDO) todas las filas son muestras.
+    Levanta ValueError si no alcanzan las filas para al menos una muestra, el
+    RMS y los peaks o si la FFT no tiene una fila por muestra (se perdieron
+    lineas y no se sabe cuales filas son muestras) """
+    filas = np.asarray(filas, dtype=np.float32).reshape(-1, canales)
+    if solo_muestras:
+        return filas, None, None, None
+    fft = np.asarray(filas_fft, dtype=np.float32).reshape(-1, 2 * canales)
+    n = len(filas) - 1 - N_PEAKS
+    if n < 1:
+        raise ValueError(f"La ventana tiene {len(filas)} filas y se necesitan al menos {N_PEAKS + 2} "
+                         f"(muestras, RMS y {N_PEAKS} peaks)")
+    if len(fft) != n:
+        raise ValueError(f"La FFT tiene {len(fft)} filas y la ventana {n} muestras")
+    return filas[:n], filas[n], fft.view(np.complex64), filas[n + 1:]
+
+
+class ParserTexto:
+    """ Parser por lotes de las lineas del modo texto.
+
+    En vez de decode, split y un float() por valor en cada linea, las lineas
+    de un lote se juntan con _SEPARADOR entre ellas y se parsean con una sola
+    llamada a numpy.fromstring; los separadores marcan donde termina cada
+    linea, asi los valores por linea salen con np.diff y las filas se sacan
+    con un solo indexado. Solo si en el lote hay un valor que no es numero se
+    vuelve a parsear linea por linea para descartar las malas.
+
+    Las lineas descartadas se cuentan segun la falla:
+        malformadas   algun valor no es un numero (bytes corruptos o basura)
+        truncadas     menos valores que una fila o que una fila de la FFT
+        sobrantes     mas de 2 * canales valores (por ejemplo dos lineas
+                      juntas porque se perdio un \\n)
+    """
+
+    def __init__(self, canales):
+        self.canales = canales
+        self.lineas = 0
+        self.malformadas = 0
+        self.truncadas = 0
+        self.sobrantes = 0
+
+    @property
+    def descartadas(self):
+        return self.malformadas + self.truncadas + self.sobrantes
+
+    def parsear(self, lineas):
+        """ Parsea un lote de lineas (sin terminador) y retorna un LoteTexto """
+        self.lineas += len(lineas)
+        valores, largos = self._valores(lineas)
+        # Las lineas malformadas (largo -1) no dejaron valores en el arreglo
+        aportados = np.maximum(largos, 0)
+        inicios = np.cumsum(aportados) - aportados
+        es_fila = largos == self.canales
+        es_fft = largos == 2 * self.canales
+        self.malformadas += int(np.count_nonzero(largos < 0))
+        self.truncadas += int(np.count_nonzero((largos >= 0) & (largos < 2 * self.canales) & ~es_fila))
+        self.sobrantes += int(np.count_nonzero(largos > 2 * self.canales))
+        filas = valores[inicios[es_fila, np.newaxis] + np.arange(self.canales)]
+        filas_fft = valores[inicios[es_fft, np.newaxis] + np.arange(2 * self.canales)]
+        primera_fft = int(np.argmax(es_fft)) if len(filas_fft) else len(lineas)
+        return LoteTexto(filas, filas_fft, int(np.count_nonzero(es_fila[:primera_fft])))
+
+    def _valores(self, lineas):
+        """ (valores, largos): todos los valores del lote en float32 y cuantos
+        tiene cada linea (-1 en las que tienen algo que no es numero) """
+        texto = b" 1e300 ".join(lineas) + b" 1e300"
+        try:
+            with warnings.catch_warnings():
+                # numpy antiguo solo avisa y retorna lo que alcanzo a leer
+                warnings.simplefilter("error", DeprecationWarning)
+                valores = np.fromstring(texto, sep=" ")
+        except (ValueError, DeprecationWarning):
+            valores = None
+        if valores is not None:
+            fines = np.flatnonzero(valores == _SEPARADOR)
+            if len(fines) == len(lineas):
+                largos = np.diff(fines, prepend=-1) - 1
+                return valores[valores != _SEPARADOR].astype(np.float32), largos
+        # Hay valores corruptos: linea por linea
+        partes = []
+        largos = np.empty(len(lineas), dtype=np.int64)
+        for i, linea in enumerate(lineas):
+            try:
+                fila = [float(valor) for valor in linea.split()]
+            except ValueError:
+                largos[i] = -1
+                continue
+            partes.extend(fila)
+            largos[i] = len(fila)
+        return np.array(partes, dtype=np.float32), largos
+
+
+def _linea_con(lineas, texto):
+    """ Indice de la primera linea que contiene texto (None si ninguna) """
+    juntas = b"\n".join(lineas)
+    posicion = juntas.find(texto)
+    return None if posicion < 0 else juntas.count(b"\n", 0, posicion)
+
+
+class EnsambladorTexto:
+    """ Junta las lineas de una ventana en modo texto, desde el OK hasta el
+    FINISH, y las parsea de a lotes con ParserTexto. agregar() (una linea) y
+    agregar_lineas() (un lote, como los de LectorSerial.leer_lineas) indican
+    cuando llega el FINISH y ventana() retorna (muestras, rms, fft, peaks).
+    Las lineas corruptas se cuentan en parser (descartadas es el total) """
+
+    def __init__(self, canales, solo_muestras=False, lote=LOTE_LINEAS):
+        self.canales = canales
+        self.solo_muestras = solo_muestras
+        self.lote = lote
+        self.parser = ParserTexto(canales)
+        self._filas = []
+        self._filas_fft = []
+        self._pendientes = []
+        self._retenida = np.empty((0, canales), dtype=np.float32)  # Ultima fila antes de la FFT: puede ser el RMS
+        self._con_fft = False
+
+    @property
+    def descartadas(self):
+        return self.parser.descartadas
+
+    def agregar(self, linea):
+        """ Agrega una linea; se parsean de a lote o al llegar el FINISH.
+        Retorna True cuando llega el FINISH """
+        if b'FINISH' in linea:
+            self.agregar_lineas(self._pendientes)
+            self._pendientes = []
+            return True
+        self._pendientes.append(linea)
+        if len(self._pendientes) >= self.lote:
+            self.agregar_lineas(self._pendientes)
+            self._pendientes = []
+        return False
+
+    def agregar_lineas(self, lineas):
+        """ Parsea un lote de lineas. Retorna (muestras, terminada): las filas
+        que ya se sabe que son muestras (canales columnas) y si llego el
+        FINISH (lo que venga despues se ignora). Sin solo_muestras la ultima
+        fila antes de la FFT es el RMS, asi que cada fila se confirma como
+        muestra recien cuando llega la siguiente """
+        fin = _linea_con(lineas, b'FINISH')
+        lote = self.parser.parsear(lineas if fin is None else lineas[:fin])
+        self._filas.append(lote.filas)
+        self._filas_fft.append(lote.filas_fft)
+        if self.solo_muestras:
+            muestras = lote.filas
+        elif self._con_fft:
+            muestras = self._retenida[:0]
+        else:
+            candidatas = np.concatenate([self._retenida, lote.filas[:lote.filas_antes_fft]])
+            self._con_fft = len(lote.filas_fft) > 0
+            muestras, self._retenida = candidatas[:-1], candidatas[-1:]
+        return muestras, fin is not None
+
+    def ventana(self):
+        filas = np.concatenate(self._filas) if self._filas else np.empty((0, self.canales), dtype=np.float32)
+        filas_fft = (np.concatenate(self._filas_fft) if self._filas_fft
+                     else np.empty((0, 2 * self.canales), dtype=np.float32))
+        return unir_lineas(filas, filas_fft, self.canales, self.solo_muestras)
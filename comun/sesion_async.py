@@ -0,0 +1,145 @@
+""" Sesion asincrona (asyncio) con la ESP32.
+
+Implementa el mismo intercambio que comenzar_lectura, leyendo, cambiar_ventana
+y terminar_conexion de receiver.py (BEGIN -> OK -> datos -> FINISH, END ->
+CLOSED), pero sin el ser global ni un hilo por puerto: cada placa es una
+SesionESP32 y varias placas se manejan desde el mismo event loop.
+
+Ejemplo:
+
+    async def main():
+        sesiones = await asyncio.gather(abrir_sesion('COM3', 6), abrir_sesion('COM4', 6))
+        ventanas = await asyncio.gather(*(s.solicitar_ventana() for s in sesiones))
+        await asyncio.gather(*(s.terminar() for s in sesiones))
+
+    asyncio.run(main())
+
+Para abrir puertos reales se necesita pyserial-asyncio (pip install pyserial-asyncio).
+"""
+import asyncio
+from struct import pack
+
+from .protocolo import DecodificadorFrames, EnsambladorTexto, unir_frames, TIPO_FIN, COMANDO_BINARIO
+from .lector import DivisorLineas, ErrorLector, TIMEOUT
+
+BAUD_RATE = 115200  # Debe coincidir con la configuracion de la ESP32
+_FIN = None  # Marca que se pone en las colas cuando se pierde la conexion
+
+
+class ProtocoloESP32(asyncio.Protocol):
+    """ Protocolo de asyncio que separa lo recibido en lineas y frames """
+
+    def __init__(self):
+        self.transport = None
+        self.error = None
+        self.lineas = asyncio.Queue()
+        self.frames = asyncio.Queue()
+        self._divisor = DivisorLineas()
+        self._decodificador = DecodificadorFrames(guardar_texto=True)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        for frame in self._decodificador.alimentar(data):
+            self.frames.put_nowait(frame)
+        texto = self._decodificador.tomar_texto()
+        if texto:
+            for linea in self._divisor.alimentar(texto):
+                self.lineas.put_nowait(linea)
+
+    def connection_lost(self, exc):
+        self.error = exc
+        self.lineas.put_nowait(_FIN)
+        self.frames.put_nowait(_FIN)
+
+
+class SesionESP32:
+    """ Conversacion con una ESP32 sobre un transporte de asyncio """
+
+    def __init__(self, transport, protocolo, canales, binario=False, timeout=TIMEOUT):
+        self.transport = transport
+        self.protocolo = protocolo
+        self.canales = canales
+        self.binario = binario
+        self.timeout = timeout
+        self.descartadas = 0  # Lineas corruptas descartadas en modo texto, para quien use la sesion
+
+    async def _tomar(self, cola):
+        try:
+            dato = await asyncio.wait_for(cola.get(), self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"La ESP32 no respondio en {self.timeout} segundos") from None
+        if dato is _FIN:
+            cola.put_nowait(_FIN)
+            raise ErrorLector(f"Se perdio la conexion con la ESP32: {self.protocolo.error}")
+        return dato
+
+    async def leer_linea(self):
+        """ Retorna la siguiente linea recibida """
+        return await self._tomar(self.protocolo.lineas)
+
+    async def leer_frame(self):
+        """ Retorna el siguiente frame binario recibido """
+        return await self._tomar(self.protocolo.frames)
+
+    async def esperar_respuesta(self, esperado):
+        """ Descarta lineas hasta recibir una que contenga esperado """
+        while True:
+            linea = await self.leer_linea()
+            if esperado in linea:
+                return linea
+
+    async def activar_modo_binario(self):
+        """ Le pide a la ESP32 que envie las ventanas en frames binarios """
+        self.transport.write(COMANDO_BINARIO)
+        await self.esperar_respuesta(b"OK")
+        self.binario = True
+
+    async def solicitar_ventana(self):
+        """ Pide una ventana y retorna (muestras, rms, fft, peaks). En modo texto
+        levanta ValueError si la ventana no se puede armar (ver protocolo.unir_lineas) """
+        self.transport.write(pack('6s', 'BEGIN\0'.encode()))
+        await self.esperar_respuesta(b"OK")
+        if self.binario:
+            frames = []
+            while True:
+                frame = await self.leer_frame()
+                if frame.tipo == TIPO_FIN:
+                    return unir_frames(frames)
+                frames.append(frame)
+
+        ensamblador = EnsambladorTexto(self.canales)
+        while not ensamblador.agregar(await self.leer_linea()):
+            pass
+        self.descartadas += ensamblador.descartadas
+        return ensamblador.ventana()
+
+    async def cambiar_ventana(self, new_size):
+        """ Cambia el tamano de la ventana guardado en la ESP32 """
+        largo_mensaje = len(str(new_size))
+        self.transport.write(pack(f'{largo_mensaje}s', f'{new_size}\0'.encode()))
+
+    async def terminar(self):
+        """ Envia END\\0, espera CLOSED y cierra el transporte """
+        self.transport.write(pack('4s', 'END\0'.encode()))
+        try:
+            await self.esperar_respuesta(b"CLOSED")
+        finally:
+            self.transport.close()
+
+
+async def abrir_sesion(puerto, canales, baudios=BAUD_RATE, binario=False, timeout=TIMEOUT):
+    """ Abre el puerto con pyserial-asyncio y retorna una SesionESP32 """
+    try:
+        import serial_asyncio
+    except ImportError as e:
+        raise ErrorLector("Para usar asyncio se necesita pyserial-asyncio (pip install pyserial-asyncio)") from e
+
+    loop = asyncio.get_running_loop()
+    transport, protocolo = await serial_asyncio.create_serial_connection(
+        loop, ProtocoloESP32, puerto, baudrate=baudios)
+    sesion = SesionESP32(transport, protocolo, canales, timeout=timeout)
+    if binario:
+        await sesion.activar_modo_binario()
+    return sesion
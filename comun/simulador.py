@@ -0,0 +1,357 @@
+""" ESP32 simulada que habla el mismo protocolo que el firmware.
+
+A diferencia de demo-interfaz.py, que reemplaza leyendo() por listas de
+random.randint, aca la ESP32 simulada corre en otro hilo detras de un puerto
+serial virtual, asi receiver.py pasa por todo el camino real: escritura de
+comandos, LectorSerial, separacion de lineas o frames y armado de la ventana.
+
+Entiende BEGIN, END, el tamano de ventana, BINAR/TEXTO, CRUDO/COMPL,
+STRM/STOP, CUENT/FLOAT si se le da escala_cuentas (solo la BMI270 los tiene) y el cambio de baudios (BAUD<i>, PRUEB, CONFI; ver enlace.py), y
+responde OK, muestras, RMS, FFT, peaks, FINISH (o el frame FIN) y CLOSED. Se
+puede limitar la velocidad como si fuera una UART (baudios), simular un
+enlace que falla sobre cierta velocidad (baudios_maximo),
+fijar la frecuencia de muestreo, el ruido e inyectar fallas: lineas o frames
+perdidos, bytes corruptos, lineas de basura (como los printf del firmware) y
+BEGIN sin respuesta.
+
+Puertos virtuales:
+    - pty (Linux y macOS): abrir_pty() retorna una ruta como /dev/pts/3
+    - TCP (cualquier sistema): abrir_tcp() retorna 'socket://127.0.0.1:<puerto>',
+      que se abre con serial.serial_for_url (receiver.py acepta ambas como PORT)
+
+Uso desde la consola:
+
+    python -m comun.simulador --canales 6 --frecuencia 100 --baudios 115200 --perdida 0.01   (desde la raiz del repositorio)
+"""
+import argparse
+import os
+import select
+import socket
+import threading
+import time
+
+import numpy as np
+
+from .protocolo import (codificar_frame, patron_prueba, TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16, TIPO_RMS, TIPO_FFT, TIPO_PEAKS, TIPO_FIN,
+                       TIPO_PRUEBA, VELOCIDADES, PLAZO_BAUDIOS)
+from .analisis import calcular_rms, calcular_fft, calcular_peaks
+
+FILAS_POR_FRAME = 64  # Igual que en el firmware
+FILAS_CONTINUO = 16  # Muestras por bloque en el modo continuo
+BASURA = b"Calculando RMS de los datos\n"  # Los firmwares mezclan printf de depuracion con los datos
+
+
+class ESP32Simulada:
+    """ ESP32 simulada que atiende un puerto virtual desde su propio hilo """
+
+    def __init__(self, canales=6, ventana=10, frecuencia=None, baudios=None, ruido=0.1,
+                 prob_perdida=0.0, prob_corrupcion=0.0, prob_basura=0.0, prob_silencio=0.0, semilla=None,
+                 baudios_maximo=None, escala_cuentas=None):
+        self.canales = canales
+        self.ventana = ventana
+        self.frecuencia = frecuencia  # Muestras por segundo; None para enviar sin esperar
+        self.baudios = baudios  # Limita los bytes por segundo como una UART (10 bits por byte); None sin limite
+        self.velocidad = baudios or VELOCIDADES[0]  # Baudios actuales de la UART simulada
+        self.baudios_maximo = baudios_maximo  # Sobre esta velocidad el patron de prueba llega corrupto
+        self.ruido = ruido
+        self.prob_perdida = prob_perdida
+        self.prob_corrupcion = prob_corrupcion
+        self.prob_basura = prob_basura
+        self.prob_silencio = prob_silencio
+        self.modo_binario = False
+        self.solo_crudo = False
+        self.cuentas = False  # Con CUENT las muestras binarias van como int16
+        # Unidades por cuenta de cada canal (conversion.Conversion.factor en T4); None: CUENT se ignora como en la BME688
+        self.escala_cuentas = None
+        if escala_cuentas is not None:
+            self.escala_cuentas = np.broadcast_to(np.asarray(escala_cuentas, dtype=np.float64), (canales,))
+        self.estadisticas = {"ventanas": 0, "bytes": 0, "perdidas": 0, "corruptas": 0, "basura": 0, "silencios": 0}
+        self._rng = np.random.default_rng(semilla)
+        self._muestra = 0  # Muestras generadas, para que la senal siga entre ventanas
+        self._secuencia = 0
+        self._detener = threading.Event()
+        self._hilo = None
+        self._recibir = None
+        self._enviar = None
+        self._cambio = None  # (velocidad, baudios, limite) para volver atras si no llega CONFI
+        self._inicial = (self.velocidad, self.baudios)
+
+    # Puertos virtuales
+
+    def abrir_pty(self):
+        """ Crea un pseudo terminal y retorna la ruta que debe abrir el computador """
+        import tty
+        maestro, esclavo = os.openpty()
+        tty.setraw(maestro)
+        tty.setraw(esclavo)
+        self._esclavo = esclavo  # Se mantiene abierto para que el maestro no falle si el computador cierra
+
+        def recibir(timeout):
+            listos, _, _ = select.select([maestro], [], [], timeout)
+            if not listos:
+                return b''
+            try:
+                return os.read(maestro, 4096)
+            except OSError:
+                return None
+
+        def enviar(datos):
+            while datos:
+                datos = datos[os.write(maestro, datos):]
+
+        self._iniciar(recibir, enviar, lambda: self._atender())
+        return os.ttyname(esclavo)
+
+    def abrir_tcp(self, puerto=0):
+        """ Escucha en 127.0.0.1 y retorna la url para serial.serial_for_url """
+        servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        servidor.bind(("127.0.0.1", puerto))
+        servidor.listen(1)
+        servidor.settimeout(0.2)
+        conexion = {}
+
+        def recibir(timeout):
+            listos, _, _ = select.select([conexion["socket"]], [], [], timeout)
+            if not listos:
+                return b''
+            try:
+                return conexion["socket"].recv(4096) or None
+            except OSError:
+                return None
+
+        def enviar(datos):
+            conexion["socket"].sendall(datos)
+
+        def atender_conexiones():
+            # Se atiende una conexion a la vez; al cerrarse se espera la siguiente
+            while not self._detener.is_set():
+                try:
+                    conexion["socket"], _ = servidor.accept()
+                except socket.timeout:
+                    continue
+                with conexion["socket"]:
+                    self._atender()
+            servidor.close()
+
+        self._iniciar(recibir, enviar, atender_conexiones)
+        return f"socket://127.0.0.1:{servidor.getsockname()[1]}"
+
+    def _iniciar(self, recibir, enviar, objetivo):
+        self._recibir = recibir
+        self._enviar = enviar
+        self._hilo = threading.Thread(target=objetivo, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    # Protocolo
+
+    def _atender(self):
+        """ Lee comandos hasta que se cierre la conexion. Como el firmware lee
+        de a 6 bytes con timeout, un comando termina en \\0 o cuando deja de
+        llegar datos (el cambio de ventana se envia sin \\0) """
+        buffer = b''
+        while not self._detener.is_set():
+            datos = self._recibir(0.05)
+            if datos is None:
+                return
+            buffer += datos
+            while b'\0' in buffer:
+                comando, buffer = buffer.split(b'\0', 1)
+                self._comando(comando)
+            if buffer and not datos:
+                self._comando(buffer)
+                buffer = b''
+
+    def _comando(self, comando):
+        comando = comando.strip(b'\0').decode(errors='replace')
+        if self._cambio is not None and time.monotonic() > self._cambio[2]:
+            # No llego CONFI a tiempo: como el firmware, se vuelve a la velocidad anterior
+            self.velocidad, self.baudios, _ = self._cambio
+            self._cambio = None
+        if comando == "BEGIN":
+            self._enviar_ventana()
+        elif comando == "END":
+            self._escribir(b"CLOSED\0")
+            # El firmware se reinicia: vuelve al modo texto con el analisis completo y a la velocidad inicial
+            self.modo_binario = False
+            self.solo_crudo = False
+            self.cuentas = False
+            self.velocidad, self.baudios = self._inicial
+            self._cambio = None
+        elif comando in ("BINAR", "TEXTO"):
+            self.modo_binario = comando == "BINAR"
+            self._escribir(b"OK\0")
+        elif comando in ("CRUDO", "COMPL"):
+            self.solo_crudo = comando == "CRUDO"
+            self._escribir(b"OK\0")
+        elif comando in ("CUENT", "FLOAT") and self.escala_cuentas is not None:
+            self.cuentas = comando == "CUENT"
+            self._escribir(b"OK\0")
+        elif comando == "STRM":
+            self._continuo()
+        elif comando.startswith("BAUD") and comando[4:].isdigit() and int(comando[4:]) < len(VELOCIDADES):
+            self._escribir(b"OK\0")
+            self._cambio = (self.velocidad, self.baudios, time.monotonic() + PLAZO_BAUDIOS)
+            self.velocidad = VELOCIDADES[int(comando[4:])]
+            if self.baudios:
+                self.baudios = self.velocidad
+        elif comando == "PRUEB" and self._cambio is not None:
+            patron = patron_prueba()
+            if self.baudios_maximo is not None and self.velocidad > self.baudios_maximo:
+                # Enlace poco confiable a esta velocidad: se pierden bits
+                patron = patron ^ self._rng.integers(0, 2, len(patron), dtype=np.uint8)
+            self._escribir(codificar_frame(TIPO_PRUEBA, self._siguiente(), patron[:, np.newaxis]))
+        elif comando == "CONFI" and self._cambio is not None:
+            self._cambio = None
+            self._escribir(b"OK\0")
+        elif comando.isdigit():
+            self.ventana = int(comando)
+
+    def _generar(self, n):
+        """ n muestras x canales: una sinusoide distinta por canal mas ruido gaussiano """
+        if self.frecuencia:
+            time.sleep(n / self.frecuencia)
+        t = (self._muestra + np.arange(n))[:, np.newaxis] / (self.frecuencia or 100)
+        canal = np.arange(1, self.canales + 1)
+        muestras = canal * np.sin(2 * np.pi * canal * t) + self.ruido * self._rng.standard_normal((n, self.canales))
+        self._muestra += n
+        return muestras.astype(np.float32)
+
+    def _enviar_ventana(self):
+        if self._rng.random() < self.prob_silencio:
+            self.estadisticas["silencios"] += 1
+            return
+        self._escribir(b"OK\0")
+        if self.modo_binario:
+            muestras = self._generar(self.ventana)
+            self._muestras_binarias(muestras)
+            if not self.solo_crudo:
+                self._paquete(codificar_frame(TIPO_RMS, self._siguiente(), calcular_rms(muestras.T)))
+                self._frames(TIPO_FFT, calcular_fft(muestras.T).T)
+                self._paquete(codificar_frame(TIPO_PEAKS, self._siguiente(), calcular_peaks(muestras.T).T))
+            self._paquete(codificar_frame(TIPO_FIN, self._siguiente(), canales=self.canales), fallas=False)
+        else:
+            if self.frecuencia:
+                # Cada muestra sale apenas se mide, como en el firmware
+                muestras = np.empty((self.ventana, self.canales), dtype=np.float32)
+                for i in range(self.ventana):
+                    muestras[i] = self._generar(1)[0]
+                    self._linea(muestras[i])
+            else:
+                muestras = self._generar(self.ventana)
+                for fila in muestras:
+                    self._linea(fila)
+            if not self.solo_crudo:
+                self._linea(calcular_rms(muestras.T))
+                fft = calcular_fft(muestras.T).T
+                for fila in np.stack([fft.real, fft.imag], axis=-1).reshape(len(fft), -1):
+                    self._linea(fila)
+                for fila in calcular_peaks(muestras.T).T:
+                    self._linea(fila)
+            self._escribir(b"FINISH\0")
+        self.estadisticas["ventanas"] += 1
+
+    def _continuo(self):
+        """ Envia bloques de muestras hasta recibir STOP """
+        self._escribir(b"OK\0")
+        while not self._detener.is_set():
+            muestras = self._generar(FILAS_CONTINUO)
+            if self.modo_binario:
+                self._muestras_binarias(muestras)
+            else:
+                for fila in muestras:
+                    self._linea(fila)
+            datos = self._recibir(0)
+            if datos is None:
+                return
+            if b"STOP" in datos:
+                break
+        if self.modo_binario:
+            self._paquete(codificar_frame(TIPO_FIN, self._siguiente(), canales=self.canales), fallas=False)
+        else:
+            self._escribir(b"FINISH\0")
+
+    # Envio
+
+    def _siguiente(self):
+        self._secuencia = (self._secuencia + 1) & 0xFFFF
+        return self._secuencia
+
+    def _frames(self, tipo, filas):
+        for i in range(0, len(filas), FILAS_POR_FRAME):
+            self._paquete(codificar_frame(tipo, self._siguiente(), filas[i:i + FILAS_POR_FRAME]))
+
+    def _muestras_binarias(self, muestras):
+        """ Envia las muestras en float32 o, con CUENT, como cuentas int16 """
+        if self.cuentas:
+            cuentas = np.clip(np.rint(muestras / self.escala_cuentas), -32768, 32767).astype(np.int16)
+            self._frames(TIPO_MUESTRAS_I16, cuentas)
+        else:
+            self._frames(TIPO_MUESTRAS_F32, muestras)
+
+    def _linea(self, valores):
+        self._paquete((" ".join(f"{valor:f}" for valor in valores) + "\n").encode())
+
+    def _paquete(self, datos, fallas=True):
+        """ Envia una linea o un frame, aplicando las fallas configuradas """
+        if fallas:
+            if self._rng.random() < self.prob_basura:
+                self.estadisticas["basura"] += 1
+                self._escribir(BASURA)
+            if self._rng.random() < self.prob_perdida:
+                self.estadisticas["perdidas"] += 1
+                return
+            if self._rng.random() < self.prob_corrupcion:
+                self.estadisticas["corruptas"] += 1
+                datos = bytearray(datos)
+                # Sin tocar el terminador, para que la linea siga separada de la siguiente
+                datos[int(self._rng.integers(0, max(1, len(datos) - 1)))] = ord('#')
+                datos = bytes(datos)
+        self._escribir(datos)
+
+    def _escribir(self, datos):
+        if self.baudios:
+            # Lo que tardaria la UART en transmitir los bytes, antes de que lleguen
+            time.sleep(len(datos) * 10 / self.baudios)
+        self._enviar(datos)
+        self.estadisticas["bytes"] += len(datos)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ESP32 simulada en un puerto virtual")
+    parser.add_argument("--canales", type=int, default=6, help="6 para la BMI270, 4 para la BME688")
+    parser.add_argument("--ventana", type=int, default=10, help="Tamano inicial de la ventana")
+    parser.add_argument("--frecuencia", type=float, default=None, help="Muestras por segundo (sin limite por defecto)")
+    parser.add_argument("--baudios", type=int, default=None, help="Limitar como una UART a estos baudios")
+    parser.add_argument("--ruido", type=float, default=0.1, help="Desviacion estandar del ruido")
+    parser.add_argument("--perdida", type=float, default=0.0, help="Probabilidad de perder una linea o frame")
+    parser.add_argument("--corrupcion", type=float, default=0.0, help="Probabilidad de corromper una linea o frame")
+    parser.add_argument("--basura", type=float, default=0.0, help="Probabilidad de agregar una linea de basura")
+    parser.add_argument("--silencio", type=float, default=0.0, help="Probabilidad de no responder un BEGIN")
+    parser.add_argument("--baudios-maximo", type=int, default=None, help="Sobre estos baudios falla la prueba del enlace")
+    parser.add_argument("--tcp", type=int, default=None, help="Usar un socket TCP en este puerto en vez de un pty")
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--escala-cuentas", type=float, default=None,
+                        help="Unidades por cuenta con CUENT (8/32768 = 0.000244 para la BMI270 a +-8 g); sin esto se ignora CUENT")
+    args = parser.parse_args()
+
+    simulador = ESP32Simulada(args.canales, args.ventana, args.frecuencia, args.baudios, args.ruido,
+                              args.perdida, args.corrupcion, args.basura, args.silencio, args.semilla,
+                              args.baudios_maximo, args.escala_cuentas)
+    if args.tcp is not None or os.name == "nt":
+        puerto = simulador.abrir_tcp(args.tcp or 0)
+    else:
+        puerto = simulador.abrir_pty()
+    print(f"ESP32 simulada en {puerto} (usar como PORT en receiver.py). Ctrl+C para terminar")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Estadisticas: {simulador.estadisticas}")
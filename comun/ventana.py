@@ -0,0 +1,91 @@
+""" Contenedor de una ventana de datos de la ESP32.
+
+En vez de listas paralelas de floats y un diccionario con una llave por canal
+y seccion, toda la ventana vive en un solo arreglo float32 de
+canales x (2n + n + 1 + N_PEAKS), con una fila por canal:
+
+    | FFT (re, im intercalados, 2n) | muestras (n) | RMS (1) | peaks (N_PEAKS) |
+
+crudo, rms, fft y peaks son vistas sobre ese arreglo (no copias), asi los
+graficos, las estadisticas y el almacenamiento trabajan directo sobre el.
+"""
+import numpy as np
+
+from .protocolo import N_PEAKS, TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16, TIPO_RMS, TIPO_FFT, TIPO_PEAKS
+
+
+class Ventana:
+    """ Ventana de n muestras por canal con su RMS, FFT y peaks """
+
+    def __init__(self, canales, n, n_peaks=N_PEAKS, nombres=None):
+        if nombres is None:
+            nombres = [f"canal_{i}" for i in range(canales)]
+        if len(nombres) != canales:
+            raise ValueError(f"Se esperaban {canales} nombres de canal y llegaron {len(nombres)}")
+        self.nombres = tuple(nombres)
+        self.datos = np.zeros((canales, 3 * n + 1 + n_peaks), dtype=np.float32)
+        # La FFT va primero para que su vista compleja quede alineada
+        self.fft = self.datos[:, :2 * n].view(np.complex64)
+        self.crudo = self.datos[:, 2 * n:3 * n]
+        self.rms = self.datos[:, 3 * n]
+        self.peaks = self.datos[:, 3 * n + 1:]
+        # Lista por canal de (valor, indice, tiempo) si los peaks se siguieron con estadisticas.TopK
+        self.detalle_peaks = None
+        # Series de una fila por muestra que el receptor calcula mientras llega la ventana, por nombre
+        self.derivadas = {}
+
+    @classmethod
+    def desde_arreglos(cls, muestras, rms, fft, peaks, nombres=None):
+        """ Crea la ventana a partir de (muestras, rms, fft, peaks) como los
+        retornan unir_frames y unir_lineas (una fila por muestra). Las
+        secciones que no envio la ESP32 (None) quedan en cero """
+        n, canales = muestras.shape
+        ventana = cls(canales, n, N_PEAKS if peaks is None else len(peaks), nombres)
+        ventana.crudo[:] = muestras.T
+        if rms is not None:
+            ventana.rms[:] = rms
+        if fft is not None:
+            ventana.fft[:] = fft.T
+        if peaks is not None:
+            ventana.peaks[:] = peaks.T
+        return ventana
+
+    @classmethod
+    def desde_frames(cls, frames, nombres=None):
+        """ Crea la ventana copiando cada frame una sola vez a su lugar. Sin
+        frames la ventana queda vacia, con los canales de nombres (o ninguno) """
+        tamanos = {}
+        canales = len(nombres) if nombres is not None else 0
+        for frame in frames:
+            tamanos[frame.tipo] = tamanos.get(frame.tipo, 0) + len(frame.datos)
+            canales = frame.canales
+        n = tamanos.get(TIPO_MUESTRAS_F32, tamanos.get(TIPO_MUESTRAS_I16, 0))
+        ventana = cls(canales, n, tamanos.get(TIPO_PEAKS, N_PEAKS), nombres)
+        posiciones = {}
+        for frame in frames:
+            if frame.tipo == TIPO_RMS:
+                ventana.rms[:] = frame.datos
+                continue
+            destino = {TIPO_MUESTRAS_F32: ventana.crudo, TIPO_MUESTRAS_I16: ventana.crudo,
+                       TIPO_FFT: ventana.fft, TIPO_PEAKS: ventana.peaks}.get(frame.tipo)
+            if destino is None:
+                continue
+            inicio = posiciones.get(frame.tipo, 0)
+            destino[:, inicio:inicio + len(frame.datos)] = frame.datos.T
+            posiciones[frame.tipo] = inicio + len(frame.datos)
+        return ventana
+
+    @property
+    def canales(self):
+        return self.datos.shape[0]
+
+    def __len__(self):
+        return self.crudo.shape[1]
+
+    def indice(self, nombre):
+        """ Retorna la fila del canal con ese nombre """
+        return self.nombres.index(nombre)
+
+    def __getitem__(self, nombre):
+        """ ventana['acc_x'] retorna las muestras de ese canal (una vista) """
+        return self.crudo[self.indice(nombre)]
@@ -0,0 +1,6 @@
+""" Configuracion de pytest: agrega la raiz del repositorio al path para
+importar comun (como rutas.py en T1 y T4) """
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,104 @@
+""" Pruebas del almacenamiento en disco: ida y vuelta, busqueda por tiempo y
+recuperacion despues de una escritura interrumpida """
+import os
+
+import numpy as np
+import pytest
+
+from comun.almacenamiento import EscritorAlmacen, Almacen, ErrorAlmacen, DTYPE_INDICE
+from comun.analisis import analizar
+from comun.ventana import Ventana
+
+NOMBRES = ("a", "b", "c")
+
+
+def ventana_de_prueba(n, semilla):
+    muestras = np.random.default_rng(semilla).standard_normal((n, len(NOMBRES))).astype(np.float32)
+    return analizar(Ventana.desde_arreglos(muestras, None, None, None, nombres=NOMBRES))
+
+
+def escribir(carpeta, ventanas, tiempo_inicial=0, reduccion=None):
+    escritor = EscritorAlmacen(str(carpeta), NOMBRES, intervalo_fsync=0.05, reduccion=reduccion)
+    escritor.start()
+    for i, ventana in enumerate(ventanas):
+        escritor.agregar(ventana, tiempo=tiempo_inicial + i)
+    escritor.detener()
+    assert escritor.error is None
+    return escritor
+
+
+def test_ida_y_vuelta(tmp_path):
+    ventanas = [ventana_de_prueba(n, i) for i, n in enumerate([10, 64, 1, 33])]
+    escribir(tmp_path, ventanas)
+    almacen = Almacen(str(tmp_path))
+    assert len(almacen) == 4
+    for i, ventana in enumerate(ventanas):
+        np.testing.assert_array_equal(almacen.ventana(i).datos, ventana.datos)
+    np.testing.assert_array_equal(almacen.columna("b"), np.concatenate([v["b"] for v in ventanas]))
+    np.testing.assert_array_equal(almacen.rms, np.array([v.rms for v in ventanas]))
+    assert list(almacen.entre(1, 3)) == [1, 2]
+
+
+def test_agregar_a_una_carpeta_existente(tmp_path):
+    escribir(tmp_path, [ventana_de_prueba(20, 0)])
+    escribir(tmp_path, [ventana_de_prueba(30, 1)], tiempo_inicial=10)
+    almacen = Almacen(str(tmp_path))
+    assert list(almacen.indice['inicio']) == [0, 20] and list(almacen.tiempos) == [0, 10]
+    np.testing.assert_array_equal(almacen.ventana(1).datos, ventana_de_prueba(30, 1).datos)
+
+
+def test_escritura_interrumpida_se_recorta(tmp_path):
+    ventanas = [ventana_de_prueba(16, i) for i in range(3)]
+    escribir(tmp_path, ventanas)
+    # Un corte de luz despues de escribir parte de las columnas de una cuarta ventana, antes del indice
+    for nombre in NOMBRES:
+        with open(tmp_path / f"crudo_{nombre}.f32", "ab") as archivo:
+            archivo.write(np.ones(7, dtype=np.float32).tobytes())
+    with open(tmp_path / "rms.f32", "ab") as archivo:
+        archivo.write(b"\x01\x02")
+    with open(tmp_path / "indice.bin", "ab") as archivo:
+        archivo.write(b"\x00" * (DTYPE_INDICE.itemsize // 2))  # Registro del indice a medio escribir
+
+    # Al leer, lo que no esta en el indice no existe
+    almacen = Almacen(str(tmp_path))
+    assert len(almacen) == 3 and len(almacen.columna("a")) == 48
+
+    # Al volver a abrir para escribir se recortan los restos y la ventana nueva queda seguida
+    escribir(tmp_path, [ventana_de_prueba(5, 9)], tiempo_inicial=3)
+    assert os.path.getsize(tmp_path / "crudo_a.f32") == (48 + 5) * 4
+    assert os.path.getsize(tmp_path / "indice.bin") == 4 * DTYPE_INDICE.itemsize
+    almacen = Almacen(str(tmp_path))
+    assert len(almacen) == 4
+    np.testing.assert_array_equal(almacen.ventana(3).datos, ventana_de_prueba(5, 9).datos)
+    np.testing.assert_array_equal(almacen.ventana(2).datos, ventanas[2].datos)
+
+
+def test_esquema_distinto(tmp_path):
+    escribir(tmp_path, [ventana_de_prueba(4, 0)])
+    with pytest.raises(ErrorAlmacen):
+        EscritorAlmacen(str(tmp_path), ("x", "y"))
+    with pytest.raises(ErrorAlmacen):
+        Almacen(str(tmp_path / "no_existe"))
+
+
+def test_nivel_reducido(tmp_path):
+    ventanas = [ventana_de_prueba(n, i) for i, n in enumerate([10, 64, 3])]
+    escribir(tmp_path, ventanas, reduccion=8)
+    almacen = Almacen(str(tmp_path))
+    assert [len(almacen.reducida("a", i)) for i in range(3)] == [2, 8, 1]
+    for i, ventana in enumerate(ventanas):
+        b = ventana["b"]
+        np.testing.assert_array_equal(almacen.reducida("b", i)[:, 0], [b[j:j + 8].min() for j in range(0, len(b), 8)])
+        np.testing.assert_array_equal(almacen.reducida("b", i)[:, 1], [b[j:j + 8].max() for j in range(0, len(b), 8)])
+    assert len(almacen.reducida("c")) == 11
+    # El nivel reducido tambien se recorta despues de una escritura interrumpida
+    with open(tmp_path / "reducido_a.f32", "ab") as archivo:
+        archivo.write(np.ones(3, dtype=np.float32).tobytes())
+    escribir(tmp_path, [ventana_de_prueba(9, 5)], tiempo_inicial=3, reduccion=8)
+    np.testing.assert_array_equal(Almacen(str(tmp_path)).reducida("a", 3)[:, 1],
+                                  [ventana_de_prueba(9, 5)["a"][:8].max(), ventana_de_prueba(9, 5)["a"][8]])
+    with pytest.raises(ErrorAlmacen):
+        EscritorAlmacen(str(tmp_path), NOMBRES, reduccion=16)
+    with pytest.raises(ErrorAlmacen):
+        escribir(tmp_path / "sin", [ventana_de_prueba(4, 0)])
+        Almacen(str(tmp_path / "sin")).reducida("a")
@@ -0,0 +1,107 @@
+""" Pruebas de analisis.resumir y analizar contra numpy canal por canal y del
+cache de planes de la FFT """
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from comun import analisis
+from comun.analisis import (analizar, resumir, magnitudes, verificar, calcular_peaks, calcular_fft, plan_fft,
+                            PlanFFT)
+from comun.ventana import Ventana
+
+
+def test_resumir_igual_a_numpy():
+    crudo = np.random.default_rng(1).standard_normal((4, 256)).astype(np.float32)
+    crudo[2] += np.sin(2 * np.pi * 10 * np.arange(256) / 256) * 5  # Tono de 10 Hz con periodo 1 / 256
+    resumen = resumir(crudo, periodo=1 / 256)
+    for i, fila in enumerate(crudo.astype(np.float64)):
+        np.testing.assert_allclose(resumen.rms[i], np.sqrt(np.mean(fila ** 2)), rtol=1e-6)
+        np.testing.assert_allclose(resumen.media[i], fila.mean(), rtol=1e-5, atol=1e-6)
+        assert resumen.minimo[i] == crudo[i].min() and resumen.maximo[i] == crudo[i].max()
+        np.testing.assert_array_equal(resumen.peaks[i], np.sort(crudo[i])[::-1][:resumen.peaks.shape[1]])
+        np.testing.assert_allclose(resumen.magnitud_fft[i], np.abs(np.fft.rfft(fila)) / 256, rtol=1e-4, atol=1e-5)
+    assert resumen.frecuencia_dominante[2] == 10
+
+
+def test_resumir_sin_muestras():
+    resumen = resumir(np.empty((3, 0), dtype=np.float32))
+    assert np.all(np.isnan(resumen.rms)) and np.all(np.isnan(resumen.maximo))
+    assert resumen.peaks.shape == (3, 5) and np.all(np.isnan(resumen.peaks))
+    assert resumen.magnitud_fft.shape == (3, 0) and len(resumen.frecuencias) == 0
+
+
+def test_magnitudes_por_grupo():
+    crudo = np.random.default_rng(4).standard_normal((6, 50)).astype(np.float32)
+    normas = magnitudes(crudo, {"acc": [0, 1, 2], "gyr": [3, 4, 5]})
+    np.testing.assert_allclose(normas["acc"], np.linalg.norm(crudo[:3].astype(np.float64), axis=0), rtol=1e-12)
+    np.testing.assert_allclose(normas["gyr"], np.linalg.norm(crudo[3:].astype(np.float64), axis=0), rtol=1e-12)
+
+
+def test_analizar_escribe_en_la_ventana():
+    muestras = np.random.default_rng(2).standard_normal((64, 6)).astype(np.float32)
+    ventana = analizar(Ventana.desde_arreglos(muestras, None, None, None))
+    np.testing.assert_allclose(ventana.rms, np.sqrt(np.mean(muestras.astype(np.float64) ** 2, axis=0)), rtol=1e-6)
+    np.testing.assert_allclose(ventana.fft, np.fft.fft(muestras.T) / 64, rtol=1e-4, atol=1e-5)
+    np.testing.assert_array_equal(ventana.peaks, calcular_peaks(muestras.T))
+
+
+def test_peaks_con_menos_muestras_que_k():
+    peaks = calcular_peaks(np.array([[3.0, 1.0, 2.0]]), k=5)
+    np.testing.assert_array_equal(peaks[0, :3], [3, 2, 1])
+    assert np.all(np.isnan(peaks[0, 3:]))
+
+
+def test_verificar_marca_el_canal_distinto():
+    muestras = np.random.default_rng(3).standard_normal((32, 4)).astype(np.float32)
+    ventana = analizar(Ventana.desde_arreglos(muestras, None, None, None, nombres=["a", "b", "c", "d"]))
+    ventana.rms[2] += 1
+    resultado = verificar(ventana)
+    assert resultado["rms"][1] == ["c"] and resultado["fft"][1] == [] and resultado["peaks"][1] == []
+
+
+@pytest.mark.parametrize("n", [1, 2, 63, 64])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_fft_igual_a_np_fft(n, dtype):
+    crudo = np.random.default_rng(n).standard_normal((3, n)).astype(dtype)
+    np.testing.assert_allclose(calcular_fft(crudo), np.fft.fft(crudo) / n, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(calcular_fft(crudo, completa=False), np.fft.rfft(crudo) / n, rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("ventana, funcion", [("hann", np.hanning), ("hamming", np.hamming)])
+def test_fft_con_funcion_de_ventana(ventana, funcion):
+    crudo = np.random.default_rng(4).standard_normal((2, 100)).astype(np.float32)
+    esperada = np.fft.fft(crudo * funcion(100)) / funcion(100).sum()
+    np.testing.assert_allclose(calcular_fft(crudo, ventana=ventana), esperada, rtol=1e-4, atol=1e-5)
+    with pytest.raises(ValueError):
+        calcular_fft(crudo, ventana="blackman")
+
+
+def test_fft_sin_out_de_numpy(monkeypatch):
+    # Con numpy < 2 rfft no acepta out: el resultado se copia al buffer del plan
+    crudo = np.random.default_rng(5).standard_normal((4, 50)).astype(np.float32)
+    con_out = calcular_fft(crudo)
+    monkeypatch.setattr(analisis, "RFFT_CON_OUT", False)
+    np.testing.assert_array_equal(calcular_fft(crudo), con_out)
+    np.testing.assert_array_equal(PlanFFT(50, (4,), "hann").fft(crudo), calcular_fft(crudo, ventana="hann"))
+
+
+def test_plan_reutiliza_sus_buffers():
+    plan = PlanFFT(32, (2,))
+    primera = plan.fft(np.ones((2, 32), dtype=np.float32))
+    segunda = plan.fft(np.zeros((2, 32), dtype=np.float32))
+    assert primera is segunda and not np.any(segunda)
+    np.testing.assert_allclose(plan.frecuencias, np.fft.rfftfreq(32))
+
+
+def test_cache_lru_de_planes(monkeypatch):
+    monkeypatch.setattr(analisis, "_planes", OrderedDict())
+    monkeypatch.setattr(analisis, "MAX_PLANES", 3)
+    planes = {n: plan_fft(n, (6,)) for n in (10, 11, 12)}
+    assert plan_fft(10, (6,)) is planes[10]  # Pasa a ser el usado mas recientemente
+    plan_fft(13, (6,))  # Se descarta el 11, el que lleva mas tiempo sin usarse
+    assert len(analisis._planes) == 3
+    assert plan_fft(10, (6,)) is planes[10] and plan_fft(12, (6,)) is planes[12]
+    assert plan_fft(11, (6,)) is not planes[11]
+    # Los canales, la funcion de ventana y el periodo tambien son parte de la clave
+    assert plan_fft(10, (4,)) is not planes[10] and plan_fft(10, (6,), "hann") is not planes[10]
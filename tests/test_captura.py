@@ -0,0 +1,84 @@
+""" Pruebas de la captura de una sesion serial y su reproduccion con el mismo LectorSerial """
+import queue
+
+import pytest
+
+from comun.captura import SerialGrabador, SerialReproductor, leer_captura, RECIBIDO, ENVIADO
+from comun.lector import LectorSerial
+
+
+class PuertoESP32:
+    """ Puerto en memoria que contesta BEGIN con una ventana corta y END con CLOSED """
+
+    def __init__(self):
+        self._respuestas = queue.Queue()
+        self.timeout = 0.05
+        self.in_waiting = 0
+
+    def write(self, datos):
+        if datos.startswith(b"BEGIN"):
+            self._respuestas.put(b"OK\0")
+            self._respuestas.put(b"1.0 2.0\n3.0 4.0\nFINISH\0")
+        elif datos.startswith(b"END"):
+            self._respuestas.put(b"CLOSED\0")
+        return len(datos)
+
+    def read(self, tamano):
+        try:
+            return self._respuestas.get(timeout=self.timeout)
+        except queue.Empty:
+            return b""
+
+    def close(self):
+        pass
+
+
+def sesion(ser):
+    """ BEGIN, las lineas hasta FINISH, END y CLOSED, como receiver.py """
+    lector = LectorSerial(ser)
+    lector.start()
+    ser.write(b"BEGIN\0")
+    lineas = [lector.esperar_respuesta(b"OK", timeout=2)]
+    while lineas[-1] != b"FINISH":
+        lineas.append(lector.leer_linea(timeout=2))
+    ser.write(b"END\0")
+    lineas.append(lector.esperar_respuesta(b"CLOSED", timeout=2))
+    lector.detener()
+    ser.close()
+    return lineas
+
+
+def test_grabar_y_reproducir(tmp_path):
+    ruta = tmp_path / "sesion.cap"
+    grabadas = sesion(SerialGrabador(PuertoESP32(), ruta))
+    assert grabadas == [b"OK", b"1.0 2.0", b"3.0 4.0", b"FINISH", b"CLOSED"]
+
+    eventos = list(leer_captura(ruta))
+    assert [direccion for _, direccion, _ in eventos] == [ENVIADO, RECIBIDO, RECIBIDO, ENVIADO, RECIBIDO]
+    assert [tiempo for tiempo, _, _ in eventos] == sorted(tiempo for tiempo, _, _ in eventos)
+
+    reproductor = SerialReproductor(ruta, timeout=0.05)
+    assert sesion(reproductor) == grabadas
+    assert reproductor.enviados == [b"BEGIN\0", b"END\0"] and reproductor.terminado
+
+
+def test_reproduccion_espera_la_escritura(tmp_path):
+    ruta = tmp_path / "sesion.cap"
+    sesion(SerialGrabador(PuertoESP32(), ruta))
+    reproductor = SerialReproductor(ruta, timeout=0.05)
+    assert reproductor.read(100) == b""  # La ventana no llega antes del BEGIN
+    reproductor.write(b"BEGIN\0")
+    assert reproductor.read(100) == b"OK\0"
+
+
+def test_captura_cortada_y_archivo_ajeno(tmp_path):
+    ruta = tmp_path / "sesion.cap"
+    sesion(SerialGrabador(PuertoESP32(), ruta))
+    completa = ruta.read_bytes()
+    ruta.write_bytes(completa[:-3])  # El ultimo registro quedo a medias
+    assert len(list(leer_captura(ruta))) == 4
+
+    otro = tmp_path / "otro.bin"
+    otro.write_bytes(b"no es una captura")
+    with pytest.raises(ValueError):
+        list(leer_captura(otro))
@@ -0,0 +1,95 @@
+""" Pruebas de EstadisticasDeslizantes contra numpy sobre las ultimas n muestras
+y de las cuentas int16 en FlujoContinuo """
+import numpy as np
+import pytest
+
+from comun.continuo import EstadisticasDeslizantes, FlujoContinuo
+from comun.protocolo import Frame, TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16, TIPO_FIN
+
+
+def referencia(flujo, hasta, n, k):
+    """ Media, varianza, RMS, peaks e indices de peaks de flujo[hasta - n:hasta] con numpy """
+    ventana = flujo[hasta - n:hasta]
+    orden = np.argsort(-ventana, axis=0, kind="stable")[:k]
+    return (ventana.mean(axis=0), ventana.var(axis=0), np.sqrt(np.mean(ventana ** 2, axis=0)),
+            np.take_along_axis(ventana, orden, axis=0).T, (orden + hasta - n).T)
+
+
+@pytest.mark.parametrize("n, salto", [(50, 50), (64, 16), (100, 30), (5, 7), (1, 1)])
+def test_igual_a_numpy(n, salto):
+    rng = np.random.default_rng(n + salto)
+    flujo = rng.standard_normal((1000, 3)) * [1, 10, 0.01] + [0, 100, -5]
+    estadisticas = EstadisticasDeslizantes(3, n, salto)
+    resultados = []
+    i = 0
+    while i < len(flujo):
+        m = int(rng.integers(1, 40))  # Bloques de largo irregular, como llegan por el puerto
+        resultados += estadisticas.agregar_bloque(flujo[i:i + m])
+        i += m
+
+    esperados = [muestra for muestra in range(salto, len(flujo) + 1, salto) if muestra >= n]
+    assert [resultado.muestra for resultado in resultados] == esperados
+    k = min(5, n)
+    for resultado in resultados:
+        media, varianza, rms, peaks, indices = referencia(flujo, resultado.muestra, n, k)
+        np.testing.assert_allclose(resultado.media, media, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(resultado.varianza, varianza, rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(resultado.rms, rms, rtol=1e-9)
+        np.testing.assert_array_equal(resultado.peaks, peaks)
+        np.testing.assert_array_equal(resultado.indices_peaks, indices)
+
+
+def test_muestra_a_muestra_igual_que_en_bloque():
+    flujo = np.random.default_rng(3).standard_normal((300, 2))
+    de_a_una = EstadisticasDeslizantes(2, 40, 10)
+    resultados = [resultado for fila in flujo for resultado in de_a_una.agregar(fila)]
+    en_bloque = EstadisticasDeslizantes(2, 40, 10).agregar_bloque(flujo)
+    assert len(resultados) == len(en_bloque)
+    for uno, otro in zip(resultados, en_bloque):
+        np.testing.assert_allclose(uno.rms, otro.rms, rtol=1e-12)
+        np.testing.assert_array_equal(uno.indices_peaks, otro.indices_peaks)
+
+
+def test_parametros_invalidos():
+    with pytest.raises(ValueError):
+        EstadisticasDeslizantes(3, 0, 1)
+    with pytest.raises(ValueError):
+        EstadisticasDeslizantes(3, 10, 0)
+
+
+class LectorFrames:
+    """ Entrega frames ya armados en vez de leerlos del puerto """
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def leer_frame(self, timeout):
+        return self.frames.pop(0)
+
+
+class MitadDeCuenta:
+    """ Conversion que multiplica cada cuenta por 0.5 (como conversion.Conversion en T4) """
+
+    def convertir_frame(self, frame):
+        return frame._replace(tipo=TIPO_MUESTRAS_F32, datos=frame.datos.astype(np.float32) * 0.5)
+
+
+def cuentas():
+    datos = np.arange(-8, 8, dtype=np.int16).reshape(8, 2)
+    return datos, [Frame(TIPO_MUESTRAS_I16, 2, 0, datos[:4]), Frame(TIPO_MUESTRAS_I16, 2, 1, datos[4:]),
+                   Frame(TIPO_FIN, 2, 2, np.empty((0, 2)))]
+
+
+def test_flujo_convierte_las_cuentas():
+    datos, frames = cuentas()
+    flujo = FlujoContinuo(None, LectorFrames(frames), 2, 8, 8, binario=True, conversion=MitadDeCuenta())
+    resultado, = flujo.resultados()
+    np.testing.assert_allclose(resultado.media, (datos * 0.5).mean(axis=0))
+    np.testing.assert_array_equal(resultado.peaks[:, 0], [3.0, 3.5])
+
+
+def test_flujo_sin_conversion_rechaza_las_cuentas():
+    _, frames = cuentas()
+    flujo = FlujoContinuo(None, LectorFrames(frames), 2, 8, 8, binario=True)
+    with pytest.raises(ValueError):
+        list(flujo.resultados())
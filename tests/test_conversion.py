@@ -0,0 +1,100 @@
+""" Pruebas de la conversion de cuentas int16 de la BMI270 y del modo CUENT de
+la ESP32 simulada """
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "T4", "bmi270"))
+
+from conversion import Conversion, CUENTAS, COMANDO_CUENTAS
+from comun.protocolo import DecodificadorFrames, Frame, unir_frames, TIPO_MUESTRAS_F32, TIPO_MUESTRAS_I16, TIPO_FIN
+from comun.simulador import ESP32Simulada
+
+CANALES = ("acc_x", "acc_y", "acc_z", "gyr_x", "gyr_y", "gyr_z")
+
+
+def test_factor_segun_el_rango():
+    conversion = Conversion(CANALES, rango_acc=2, rango_gyr=250)
+    np.testing.assert_allclose(conversion.factor, [2 / CUENTAS] * 3 + [250 / CUENTAS] * 3)
+    np.testing.assert_array_equal(conversion.desplazamiento, 0)
+
+
+def test_calibracion_igual_a_la_formula(tmp_path):
+    sesgo, ganancia = {"acc_x": 0.012, "gyr_z": -0.4}, {"acc_x": 0.998}
+    ruta = tmp_path / "calibracion.json"
+    ruta.write_text(json.dumps({"sesgo": sesgo, "ganancia": ganancia}))
+    conversion = Conversion.desde_archivo(ruta, CANALES)
+    cuentas = np.random.default_rng(0).integers(-32768, 32768, (100, 6)).astype(np.int16)
+    escala = np.array([8 / CUENTAS] * 3 + [2000 / CUENTAS] * 3)
+    esperado = ((cuentas * escala - [sesgo.get(nombre, 0) for nombre in CANALES])
+                * [ganancia.get(nombre, 1) for nombre in CANALES])
+    convertido = conversion.convertir(cuentas)
+    assert convertido.dtype == np.float32
+    np.testing.assert_allclose(convertido, esperado, rtol=1e-5, atol=1e-4)
+
+
+def test_convertir_en_el_mismo_arreglo():
+    conversion = Conversion(CANALES)
+    cuentas = np.arange(-30, 30, dtype=np.int16).reshape(10, 6)
+    out = cuentas.astype(np.float32)
+    assert conversion.convertir(out, out=out) is out
+    np.testing.assert_allclose(out, conversion.convertir(cuentas))
+
+
+def test_parametros_invalidos():
+    with pytest.raises(ValueError):
+        Conversion(CANALES, rango_acc=3)
+    with pytest.raises(ValueError):
+        Conversion(CANALES, rango_gyr=300)
+    with pytest.raises(ValueError):
+        Conversion(CANALES, sesgo={"mag_x": 1.0})
+
+
+def test_convertir_frame():
+    conversion = Conversion(CANALES)
+    cuentas = Frame(TIPO_MUESTRAS_I16, 6, 3, np.ones((4, 6), dtype=np.int16))
+    convertido = conversion.convertir_frame(cuentas)
+    assert (convertido.tipo, convertido.canales, convertido.secuencia) == (TIPO_MUESTRAS_F32, 6, 3)
+    np.testing.assert_allclose(convertido.datos, np.broadcast_to(conversion.factor, (4, 6)))
+    # Los demas frames pasan sin cambios
+    flotantes = Frame(TIPO_MUESTRAS_F32, 6, 4, np.ones((4, 6), dtype=np.float32))
+    assert conversion.convertir_frame(flotantes) is flotantes
+
+
+def ventana_simulada(cuentas, escala_cuentas=None):
+    """ Los frames de una ventana de 500 muestras en modo binario solo crudo, con o sin CUENT """
+    simulador = ESP32Simulada(6, 500, semilla=5, ruido=0.5, escala_cuentas=escala_cuentas)
+    enviados = []
+    simulador._enviar = enviados.append
+    simulador._comando(b"BINAR")
+    simulador._comando(b"CRUDO")
+    if cuentas:
+        simulador._comando(COMANDO_CUENTAS)
+    simulador._comando(b"BEGIN")
+    frames = DecodificadorFrames().alimentar(b"".join(enviados))
+    assert frames[-1].tipo == TIPO_FIN
+    return frames[:-1]
+
+
+def test_cuentas_del_simulador_a_media_cuenta_de_los_floats():
+    conversion = Conversion(CANALES)
+    frames = ventana_simulada(True, conversion.factor)
+    assert {frame.tipo for frame in frames} == {TIPO_MUESTRAS_I16}
+    convertidas, *_ = unir_frames([conversion.convertir_frame(frame) for frame in frames])
+    flotantes, *_ = unir_frames(ventana_simulada(False))
+    assert convertidas.dtype == np.float32 and convertidas.shape == flotantes.shape == (500, 6)
+    assert np.all(np.abs(convertidas - flotantes) <= conversion.factor / 2 * 1.001)
+
+
+def test_simulador_sin_escala_ignora_cuent():
+    # Como la BME688: sin escala_cuentas el simulador no responde a CUENT y sigue enviando floats
+    simulador = ESP32Simulada(4, 10, semilla=1)
+    enviados = []
+    simulador._enviar = enviados.append
+    simulador._comando(COMANDO_CUENTAS)
+    assert enviados == [] and not simulador.cuentas
+    frames = ventana_simulada(True)
+    assert {frame.tipo for frame in frames} == {TIPO_MUESTRAS_F32}
@@ -0,0 +1,70 @@
+""" Pruebas de la reduccion de series: min/max conserva los extremos de cada
+tramo y LTTB elige un punto por tramo, en orden """
+import numpy as np
+import pytest
+
+from comun.decimacion import min_max, lttb, decimar, bloques_min_max, eje_tiempo, estilo_marcador, MAX_MARCADORES
+
+
+def serie(n, semilla=0):
+    y = np.random.default_rng(semilla).standard_normal(n).astype(np.float32)
+    return eje_tiempo(n, 0.5), y
+
+
+@pytest.mark.parametrize("n, max_puntos", [(10001, 2000), (4000, 2000), (2001, 2000), (99, 10), (100, 10)])
+def test_min_max_conserva_los_extremos(n, max_puntos):
+    x, y = serie(n)
+    xr, yr = min_max(x, y, max_puntos)
+    assert len(yr) <= max_puntos
+    # Cada punto es uno de la serie, en orden, y los extremos globales estan
+    indices = np.rint(xr / 0.5).astype(int)
+    assert np.all(np.diff(indices) >= 0)
+    np.testing.assert_array_equal(yr, y[indices])
+    assert yr.max() == y.max() and yr.min() == y.min()
+    # Y tambien los de cada tramo
+    largo = -(-n // (max_puntos // 2))
+    for inicio in range(0, n, largo):
+        tramo = y[inicio:inicio + largo]
+        en_tramo = yr[(indices >= inicio) & (indices < inicio + largo)]
+        assert en_tramo.max() == tramo.max() and en_tramo.min() == tramo.min()
+
+
+@pytest.mark.parametrize("n, max_puntos", [(10000, 2000), (5000, 3), (3001, 3000)])
+def test_lttb_un_punto_por_tramo(n, max_puntos):
+    x, y = serie(n, 1)
+    xr, yr = lttb(x, y, max_puntos)
+    assert len(yr) == max_puntos
+    indices = np.rint(xr / 0.5).astype(int)
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+    np.testing.assert_array_equal(yr, y[indices])
+    # Los puntos del medio caen cada uno en su tramo
+    bordes = np.append(np.linspace(1, n - 1, max_puntos - 1).astype(np.int64), n)
+    assert np.all((indices[1:-1] >= bordes[:-2]) & (indices[1:-1] < bordes[1:-1]))
+
+
+def test_lttb_elige_el_pico_aislado():
+    x = np.arange(300, dtype=np.float64)
+    y = np.zeros(300)
+    y[150] = 10
+    _, yr = lttb(x, y, 30)
+    assert yr.max() == 10
+
+
+def test_series_cortas_no_se_tocan():
+    x, y = serie(50)
+    for metodo in ("min_max", "lttb"):
+        xr, yr = decimar(x, y, 50, metodo)
+        assert xr is x and yr is y
+
+
+def test_bloques_min_max():
+    datos = np.arange(2 * 10, dtype=np.float32).reshape(2, 10)[:, ::-1]
+    bloques = bloques_min_max(datos, 4)
+    assert bloques.shape == (2, 3, 2)
+    np.testing.assert_array_equal(bloques[0], [[6, 9], [2, 5], [0, 1]])
+    assert bloques_min_max(np.empty((3, 0)), 4).shape == (3, 0, 2)
+
+
+def test_estilo_marcador():
+    assert estilo_marcador(MAX_MARCADORES) == 'o' and estilo_marcador(MAX_MARCADORES + 1) == ''
@@ -0,0 +1,126 @@
+""" Pruebas de las reglas de deteccion contra numpy (np.fft para la DFT
+deslizante) y de que las alertas no dependan de como se parten los bloques """
+import json
+
+import numpy as np
+import pytest
+
+from comun.deteccion import (Detector, Umbral, Pendiente, PuntajeZ, EnergiaBanda, Alerta, mensaje,
+                             FILAS_POR_TRAMO)
+
+
+def evaluar_de_a_bloques(regla, senal, tamanos):
+    """ Los valores que calcula regla.evaluar para senal, alimentada en bloques de los tamanos dados (ciclicos) """
+    valores = []
+    inicio = 0
+    i = 0
+    while inicio < len(senal):
+        fin = inicio + tamanos[i % len(tamanos)]
+        valores.append(regla.evaluar(senal[inicio:fin])[1])
+        inicio = fin
+        i += 1
+    return np.concatenate(valores)
+
+
+def potencia_fft(senal, n, bins):
+    """ Potencia en los bins de la banda de las ultimas n muestras, con np.fft.rfft para cada muestra """
+    pesos = np.where(2 * bins == n, 1.0, 2.0) / n ** 2
+    potencias = np.full(senal.shape, np.nan)
+    for t in range(n - 1, len(senal)):
+        espectro = np.fft.rfft(senal[t - n + 1:t + 1], axis=0)[bins]
+        potencias[t] = pesos @ np.square(np.abs(espectro))
+    return potencias
+
+
+@pytest.mark.parametrize("n, banda", [(64, (10, 20)), (50, (0, 100)), (32, (50, 50))])
+@pytest.mark.parametrize("tamanos", [[1], [7, 3, 40], [1000]])
+def test_energia_banda_igual_a_np_fft(n, banda, tamanos):
+    rng = np.random.default_rng(n)
+    senal = rng.standard_normal((700, 2)) + [3, -1]
+    regla = EnergiaBanda(["a", "b"], n, banda, limite=1.0, periodo=1 / 100)
+    calculada = evaluar_de_a_bloques(regla, senal, tamanos)
+    esperada = potencia_fft(senal, n, regla.bins)
+    np.testing.assert_allclose(calculada[n - 1:], esperada[n - 1:], rtol=1e-9, atol=1e-9)
+
+
+def test_energia_banda_de_una_senoidal():
+    # Una senoidal de amplitud A en un bin de la banda da A**2 / 2; fuera de la banda no aporta
+    n, periodo = 128, 1 / 256
+    t = np.arange(1000) * periodo
+    senal = (2.0 * np.sin(2 * np.pi * 16 * t) + 5.0 * np.sin(2 * np.pi * 64 * t))[:, np.newaxis]
+    regla = EnergiaBanda("x", n, (10, 20), limite=1.0, periodo=periodo)
+    potencia = evaluar_de_a_bloques(regla, senal, [100])
+    np.testing.assert_allclose(potencia[n - 1:], 2.0, rtol=1e-9)
+
+
+def test_banda_sin_bins():
+    with pytest.raises(ValueError):
+        EnergiaBanda("x", 16, (0.01, 0.05), limite=1.0)
+
+
+@pytest.mark.parametrize("tamanos", [[1], [5, 13], [FILAS_POR_TRAMO + 3]])
+def test_puntaje_z_igual_a_numpy(tamanos):
+    n = 30
+    senal = np.random.default_rng(1).standard_normal((2000, 3)) * [1, 10, 0.1] + [0, 50, -2]
+    calculado = evaluar_de_a_bloques(PuntajeZ(["a", "b", "c"], n), senal, tamanos)
+    anteriores = np.lib.stride_tricks.sliding_window_view(senal, n, axis=0)[:-1]  # Las n anteriores a cada t >= n
+    esperado = (senal[n:] - anteriores.mean(axis=2)) / anteriores.std(axis=2)
+    np.testing.assert_allclose(calculado[n:], esperado, rtol=1e-7, atol=1e-9)
+
+
+def test_umbral_alerta_al_empezar_a_cumplirse():
+    detector = Detector(["x"], [Umbral("x", minimo=-1, maximo=1)])
+    alertas = detector.agregar_bloque(np.array([[0], [2], [3], [0], [-2], [-3], [5]]))
+    # De -3 a 5 la condicion (fuera del rango) se sigue cumpliendo
+    assert [(alerta.muestra, alerta.valor, alerta.limite) for alerta in alertas] == [(1, 2, 1), (4, -2, -1)]
+    # La condicion sigue desde el bloque anterior: no se repite la alerta
+    assert detector.agregar_bloque(np.array([[7], [0]])) == []
+
+
+def test_pendiente_entre_bloques_e_interrumpir():
+    detector = Detector(["x"], [Pendiente("x", maximo=5, periodo=0.5)])
+    assert detector.agregar_bloque(np.array([[0.0], [1.0]])) == []
+    alerta, = detector.agregar_bloque(np.array([[4.0]]))  # (4 - 1) / 0.5 = 6
+    assert (alerta.muestra, alerta.tipo, alerta.valor) == (2, "pendiente", 6.0)
+    # Despues de una interrupcion la primera muestra no tiene pendiente
+    detector.interrumpir()
+    assert detector.agregar_bloque(np.array([[100.0], [100.0]])) == []
+
+
+def reglas_de_prueba():
+    return [Umbral(["a", "c"], maximo=2.5), Pendiente("b", maximo=3, periodo=0.1),
+            PuntajeZ(["a", "b"], 40, limite=3), EnergiaBanda("c", 32, (2, 4), limite=0.05, periodo=0.1)]
+
+
+def test_alertas_iguales_en_bloque_y_muestra_a_muestra():
+    rng = np.random.default_rng(3)
+    senal = rng.standard_normal((1500, 3))
+    senal[700:760, 2] += np.sin(2 * np.pi * 3 * np.arange(60) * 0.1)
+    en_bloque = Detector(["a", "b", "c"], reglas_de_prueba()).agregar_bloque(senal)
+    de_a_una = Detector(["a", "b", "c"], reglas_de_prueba())
+    una_a_una = [alerta for fila in senal for alerta in de_a_una.agregar(fila)]
+    assert en_bloque and {alerta.tipo for alerta in en_bloque} == {"umbral", "pendiente", "puntaje_z", "banda"}
+    assert [alerta[:3] for alerta in en_bloque] == [alerta[:3] for alerta in una_a_una]
+    np.testing.assert_allclose([alerta.valor for alerta in en_bloque], [alerta.valor for alerta in una_a_una])
+    assert all(np.diff([alerta.muestra for alerta in en_bloque]) >= 0)
+
+
+def test_desde_archivo(tmp_path):
+    ruta = tmp_path / "reglas.json"
+    ruta.write_text(json.dumps([{"tipo": "umbral", "canales": ["acc_z"], "minimo": -2.0, "maximo": 2.0},
+                                {"tipo": "banda", "canales": ["acc_x"], "n": 128, "banda": [10, 20],
+                                 "limite": 0.05}]))
+    detector = Detector.desde_archivo(ruta, ["acc_x", "acc_y", "acc_z"], periodo=1 / 100)
+    umbral, banda = detector.reglas
+    assert umbral.indices == [2] and banda.indices == [0]
+    assert banda.periodo == 1 / 100  # Las reglas que dependen del tiempo usan el periodo del receptor
+
+    ruta.write_text(json.dumps([{"tipo": "rango", "canales": ["acc_x"]}]))
+    with pytest.raises(ValueError):
+        Detector.desde_archivo(ruta, ["acc_x"])
+    with pytest.raises(ValueError):
+        Detector(["acc_x"], [Umbral("gyr_x", maximo=1)])
+
+
+def test_mensaje():
+    assert mensaje(Alerta(12, "acc_z", "umbral", 2.5, 2.0)) == "ALERTA umbral en acc_z, muestra 12: 2.5 (limite 2)"
@@ -0,0 +1,81 @@
+""" Pruebas del gestor de varias placas con ESP32 falsas que responden por un puerto en memoria """
+import queue
+
+import numpy as np
+
+from comun.dispositivos import Dispositivo, GestorDispositivos
+from comun.lector import LectorSerial
+
+MUESTRAS = [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+
+
+class PuertoESP32:
+    """ Puerto en memoria que contesta BEGIN con una ventana de texto de 2 canales y END con CLOSED """
+
+    def __init__(self, fallar_al_cerrar=False):
+        self._respuestas = queue.Queue()
+        self.fallar_al_cerrar = fallar_al_cerrar
+        self.timeout = 0.05
+        self.in_waiting = 0
+
+    def write(self, datos):
+        if datos.startswith(b"BEGIN"):
+            filas = MUESTRAS + [[7.0, 8.0]] + [[0.0] * 4] * 3 + [[9.0, 9.0]] * 5
+            texto = b"".join(b" ".join(b"%f" % v for v in fila) + b"\n" for fila in filas)
+            self._respuestas.put(b"OK\0" + texto + b"FINISH\0")
+        elif datos.startswith(b"END"):
+            self._respuestas.put(b"CLOSED\0")
+
+    def read(self, tamano):
+        try:
+            return self._respuestas.get(timeout=self.timeout)
+        except queue.Empty:
+            return b""
+
+    def close(self):
+        if self.fallar_al_cerrar:
+            raise OSError("el puerto ya no existe")
+
+
+class DispositivoFalso(Dispositivo):
+    def __init__(self, id, error=None, fallar_al_cerrar=False):
+        super().__init__(id, 2, timeout=1, id=id)
+        self.error = error
+        self.fallar_al_cerrar = fallar_al_cerrar
+
+    def conectar(self):
+        self.ser = PuertoESP32(self.fallar_al_cerrar)
+        self.lector = LectorSerial(self.ser)
+        self.lector.start()
+        if self.error is not None:
+            raise self.error
+
+
+def test_ventanas_de_todas_las_placas():
+    gestor = GestorDispositivos([DispositivoFalso("A"), DispositivoFalso("B")])
+    gestor.iniciar(n_ventanas=3)
+    ventanas = list(gestor.leer())
+    gestor.detener()
+    assert sorted(ventana.dispositivo for ventana in ventanas) == ["A"] * 3 + ["B"] * 3
+    for ventana in ventanas:
+        np.testing.assert_allclose(ventana.muestras, MUESTRAS)
+        np.testing.assert_allclose(ventana.rms, [7.0, 8.0])
+    assert gestor.errores == {}
+
+
+def test_una_placa_con_error_no_detiene_a_las_demas():
+    gestor = GestorDispositivos([DispositivoFalso("A", error=ValueError("linea mal formada")),
+                                 DispositivoFalso("B")])
+    gestor.iniciar(n_ventanas=2)
+    ventanas = list(gestor.leer())
+    gestor.detener()
+    assert [ventana.dispositivo for ventana in ventanas] == ["B", "B"]
+    assert isinstance(gestor.errores["A"], ValueError)
+
+
+def test_detener_guarda_el_primer_error():
+    gestor = GestorDispositivos([DispositivoFalso("A", error=ValueError("primero"), fallar_al_cerrar=True)])
+    gestor.iniciar(n_ventanas=1)
+    assert list(gestor.leer()) == []
+    gestor.detener()
+    assert str(gestor.errores["A"]) == "primero"
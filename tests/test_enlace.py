@@ -0,0 +1,92 @@
+""" Pruebas de la negociacion de baudios contra la ESP32 simulada y con un puerto que falla """
+import os
+
+import pytest
+import serial
+
+from comun import enlace, simulador
+from comun.enlace import negociar_baudios, describir, _probar
+from comun.lector import LectorSerial, ErrorLector
+from comun.protocolo import VELOCIDADES
+
+PLAZO = 0.3  # Plazo corto para que las pruebas que fallan no esperen los 2 s del firmware
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="Cambiar los baudios necesita un pty")
+
+
+@pytest.fixture
+def conectar(monkeypatch):
+    """ Abre un pty contra una ESP32 simulada con las opciones dadas y cierra todo al final """
+    monkeypatch.setattr(enlace, "PLAZO_BAUDIOS", PLAZO)
+    monkeypatch.setattr(simulador, "PLAZO_BAUDIOS", PLAZO)
+    abiertos = []
+
+    def abrir(**opciones):
+        esp32 = simulador.ESP32Simulada(canales=4, semilla=0, **opciones)
+        ser = serial.serial_for_url(esp32.abrir_pty(), VELOCIDADES[0], timeout=1)
+        lector = LectorSerial(ser)
+        lector.start()
+        abiertos.append((esp32, ser, lector))
+        return esp32, ser, lector
+
+    yield abrir
+    for esp32, ser, lector in abiertos:
+        lector.detener()
+        ser.close()
+        esp32.detener()
+
+
+def test_sube_hasta_el_maximo_pedido(conectar):
+    esp32, ser, lector = conectar()
+    negociacion = negociar_baudios(ser, lector, maximo=921600, timeout=PLAZO)
+    assert negociacion.baudios == ser.baudrate == esp32.velocidad == 921600
+    assert [prueba.baudios for prueba in negociacion.pruebas] == [230400, 460800, 921600]
+    assert all(prueba.correcta for prueba in negociacion.pruebas) and negociacion.bytes_por_segundo > 0
+    assert "921600 baudios" in describir(negociacion)
+
+
+def test_vuelve_a_la_ultima_velocidad_que_paso(conectar):
+    esp32, ser, lector = conectar(baudios_maximo=460800)
+    negociacion = negociar_baudios(ser, lector, timeout=PLAZO)
+    assert [(prueba.baudios, prueba.correcta) for prueba in negociacion.pruebas] == \
+        [(230400, True), (460800, True), (921600, False)]
+    assert negociacion.baudios == ser.baudrate == 460800
+    # La ESP32 tambien volvio sola al no recibir CONFI: el enlace sigue funcionando
+    ser.write(b"BINAR\0")
+    lector.esperar_respuesta(b"OK", 2)
+    assert esp32.velocidad == 460800
+
+
+def test_firmware_sin_cambio_de_baudios(conectar, monkeypatch):
+    esp32, ser, lector = conectar()
+    # Un firmware viejo ignora BAUD<i>: no llega el OK y no se cambia nada
+    monkeypatch.setattr(esp32, "_comando", lambda comando: None)
+    negociacion = negociar_baudios(ser, lector, timeout=PLAZO)
+    assert negociacion.pruebas == [] and negociacion.baudios == ser.baudrate == VELOCIDADES[0]
+
+
+class PuertoFalso:
+    baudrate = VELOCIDADES[0]
+
+    def write(self, datos):
+        return len(datos)
+
+
+class LectorQueFalla:
+    """ Responde el OK al BAUD<i> y luego el puerto falla """
+
+    def esperar_respuesta(self, respuesta, timeout):
+        return respuesta
+
+    def leer_frame(self, timeout):
+        raise ErrorLector("El puerto se desconecto")
+
+
+def test_error_del_puerto_deja_la_velocidad_anterior():
+    ser = PuertoFalso()
+    with pytest.raises(ErrorLector):
+        _probar(ser, LectorQueFalla(), 1, PLAZO)
+    assert ser.baudrate == VELOCIDADES[0]
+    # negociar_baudios deja de subir y reporta la velocidad en la que quedo el puerto
+    negociacion = negociar_baudios(ser, LectorQueFalla(), timeout=PLAZO)
+    assert negociacion.baudios == VELOCIDADES[0] and negociacion.pruebas == []
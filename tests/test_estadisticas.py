@@ -0,0 +1,49 @@
+""" Pruebas del TopK incremental contra ordenar todas las muestras """
+import numpy as np
+import pytest
+
+from comun.estadisticas import TopK, TopKCanales
+from comun.analisis import calcular_peaks
+
+
+@pytest.mark.parametrize("n", [0, 3, 5, 1000])
+def test_top_k_igual_a_ordenar(n):
+    valores = np.random.default_rng(n).standard_normal(n).astype(np.float32)
+    top = TopK(5)
+    for i, valor in enumerate(valores):
+        top.agregar(float(valor), tiempo=i / 10)
+    np.testing.assert_array_equal(top.valores(), calcular_peaks(valores))
+    for valor, indice, tiempo in top.peaks():
+        assert valores[indice] == valor and tiempo == indice / 10
+    assert top.muestras == n
+
+
+def test_bloques_igual_a_muestra_a_muestra():
+    valores = np.random.default_rng(1).standard_normal(500)
+    tiempos = np.arange(500) * 0.01
+    uno_a_uno = TopK(5)
+    for valor, tiempo in zip(valores, tiempos):
+        uno_a_uno.agregar(float(valor), float(tiempo))
+    por_bloques = TopK(5)
+    for i in range(0, 500, 64):
+        por_bloques.agregar_bloque(valores[i:i + 64], tiempos[i:i + 64])
+    assert por_bloques.peaks() == uno_a_uno.peaks()
+    assert por_bloques.muestras == 500
+
+
+def test_reiniciar():
+    top = TopK(2)
+    top.agregar_bloque([5.0, 1.0, 7.0])
+    top.reiniciar()
+    top.agregar(3.0)
+    assert top.peaks() == [(3.0, 0, None)]
+
+
+def test_top_k_canales_igual_a_calcular_peaks():
+    muestras = np.random.default_rng(2).standard_normal((300, 4)).astype(np.float32)
+    canales = TopKCanales(["a", "b", "c", "d"])
+    canales.agregar_bloque(muestras[:100])
+    for fila in muestras[100:]:
+        canales.agregar(fila)
+    np.testing.assert_array_equal(canales.valores(), calcular_peaks(muestras.T))
+    assert [indice for _, indice, _ in canales.detalle()[1]] == list(np.argsort(-muestras[:, 1])[:5])
@@ -0,0 +1,124 @@
+""" Pruebas del historial de la BME688: los agregados por minuto, hora y dia
+contra numpy, el resumen de un rango, y volver a abrir despues de cerrar o
+de una caida """
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "T1"))
+
+from historial import Historial, Agregados, NIVELES, ErrorHistorial
+
+NOMBRES = ("temperatura", "presion")
+INICIO = 1_700_000_000.0  # Un instante cualquiera, no alineado a ningun tramo
+
+
+def muestras(n, semilla=0, segundos=3 * 86400):
+    """ n muestras a tiempos crecientes e irregulares durante segundos """
+    rng = np.random.default_rng(semilla)
+    tiempos = INICIO + np.sort(rng.uniform(0, segundos, n))
+    valores = rng.normal([20, 1000], [5, 10], (n, len(NOMBRES))).T
+    return tiempos, valores
+
+
+def esperado(tiempos, valores, segundos):
+    """ (inicios, n, minimo, maximo, media, rms) por tramo, calculado muestra por muestra """
+    ids = tiempos // segundos
+    filas = []
+    for tramo in np.unique(ids):
+        v = valores[:, ids == tramo]
+        filas.append((tramo * segundos, v.shape[1], v.min(axis=1), v.max(axis=1), v.mean(axis=1),
+                      np.sqrt((v * v).mean(axis=1))))
+    return filas
+
+
+def comparar(agregados, filas):
+    assert len(agregados.inicio) == len(filas)
+    for i, (inicio, n, minimo, maximo, media, rms) in enumerate(filas):
+        assert agregados.inicio[i] == inicio and agregados.n[i] == n
+        np.testing.assert_allclose(agregados.minimo[i], minimo)
+        np.testing.assert_allclose(agregados.maximo[i], maximo)
+        np.testing.assert_allclose(agregados.media[i], media, rtol=1e-9)
+        np.testing.assert_allclose(agregados.rms[i], rms, rtol=1e-9)
+
+
+@pytest.mark.parametrize("lote", [5, 37, 5000])
+def test_agregados_de_cada_nivel(tmp_path, lote):
+    tiempos, valores = muestras(5000)
+    historial = Historial(str(tmp_path), NOMBRES)
+    for i in range(0, len(tiempos), lote):
+        historial.agregar_muestras(tiempos[i:i + lote], valores[:, i:i + lote])
+    for nivel, segundos in NIVELES.items():
+        comparar(historial.agregados(nivel), esperado(tiempos, valores, segundos))
+
+
+def test_resumen_de_un_rango(tmp_path):
+    tiempos, valores = muestras(20000, semilla=1, segundos=10 * 86400)
+    historial = Historial(str(tmp_path), NOMBRES)
+    historial.agregar_muestras(tiempos, valores)
+    # El rango se ajusta a minutos completos
+    desde, hasta = INICIO + 86400 * 1.3, INICIO + 86400 * 7.8
+    a, b = desde // 60 * 60, -(-hasta // 60) * 60
+    dentro = (tiempos >= a) & (tiempos < b)
+    resumen = historial.resumen(desde, hasta)
+    assert resumen.n == dentro.sum()
+    np.testing.assert_allclose(resumen.minimo, valores[:, dentro].min(axis=1))
+    np.testing.assert_allclose(resumen.maximo, valores[:, dentro].max(axis=1))
+    np.testing.assert_allclose(resumen.media, valores[:, dentro].mean(axis=1), rtol=1e-9)
+    todo = historial.resumen()
+    assert todo.n == len(tiempos)
+    np.testing.assert_allclose(todo.rms, np.sqrt((valores ** 2).mean(axis=1)), rtol=1e-9)
+
+
+def test_volver_a_abrir_despues_de_cerrar(tmp_path):
+    tiempos, valores = muestras(3000, semilla=2)
+    historial = Historial(str(tmp_path), NOMBRES)
+    historial.agregar_muestras(tiempos[:1234], valores[:, :1234])
+    historial.cerrar()
+    historial = Historial(str(tmp_path), NOMBRES)
+    historial.agregar_muestras(tiempos[1234:], valores[:, 1234:])
+    for nivel, segundos in NIVELES.items():
+        comparar(historial.agregados(nivel), esperado(tiempos, valores, segundos))
+    with pytest.raises(ErrorHistorial):
+        Historial(str(tmp_path), ("otro",))
+
+
+def test_caida_pierde_a_lo_mas_el_ultimo_minuto(tmp_path):
+    tiempos, valores = muestras(3000, semilla=3)
+    historial = Historial(str(tmp_path), NOMBRES)
+    for i in range(0, len(tiempos), 7):
+        historial.agregar_muestras(tiempos[i:i + 7], valores[:, i:i + 7])
+    # Sin cerrar(), y con un registro a medio escribir al final de hora.bin
+    with open(tmp_path / "hora.bin", "ab") as archivo:
+        archivo.write(b"\x01" * 10)
+    del historial
+    historial = Historial(str(tmp_path), NOMBRES)
+    assert os.path.getsize(tmp_path / "hora.bin") % historial._registro.itemsize == 0
+    ultimo_minuto = tiempos[-1] // 60 * 60
+    antes = tiempos < ultimo_minuto
+    minutos = historial.agregados("minuto")
+    filas = esperado(tiempos[antes], valores[:, antes], 60)
+    comparar(Agregados(*(campo[:len(filas)] for campo in minutos)), filas)
+    # Del ultimo minuto queda lo que se guardo en abiertos.bin
+    assert len(minutos.inicio) == len(filas) or (minutos.inicio[-1] == ultimo_minuto and
+                                                 minutos.n[-1] <= (~antes).sum())
+    # Las muestras de ese minuto siguen en el nivel crudo
+    crudo_tiempos, crudo_valores = historial.crudo(ultimo_minuto)
+    np.testing.assert_array_equal(crudo_tiempos, tiempos[~antes])
+    np.testing.assert_allclose(crudo_valores, valores[:, ~antes].astype(np.float32))
+    # Y lo que llega despues no puede caer en un tramo ya cerrado
+    historial.agregar_muestras([INICIO], [[0.0], [0.0]])
+    assert historial.agregados("minuto").inicio[-1] >= minutos.inicio[-1]
+
+
+def test_horizonte_del_crudo(tmp_path):
+    tiempos, valores = muestras(4000, semilla=4, segundos=10 * 86400)
+    historial = Historial(str(tmp_path), NOMBRES, horizonte=86400)
+    for i in range(0, len(tiempos), 100):
+        historial.agregar_muestras(tiempos[i:i + 100], valores[:, i:i + 100])
+    guardados, _ = historial.crudo()
+    # Se guarda al menos el horizonte, y a lo mas el doble antes de reescribir
+    assert tiempos[-1] - 2 * 86400 <= guardados[0] <= tiempos[tiempos >= tiempos[-1] - 86400][0]
+    np.testing.assert_array_equal(guardados, tiempos[tiempos >= guardados[0]])
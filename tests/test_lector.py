@@ -0,0 +1,102 @@
+""" Pruebas del hilo lector con un puerto falso que entrega bytes de a bloques """
+import queue
+import threading
+
+import pytest
+
+from comun.lector import LectorSerial, DivisorLineas, ErrorLector
+from comun.protocolo import codificar_frame, TIPO_MUESTRAS_F32, TIPO_FIN
+
+
+class PuertoFalso:
+    """ Lo minimo de serial.Serial que usa LectorSerial: read bloquea hasta
+    timeout segundos si no hay bytes, como el puerto real """
+
+    def __init__(self, timeout=0.05):
+        self.timeout = timeout
+        self._bloques = queue.Queue()
+        self.error = None
+
+    @property
+    def in_waiting(self):
+        return 0
+
+    def escribir_desde_la_esp32(self, datos):
+        self._bloques.put(datos)
+
+    def read(self, tamano):
+        if self.error is not None:
+            raise self.error
+        try:
+            return self._bloques.get(timeout=self.timeout)
+        except queue.Empty:
+            return b""
+
+
+@pytest.fixture
+def puerto():
+    return PuertoFalso()
+
+
+@pytest.fixture
+def lector(puerto):
+    lector = LectorSerial(puerto)
+    lector.start()
+    yield lector
+    lector.detener()
+
+
+def test_divisor_lineas_con_terminadores_partidos():
+    divisor = DivisorLineas()
+    assert divisor.alimentar(b"O") == []
+    assert divisor.alimentar(b"K\x001.0 2.0\n3.0") == [b"OK", b"1.0 2.0"]
+    assert divisor.alimentar(b" 4.0\nFINI") == [b"3.0 4.0"]
+    assert divisor.vaciar() == b"FINI"
+
+
+def test_lineas_y_frames_van_a_su_cola(puerto, lector):
+    frame = codificar_frame(TIPO_MUESTRAS_F32, 0, [[1.0, 2.0]])
+    puerto.escribir_desde_la_esp32(b"OK\0" + frame[:5])
+    puerto.escribir_desde_la_esp32(frame[5:] + b"1.0 2.0\n" + codificar_frame(TIPO_FIN, 1, canales=2))
+    assert lector.esperar_respuesta(b"OK", timeout=1) == b"OK"
+    assert lector.leer_frame(timeout=1).datos.tolist() == [[1.0, 2.0]]
+    assert lector.leer_frame(timeout=1).tipo == TIPO_FIN
+    assert lector.leer_linea(timeout=1) == b"1.0 2.0"
+
+
+def test_callbacks_en_orden(puerto, lector):
+    recibidos = []
+    listo = threading.Event()
+    lector.suscribir(lambda tipo, dato: (recibidos.append((tipo, dato)), dato == b"FINISH" and listo.set()))
+    puerto.escribir_desde_la_esp32(b"1 2\n3 4\nFINISH\0")
+    assert listo.wait(1)
+    assert recibidos == [("linea", b"1 2"), ("linea", b"3 4"), ("linea", b"FINISH")]
+
+
+def test_linea_sin_terminador_sale_con_el_timeout(puerto, lector):
+    puerto.escribir_desde_la_esp32(b"CLOSED")
+    assert lector.leer_linea(timeout=1) == b"CLOSED"
+
+
+def test_timeout_sin_respuesta(lector):
+    with pytest.raises(TimeoutError):
+        lector.leer_linea(timeout=0.1)
+
+
+def test_error_del_puerto_se_reporta_en_cada_lectura(puerto, lector):
+    puerto.error = OSError("puerto desconectado")
+    lector.join(1)
+    assert not lector.is_alive()
+    for _ in range(2):
+        with pytest.raises(ErrorLector, match="puerto desconectado"):
+            lector.leer_frame(timeout=1)
+    with pytest.raises(ErrorLector):
+        lector.leer_linea(timeout=1)
+
+
+def test_detener_termina_el_hilo_sin_error(puerto, lector):
+    lector.detener()
+    assert not lector.is_alive()
+    assert lector.error is None
+    with pytest.raises(ErrorLector):
+        lector.leer_linea(timeout=1)
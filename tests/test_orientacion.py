@@ -0,0 +1,103 @@
+""" Pruebas de los filtros de orientacion de la BMI270: el complementario
+resuelto por bloques contra su recursion muestra a muestra, Madgwick con
+varios filtros juntos contra cada filtro por separado y ambos contra una
+rotacion conocida """
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "T4", "bmi270"))
+
+from orientacion import Complementario, Madgwick, crear, euler, cuaternion, oscilacion
+from movimiento import inclinacion
+
+PERIODO = 1 / 100
+
+
+def por_bloques(filtro, acc, gyr, tamanos):
+    """ Los angulos que entrega filtro alimentado en bloques de los tamanos dados (ciclicos) """
+    angulos = []
+    inicio = 0
+    i = 0
+    while inicio < acc.shape[-2]:
+        fin = inicio + tamanos[i % len(tamanos)]
+        angulos.append(filtro.actualizar(acc[..., inicio:fin, :], gyr[..., inicio:fin, :]).euler)
+        inicio = fin
+        i += 1
+    return np.concatenate(angulos, axis=-2)
+
+
+def complementario_muestra_a_muestra(acc, gyr, periodo, alfa):
+    """ La recursion del filtro complementario escrita directo, una muestra a la vez """
+    roll, pitch = inclinacion(acc.T)
+    angulos = np.empty(acc.shape)
+    anterior = np.array([roll[0], pitch[0], 0.0])
+    for t in range(len(acc)):
+        giro = gyr[t] * periodo
+        anterior = np.array([alfa * (anterior[0] + giro[0]) + (1 - alfa) * roll[t],
+                             alfa * (anterior[1] + giro[1]) + (1 - alfa) * pitch[t],
+                             (anterior[2] + giro[2] + 180) % 360 - 180])
+        angulos[t] = anterior
+    return angulos
+
+
+@pytest.mark.parametrize("alfa", [0.0, 0.5, 0.98, 1.0])
+@pytest.mark.parametrize("tamanos", [[1], [7, 300], [3000]])
+def test_complementario_igual_a_la_recursion(alfa, tamanos):
+    # 3000 muestras pasan por varios tramos de alfa**-s con alfa 0.98
+    acc, gyr, _ = oscilacion(3000, PERIODO, semilla=1)
+    gyr[:, 2] += 30  # El yaw da varias vueltas
+    calculado = por_bloques(Complementario(PERIODO, alfa), acc, gyr, tamanos)
+    np.testing.assert_allclose(calculado, complementario_muestra_a_muestra(acc, gyr, PERIODO, alfa),
+                               rtol=1e-9, atol=1e-7)
+
+
+def test_madgwick_varios_filtros_igual_a_cada_uno():
+    acc, gyr, _ = oscilacion(400, PERIODO)
+    lote_acc = np.stack([acc, acc[:, [1, 0, 2]], -acc])
+    lote_gyr = np.stack([gyr, gyr * 2, gyr[:, ::-1]])
+    juntos = por_bloques(Madgwick(PERIODO), lote_acc, lote_gyr, [50, 13])
+    assert juntos.shape == (3, 400, 3)
+    for i in range(3):
+        np.testing.assert_allclose(juntos[i], Madgwick(PERIODO).actualizar(lote_acc[i], lote_gyr[i]).euler,
+                                   rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("nombre", ["complementario", "madgwick"])
+def test_sigue_una_rotacion_conocida(nombre):
+    acc, gyr, roll = oscilacion(3000, PERIODO)
+    estimado = crear(nombre, PERIODO).actualizar(acc, gyr).euler
+    error = np.abs(estimado[300:, 0] - roll[300:])  # Sin el arranque
+    assert error.mean() < 1.5 and error.max() < 5
+    assert np.abs(estimado[300:, 1]).max() < 5
+
+
+def test_madgwick_sin_gravedad_solo_integra():
+    gyr = np.tile([0.0, 0.0, 90.0], (100, 1))
+    acc = np.tile([0.0, 0.0, 1.0], (100, 1))
+    acc[1:] = 0  # Caida libre despues de la primera muestra
+    filtro = Madgwick(PERIODO)
+    angulos = filtro.actualizar(acc, gyr).euler
+    # 1 s a 90 grados/s; la integracion de primer orden se desvia unas milesimas de grado
+    np.testing.assert_allclose(angulos[-1], [0, 0, 90], atol=1e-2)
+    np.testing.assert_allclose(filtro.euler(), angulos[-1])
+
+
+def test_euler_y_cuaternion_ida_y_vuelta():
+    angulos = np.random.default_rng(2).uniform([-180, -89, -180], [180, 89, 180], (50, 3))
+    q = cuaternion(angulos)
+    np.testing.assert_allclose(np.linalg.norm(q, axis=-1), 1)
+    np.testing.assert_allclose(euler(q), angulos, atol=1e-9)
+
+
+def test_bloque_vacio_y_parametros_invalidos():
+    for filtro in (Complementario(PERIODO), Madgwick(PERIODO)):
+        estimacion = filtro.actualizar(np.empty((0, 3)), np.empty((0, 3)))
+        assert estimacion.euler.shape == (0, 3) and estimacion.cuaterniones.shape == (0, 4)
+        assert filtro.euler() is None
+    with pytest.raises(ValueError):
+        Complementario(PERIODO, alfa=1.5)
+    with pytest.raises(ValueError):
+        crear("kalman", PERIODO)
@@ -0,0 +1,216 @@
+""" Pruebas del formato binario de frames y del parseo del modo texto, con los
+bytes que envia la ESP32 simulada """
+import numpy as np
+import pytest
+
+from comun.protocolo import (DecodificadorFrames, ParserTexto, EnsambladorTexto, codificar_frame, unir_frames, unir_lineas,
+                             Frame, CABECERA, N_PEAKS, TIPO_MUESTRAS_F32, TIPO_FIN)
+from comun.lector import DivisorLineas
+from comun.analisis import calcular_rms, calcular_fft, calcular_peaks
+from comun.simulador import ESP32Simulada
+
+
+def decodificar(datos, tam_bloque=None):
+    """ Los frames de datos hasta el FIN, alimentando de a tam_bloque bytes """
+    decodificador = DecodificadorFrames(guardar_texto=True)
+    tam_bloque = tam_bloque or len(datos)
+    frames = []
+    for i in range(0, len(datos), tam_bloque):
+        frames += decodificador.alimentar(datos[i:i + tam_bloque])
+    assert frames and frames[-1].tipo == TIPO_FIN
+    return frames[:-1], decodificador
+
+
+def bytes_simulados(canales, n, binario, semilla=0, **fallas):
+    """ Lo que envia la ESP32 simulada para una ventana de n muestras, sin puerto virtual """
+    simulador = ESP32Simulada(canales, n, semilla=semilla, **fallas)
+    enviados = []
+    simulador._enviar = enviados.append
+    simulador.modo_binario = binario
+    simulador._enviar_ventana()
+    return b"".join(enviados)
+
+
+def test_ventana_del_simulador_ida_y_vuelta():
+    frames, decodificador = decodificar(bytes_simulados(6, 200, binario=True))
+    muestras, rms, fft, peaks = unir_frames(frames)
+    assert muestras.shape == (200, 6) and muestras.dtype == np.float32
+    np.testing.assert_allclose(rms, calcular_rms(muestras.T), rtol=1e-6)
+    np.testing.assert_allclose(fft, calcular_fft(muestras.T).T, rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(peaks, calcular_peaks(muestras.T).T)
+    assert decodificador.errores_crc == 0
+    assert decodificador.tomar_texto() == b"OK\0"
+
+
+def test_binario_y_texto_traen_las_mismas_muestras():
+    muestras, *_ = unir_frames(decodificar(bytes_simulados(4, 50, binario=True, semilla=3))[0])
+    texto = bytes_simulados(4, 50, binario=False, semilla=3)
+    lineas = texto[len(b"OK\0"):].split(b"\n")[:50]
+    np.testing.assert_allclose(muestras, np.array([linea.split() for linea in lineas], dtype=np.float32),
+                               atol=1e-6)
+
+
+def test_ventana_del_simulador_de_a_un_byte():
+    datos = bytes_simulados(6, 70, binario=True)
+    completos, _ = decodificar(datos)
+    de_a_uno, _ = decodificar(datos, tam_bloque=1)
+    assert len(de_a_uno) == len(completos)
+    for uno, otro in zip(de_a_uno, completos):
+        assert (uno.tipo, uno.canales, uno.secuencia) == (otro.tipo, otro.canales, otro.secuencia)
+        np.testing.assert_array_equal(uno.datos, otro.datos)
+
+
+def frames_de_prueba(cantidad=5, filas=8, canales=3):
+    datos = np.arange(cantidad * filas * canales, dtype=np.float32).reshape(cantidad, filas, canales)
+    return datos, [codificar_frame(TIPO_MUESTRAS_F32, i, datos[i]) for i in range(cantidad)]
+
+
+def test_ida_y_vuelta_de_a_un_byte():
+    datos, frames = frames_de_prueba()
+    flujo = b"".join(frames) + codificar_frame(TIPO_FIN, 5, canales=3)
+    recibidos, decodificador = decodificar(flujo, tam_bloque=1)
+    assert [frame.secuencia for frame in recibidos] == [0, 1, 2, 3, 4]
+    np.testing.assert_array_equal(unir_frames(recibidos)[0], np.concatenate(datos))
+    assert decodificador.errores_crc == 0 and decodificador.bytes_descartados == 0
+
+
+def test_crc_malo_se_descarta_y_se_resincroniza():
+    datos, frames = frames_de_prueba()
+    corrupto = bytearray(frames[2])
+    corrupto[CABECERA.size + 5] ^= 0xFF  # Un byte del payload
+    flujo = b"".join(frames[:2]) + bytes(corrupto) + b"".join(frames[3:])
+    flujo += codificar_frame(TIPO_FIN, 5, canales=3)
+
+    recibidos, decodificador = decodificar(flujo)
+    assert [frame.secuencia for frame in recibidos] == [0, 1, 3, 4]
+    assert decodificador.errores_crc == 1
+    np.testing.assert_array_equal(unir_frames(recibidos)[0], np.concatenate(datos[[0, 1, 3, 4]]))
+
+
+def test_cabecera_falsa_dentro_del_payload():
+    # Si el payload de un frame corrupto contiene una cabecera, ese falso frame tambien se descarta
+    _, frames = frames_de_prueba(3)
+    corrupto = bytearray(frames[1])
+    corrupto[CABECERA.size:2 * CABECERA.size] = CABECERA.pack(b'\xa5\x5a', TIPO_MUESTRAS_F32, 3, 9, 12)
+    flujo = frames[0] + bytes(corrupto) + frames[2] + codificar_frame(TIPO_FIN, 3, canales=3)
+    recibidos, decodificador = decodificar(flujo, tam_bloque=7)
+    assert [frame.secuencia for frame in recibidos] == [0, 2]
+    assert decodificador.errores_crc >= 1
+
+
+def test_largo_imposible_no_retiene_lo_que_sigue():
+    # Un sync falso con largo 65000 no debe hacer esperar 65000 bytes antes de revisar el crc
+    _, frames = frames_de_prueba(2)
+    falso = CABECERA.pack(b'\xa5\x5a', TIPO_MUESTRAS_F32, 3, 0, 65000)
+    decodificador = DecodificadorFrames()
+    recibidos = decodificador.alimentar(falso + frames[0] + frames[1])
+    assert [frame.secuencia for frame in recibidos] == [0, 1]
+    assert decodificador.errores_largo == 1 and decodificador.bytes_descartados == CABECERA.size
+
+
+def test_texto_entre_frames():
+    _, frames = frames_de_prueba(2)
+    flujo = b"OK\0" + frames[0] + b"Calculando RMS de los datos\n" + frames[1] + codificar_frame(TIPO_FIN, 2)
+    recibidos, decodificador = decodificar(flujo, tam_bloque=5)
+    assert len(recibidos) == 2
+    assert decodificador.tomar_texto() == b"OK\0Calculando RMS de los datos\n"
+
+
+def test_frame_sin_payload():
+    frame, = DecodificadorFrames().alimentar(codificar_frame(TIPO_FIN, 7, canales=6))
+    assert frame == Frame(TIPO_FIN, 6, 7, frame.datos) and frame.datos.size == 0
+
+
+def lineas_simuladas(canales, n, semilla=0, **fallas):
+    """ Las lineas de una ventana en modo texto, sin el OK ni el FINISH """
+    simulador = ESP32Simulada(canales, n, semilla=semilla, **fallas)
+    enviados = []
+    simulador._enviar = enviados.append
+    simulador._enviar_ventana()
+    lineas = DivisorLineas().alimentar(b"".join(enviados))
+    assert lineas[0] == b"OK" and lineas[-1] == b"FINISH"
+    return lineas[1:-1], simulador
+
+
+def test_parser_cuenta_cada_falla():
+    parser = ParserTexto(2)
+    lote = parser.parsear([b"1.5 2.5", b"1 2 3 4", b"1.0 #.5", b"7", b"", b"1 2 3 4 5", b"3.5 -4.5",
+                           b"Calculando RMS de los datos"])
+    assert (parser.lineas, parser.malformadas, parser.truncadas, parser.sobrantes) == (8, 2, 2, 1)
+    assert parser.descartadas == 5
+    np.testing.assert_array_equal(lote.filas, [[1.5, 2.5], [3.5, -4.5]])
+    np.testing.assert_array_equal(lote.filas_fft, [[1, 2, 3, 4]])
+    assert lote.filas_antes_fft == 1
+
+
+def test_parser_lote_limpio_igual_a_linea_por_linea():
+    lineas, _ = lineas_simuladas(6, 40)
+    lote = ParserTexto(6).parsear(lineas)
+    # Una linea mala obliga a parsear linea por linea; las buenas deben quedar igual
+    con_basura = ParserTexto(6)
+    lote_basura = con_basura.parsear(lineas[:10] + [b"x"] + lineas[10:])
+    np.testing.assert_array_equal(lote.filas, lote_basura.filas)
+    np.testing.assert_array_equal(lote.filas_fft, lote_basura.filas_fft)
+    assert con_basura.malformadas == 1 and con_basura.descartadas == 1
+
+
+def test_lineas_corruptas_del_simulador():
+    lineas, simulador = lineas_simuladas(4, 300, semilla=7, prob_corrupcion=0.05, prob_basura=0.05)
+    ensamblador = EnsambladorTexto(4)
+    assert ensamblador.agregar_lineas(lineas + [b"FINISH"])[1]
+    # Cada linea corrupta tiene un '#' y cada linea de basura es texto: todas son malformadas
+    assert ensamblador.parser.malformadas == simulador.estadisticas["corruptas"] + simulador.estadisticas["basura"]
+    assert ensamblador.descartadas == ensamblador.parser.malformadas > 0
+
+
+@pytest.mark.parametrize("lote", [1, 2, 3, 7, 50, 51, 52, 1000])
+def test_ensamblador_retiene_la_fila_del_rms(lote):
+    lineas, _ = lineas_simuladas(6, 50, semilla=4)
+    ensamblador = EnsambladorTexto(6)
+    entregadas = []
+    lineas = lineas + [b"FINISH", b"1 2 3 4 5 6"]  # Lo que llegue despues del FINISH se ignora
+    for i in range(0, len(lineas), lote):
+        muestras, terminada = ensamblador.agregar_lineas(lineas[i:i + lote])
+        entregadas.append(muestras)
+        if terminada:
+            break
+    muestras, rms, fft, peaks = ensamblador.ventana()
+    assert muestras.shape == (50, 6) and fft.shape == (50, 6) and peaks.shape == (5, 6)
+    # Las muestras entregadas mientras llegan son exactamente las de la ventana, sin la fila del RMS
+    np.testing.assert_array_equal(np.concatenate(entregadas), muestras)
+    np.testing.assert_allclose(rms, np.sqrt(np.mean(muestras.astype(np.float64) ** 2, axis=0)), atol=1e-5)
+
+
+def test_ensamblador_solo_muestras_no_retiene():
+    lineas = [b"1 2", b"3 4", b"5 6"]
+    ensamblador = EnsambladorTexto(2, solo_muestras=True)
+    muestras, terminada = ensamblador.agregar_lineas(lineas[:1])
+    np.testing.assert_array_equal(muestras, [[1, 2]])
+    assert not terminada
+    assert ensamblador.agregar_lineas(lineas[1:] + [b"FINISH"])[1]
+    np.testing.assert_array_equal(ensamblador.ventana()[0], [[1, 2], [3, 4], [5, 6]])
+
+
+def test_unir_lineas_sin_filas_para_rms_y_peaks():
+    filas = np.ones((N_PEAKS + 1, 2), dtype=np.float32)
+    with pytest.raises(ValueError):
+        unir_lineas(filas, np.empty((0, 4)), 2)
+    # En modo CRUDO todas las filas son muestras, aunque sean pocas
+    assert unir_lineas(filas, np.empty((0, 4)), 2, solo_muestras=True)[0].shape == (N_PEAKS + 1, 2)
+
+
+def test_unir_lineas_con_la_fft_incompleta():
+    filas = np.ones((10 + 1 + N_PEAKS, 2), dtype=np.float32)
+    assert unir_lineas(filas, np.ones((10, 4)), 2)[2].shape == (10, 2)
+    for filas_fft in (9, 11):
+        with pytest.raises(ValueError):
+            unir_lineas(filas, np.ones((filas_fft, 4)), 2)
+
+
+def test_ventana_con_lineas_perdidas():
+    lineas, simulador = lineas_simuladas(4, 100, semilla=2, prob_perdida=0.05)
+    assert simulador.estadisticas["perdidas"] > 0
+    ensamblador = EnsambladorTexto(4)
+    assert ensamblador.agregar_lineas(lineas + [b"FINISH"])[1]
+    with pytest.raises(ValueError):
+        ensamblador.ventana()
@@ -0,0 +1,43 @@
+""" Pruebas de los receiver.py de T1 y T4: se importan sin abrir el puerto ni
+cargar lo que solo usan algunos modos, y siguen ante una ventana que no se
+puede armar """
+import os
+import subprocess
+import sys
+
+import pytest
+
+from comun.simulador import ESP32Simulada
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# Se cargan recien en conectar, graficar, la interfaz o el modo que los usa
+PEREZOSOS = ("serial", "matplotlib", "PyQt5", "comun.captura", "comun.almacenamiento", "comun.continuo",
+             "comun.enlace", "comun.deteccion", "historial")
+
+
+@pytest.mark.parametrize("carpeta", ["T1", os.path.join("T4", "bmi270")])
+def test_importar_receiver_no_carga_los_modulos_perezosos(carpeta):
+    codigo = f"import sys, receiver; print(' '.join(m for m in {PEREZOSOS!r} if m in sys.modules))"
+    proceso = subprocess.run([sys.executable, "-c", codigo], cwd=os.path.join(RAIZ, carpeta), capture_output=True,
+                             text=True, timeout=60)
+    assert proceso.returncode == 0, proceso.stderr
+    assert proceso.stdout.split() == []
+
+
+@pytest.mark.skipif(os.name == "nt", reason="La ESP32 simulada necesita un pty")
+@pytest.mark.parametrize("carpeta, canales, opciones", [("T1", 4, ["--sin-graficos"]),
+                                                         (os.path.join("T4", "bmi270"), 6, [])])
+def test_ventana_incompleta_no_corta_el_receptor(carpeta, canales, opciones):
+    # Con lineas perdidas la ventana en texto no se puede armar (ver protocolo.unir_lineas):
+    # el receptor lo informa y cierra la conexion en vez de terminar con una excepcion
+    esp32 = ESP32Simulada(canales, 100, semilla=2, prob_perdida=0.05)
+    try:
+        proceso = subprocess.run([sys.executable, "receiver.py", "--puerto", esp32.abrir_pty(), "--ventanas", "1"]
+                                 + opciones, cwd=os.path.join(RAIZ, carpeta), capture_output=True, text=True,
+                                 timeout=60)
+    finally:
+        esp32.detener()
+    assert proceso.returncode == 0, proceso.stderr
+    assert "ERROR: No se pudo recibir la ventana" in proceso.stdout
+    assert "No se recibio CLOSED" not in proceso.stdout
+    assert esp32.estadisticas["perdidas"] > 0
@@ -0,0 +1,110 @@
+""" Pruebas de la sesion asincrona con una ESP32 falsa que responde por el transporte """
+import asyncio
+
+import numpy as np
+import pytest
+
+from comun.sesion_async import ProtocoloESP32, SesionESP32
+from comun.protocolo import codificar_frame, TIPO_MUESTRAS_F32, TIPO_RMS, TIPO_FIN, COMANDO_BINARIO
+from comun.lector import ErrorLector
+
+MUESTRAS = np.array([[1.0, -2.0], [3.0, 4.0], [-5.0, 6.0]], dtype=np.float32)
+PEAKS = np.arange(10, dtype=np.float32).reshape(5, 2)
+
+
+def lineas(filas):
+    return b"".join(b" ".join(b"%f" % v for v in fila) + b"\n" for fila in filas)
+
+
+class TransporteFalso:
+    """ Responde a BEGIN, BINAR, END y al cambio de ventana como la ESP32 """
+
+    def __init__(self, protocolo, basura=b""):
+        self.protocolo = protocolo
+        self.basura = basura
+        self.binario = False
+        self.escritos = []
+        self.cerrado = False
+
+    def write(self, datos):
+        self.escritos.append(datos)
+        loop = asyncio.get_running_loop()
+        if datos == COMANDO_BINARIO:
+            self.binario = True
+            loop.call_soon(self.protocolo.data_received, b"OK\0")
+        elif datos.startswith(b"BEGIN"):
+            for parte in self.ventana():
+                loop.call_soon(self.protocolo.data_received, parte)
+        elif datos.startswith(b"END"):
+            loop.call_soon(self.protocolo.data_received, b"CLOSED\0")
+
+    def ventana(self):
+        if self.binario:
+            datos = (codificar_frame(TIPO_MUESTRAS_F32, 0, MUESTRAS) + codificar_frame(TIPO_RMS, 1, [7.0, 8.0])
+                     + codificar_frame(TIPO_FIN, 2, canales=2))
+            return [b"OK\0", datos[:9], datos[9:]]
+        fft = np.zeros((3, 4), dtype=np.float32)
+        texto = lineas(MUESTRAS) + self.basura + lineas([[7.0, 8.0]]) + lineas(fft) + lineas(PEAKS)
+        return [b"OK\0", texto[:11], texto[11:] + b"FINISH\0"]
+
+    def close(self):
+        self.cerrado = True
+        self.protocolo.connection_lost(None)
+
+
+def sesion_falsa(basura=b"", timeout=1):
+    protocolo = ProtocoloESP32()
+    transporte = TransporteFalso(protocolo, basura)
+    protocolo.connection_made(transporte)
+    return SesionESP32(transporte, protocolo, 2, timeout=timeout), transporte
+
+
+def test_ventana_en_modo_texto():
+    async def main():
+        sesion, transporte = sesion_falsa(basura=b"1.0 #.5\n1 2 3\n")
+        muestras, rms, fft, peaks = await sesion.solicitar_ventana()
+        await sesion.terminar()
+        return sesion, transporte, muestras, rms, fft, peaks
+
+    sesion, transporte, muestras, rms, fft, peaks = asyncio.run(main())
+    np.testing.assert_allclose(muestras, MUESTRAS)
+    np.testing.assert_allclose(rms, [7.0, 8.0])
+    assert fft.shape == (3, 2)
+    np.testing.assert_allclose(peaks, PEAKS)
+    assert sesion.descartadas == 2
+    assert transporte.escritos[-1].startswith(b"END") and transporte.cerrado
+
+
+def test_ventana_en_modo_binario():
+    async def main():
+        sesion, _ = sesion_falsa()
+        await sesion.activar_modo_binario()
+        return await sesion.solicitar_ventana()
+
+    muestras, rms, fft, peaks = asyncio.run(main())
+    np.testing.assert_array_equal(muestras, MUESTRAS)
+    np.testing.assert_array_equal(rms, [7.0, 8.0])
+    assert fft is None and peaks is None
+
+
+def test_varias_sesiones_en_el_mismo_loop():
+    async def main():
+        sesiones = [sesion_falsa()[0] for _ in range(3)]
+        return await asyncio.gather(*(sesion.solicitar_ventana() for sesion in sesiones))
+
+    for muestras, *_ in asyncio.run(main()):
+        np.testing.assert_allclose(muestras, MUESTRAS)
+
+
+def test_timeout_y_conexion_perdida():
+    async def main():
+        sesion, transporte = sesion_falsa(timeout=0.05)
+        with pytest.raises(TimeoutError):
+            await sesion.leer_linea()
+        transporte.close()
+        with pytest.raises(ErrorLector):
+            await sesion.leer_frame()
+        with pytest.raises(ErrorLector):
+            await sesion.leer_frame()
+
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+""" Pruebas de la ESP32 simulada: los comandos que entiende, las fallas que
+inyecta y los puertos virtuales por los que habla """
+import os
+import time
+
+import numpy as np
+import pytest
+import serial
+
+from comun.protocolo import DecodificadorFrames, unir_frames, TIPO_MUESTRAS_F32, TIPO_FIN
+from comun.lector import DivisorLineas
+from comun.simulador import ESP32Simulada, BASURA
+
+
+def simulador_sin_puerto(canales=4, ventana=20, **opciones):
+    """ Un simulador cuyo envio se guarda en una lista en vez de ir a un puerto """
+    simulador = ESP32Simulada(canales, ventana, semilla=1, **opciones)
+    enviados = []
+    simulador._enviar = enviados.append
+    return simulador, enviados
+
+
+def test_comandos_de_modo():
+    simulador, enviados = simulador_sin_puerto()
+    for comando in (b"BINAR", b"CRUDO", b"50"):
+        simulador._comando(comando)
+    assert (simulador.modo_binario, simulador.solo_crudo, simulador.ventana) == (True, True, 50)
+    assert enviados == [b"OK\0", b"OK\0"]  # El tamano de ventana no tiene respuesta
+    simulador._comando(b"END\0")
+    assert enviados[-1] == b"CLOSED\0"
+    # Como el firmware al reiniciarse, vuelve al modo texto completo pero mantiene la ventana
+    assert (simulador.modo_binario, simulador.solo_crudo, simulador.ventana) == (False, False, 50)
+
+
+def test_texto_completo():
+    simulador, enviados = simulador_sin_puerto(canales=4, ventana=20)
+    simulador._comando(b"BEGIN")
+    lineas = DivisorLineas().alimentar(b"".join(enviados))
+    # OK, las muestras, el RMS, la FFT (real e imaginaria por canal), 5 peaks y FINISH
+    assert lineas[0] == b"OK" and lineas[-1] == b"FINISH"
+    assert len(lineas) == 1 + 20 + 1 + 20 + 5 + 1
+    assert len(lineas[22].split()) == 8
+    assert simulador.estadisticas["ventanas"] == 1
+
+
+def test_binario_solo_crudo():
+    simulador, enviados = simulador_sin_puerto(canales=6, ventana=150)
+    simulador.modo_binario = simulador.solo_crudo = True
+    simulador._comando(b"BEGIN")
+    frames = DecodificadorFrames().alimentar(b"".join(enviados))
+    assert [frame.tipo for frame in frames] == [TIPO_MUESTRAS_F32] * 3 + [TIPO_FIN]
+    muestras, rms, fft, peaks = unir_frames(frames[:-1])
+    assert muestras.shape == (150, 6) and rms is None and fft is None and peaks is None
+
+
+def test_fallas_se_cuentan():
+    simulador, enviados = simulador_sin_puerto(canales=4, ventana=500, prob_perdida=0.05, prob_corrupcion=0.05,
+                                               prob_basura=0.05)
+    simulador._comando(b"BEGIN")
+    datos = b"".join(enviados)
+    estadisticas = simulador.estadisticas
+    assert estadisticas["perdidas"] > 0 and estadisticas["corruptas"] > 0 and estadisticas["basura"] > 0
+    assert datos.count(BASURA) == estadisticas["basura"]
+    assert datos.count(b"#") == estadisticas["corruptas"]
+    assert estadisticas["bytes"] == len(datos)
+    # OK y FINISH nunca se pierden
+    assert datos.startswith(b"OK\0") and datos.endswith(b"FINISH\0")
+
+
+def test_silencio_no_responde():
+    simulador, enviados = simulador_sin_puerto(prob_silencio=1.0)
+    simulador._comando(b"BEGIN")
+    assert enviados == [] and simulador.estadisticas["silencios"] == 1
+
+
+def leer_hasta(ser, fin, limite=5):
+    datos = b""
+    inicio = time.monotonic()
+    while not datos.endswith(fin):
+        assert time.monotonic() - inicio < limite, datos[-200:]
+        datos += ser.read(ser.in_waiting or 1)
+    return datos
+
+
+def puertos():
+    disponibles = ["tcp"]
+    if os.name != "nt":
+        disponibles.append("pty")
+    return disponibles
+
+
+@pytest.mark.parametrize("tipo", puertos())
+def test_ventana_por_puerto_virtual(tipo):
+    simulador = ESP32Simulada(canales=6, ventana=30, semilla=2)
+    ruta = simulador.abrir_tcp() if tipo == "tcp" else simulador.abrir_pty()
+    try:
+        with serial.serial_for_url(ruta, 115200, timeout=1) as ser:
+            ser.write(b"BINAR\0")
+            assert leer_hasta(ser, b"OK\0") == b"OK\0"
+            ser.write(b"BEGIN\0")
+            decodificador = DecodificadorFrames()
+            frames = []
+            inicio = time.monotonic()
+            while not frames or frames[-1].tipo != TIPO_FIN:
+                assert time.monotonic() - inicio < 5
+                frames += decodificador.alimentar(ser.read(ser.in_waiting or 1))
+            muestras, rms, fft, peaks = unir_frames(frames[:-1])
+            assert muestras.shape == (30, 6) and fft.shape == (30, 6) and peaks.shape == (5, 6)
+            ser.write(b"END\0")
+            assert leer_hasta(ser, b"CLOSED\0").endswith(b"CLOSED\0")
+    finally:
+        simulador.detener()
+
+
+def test_continuo_hasta_stop():
+    simulador = ESP32Simulada(canales=4, semilla=3)
+    ruta = simulador.abrir_tcp()
+    try:
+        with serial.serial_for_url(ruta, 115200, timeout=1) as ser:
+            ser.write(b"STRM\0")
+            datos = leer_hasta(ser, b"\n")
+            while datos.count(b"\n") < 40:
+                datos += ser.read(ser.in_waiting or 1)
+            ser.write(b"STOP\0")
+            datos += leer_hasta(ser, b"FINISH\0")
+    finally:
+        simulador.detener()
+    lineas = DivisorLineas().alimentar(datos)
+    assert lineas[0] == b"OK" and lineas[-1] == b"FINISH"
+    filas = np.array([linea.split() for linea in lineas[1:-1]], dtype=np.float32)
+    assert filas.shape[1] == 4 and len(filas) >= 40
@@ -0,0 +1,101 @@
+""" Pruebas de los modelos de tabla de la interfaz de la BMI270 """
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt5")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "T4", "bmi270"))
+
+from PyQt5.QtCore import Qt
+from tablas import TablaVentana, HistorialVentanas
+
+NOMBRES = ("x", "y", "z")
+
+
+def cambios(modelo):
+    """ Lista donde se anotan las celdas (fila, primera columna, ultima columna) de cada dataChanged """
+    anotados = []
+    modelo.dataChanged.connect(lambda a, b, *_: anotados.append((a.row(), a.column(), b.column())))
+    return anotados
+
+
+def test_tabla_avisa_solo_las_celdas_que_cambian():
+    tabla = TablaVentana(NOMBRES, n_peaks=2)
+    anotados = cambios(tabla)
+    rms = np.array([1.0, 2.0, 3.0])
+    peaks = np.array([[5.0, 4.0], [6.0, 5.0], [7.0, 6.0]])
+    tabla.mostrar(rms, peaks)
+    assert anotados == [(0, 0, 2), (1, 0, 2), (2, 0, 2)]
+
+    anotados.clear()
+    tabla.mostrar(rms, peaks)
+    assert anotados == []
+
+    peaks[1, 1] = 9.0
+    rms[2] = 0.5
+    tabla.mostrar(rms, peaks)
+    assert anotados == [(1, 2, 2), (2, 0, 0)]
+    assert tabla.data(tabla.index(1, 2)) == 9.0
+
+
+def test_tabla_celdas_vacias_y_tiempo_del_peak():
+    tabla = TablaVentana(NOMBRES, n_peaks=2, periodo=0.5)
+    anotados = cambios(tabla)
+    peaks = np.array([[5.0, np.nan], [6.0, 5.0], [7.0, 6.0]])
+    indices = np.array([[4, -1], [1, 2], [0, 3]])
+    tabla.mostrar(np.zeros(3), peaks, indices)
+    anotados.clear()
+    # Un nan que sigue siendo nan no es un cambio, pero si lo es mover el peak a otra muestra
+    indices = indices.copy()
+    indices[2, 0] = 8
+    tabla.mostrar(np.zeros(3), peaks, indices)
+    assert anotados == [(2, 1, 1)]
+    assert tabla.data(tabla.index(0, 2)) == ""
+    assert tabla.data(tabla.index(2, 1)) == "7.0000 (t = 4 s)"
+    assert tabla.data(tabla.index(2, 1), Qt.ToolTipRole) == "Muestra 8 de la ventana"
+
+
+def cargar_historial(n, lote):
+    historial = HistorialVentanas(NOMBRES, n_peaks=2, lote=lote)
+    rms = np.arange(n * 3, dtype=np.float32).reshape(n, 3)
+    historial.cargar(np.full(n, 1e9), np.full(n, 100), rms, np.zeros((n, 3, 2)))
+    return historial
+
+
+def test_historial_entrega_las_filas_de_a_lotes():
+    historial = cargar_historial(2500, lote=1000)
+    assert len(historial) == 2500 and historial.rowCount() == 0
+    entregadas = []
+    while historial.canFetchMore():
+        historial.fetchMore()
+        entregadas.append(historial.rowCount())
+    assert entregadas == [1000, 2000, 2500]
+    historial.fetchMore()
+    assert historial.rowCount() == 2500
+    assert historial.data(historial.index(2499, 4)) == 2499 * 3 + 2
+    assert historial.data(historial.index(0, 1)) == 100
+    # Un modelo de tabla no tiene hijos
+    assert historial.rowCount(historial.index(0, 0)) == 0 and not historial.canFetchMore(historial.index(0, 0))
+
+
+def test_historial_agrega_fila_visible_solo_si_esta_al_dia():
+    from comun.ventana import Ventana
+    ventana = Ventana.desde_arreglos(np.ones((10, 3), dtype=np.float32), np.ones(3), None, np.ones((2, 3)))
+
+    historial = cargar_historial(5, lote=2)
+    historial.fetchMore()
+    historial.agregar(ventana, tiempo=0)
+    assert (len(historial), historial.rowCount()) == (6, 2)  # Espera el proximo fetchMore
+
+    al_dia = HistorialVentanas(NOMBRES, n_peaks=2)
+    insertadas = []
+    al_dia.rowsInserted.connect(lambda padre, primera, ultima: insertadas.append((primera, ultima)))
+    al_dia.agregar(ventana, tiempo=0)
+    al_dia.agregar(ventana, tiempo=1)
+    assert insertadas == [(0, 0), (1, 1)] and al_dia.rowCount() == 2
+    # Crece mas alla de la capacidad inicial sin perder lo anterior
+    al_dia.cargar(np.zeros(2000), np.full(2000, 10), np.ones((2000, 3)), np.zeros((2000, 3, 2)))
+    assert len(al_dia) == 2002 and al_dia.resumen(1)[0].tolist() == [1, 1, 1]
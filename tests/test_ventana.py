@@ -0,0 +1,41 @@
+""" Pruebas de Ventana: desde_frames y desde_arreglos deben dar la misma ventana """
+import numpy as np
+
+from comun.protocolo import Frame, TIPO_MUESTRAS_F32, TIPO_RMS, TIPO_FFT, TIPO_PEAKS, N_PEAKS
+from comun.ventana import Ventana
+
+
+def secciones(n=100, canales=6, semilla=0):
+    muestras = np.random.default_rng(semilla).standard_normal((n, canales)).astype(np.float32)
+    rms = np.sqrt(np.mean(muestras ** 2, axis=0))
+    fft = np.fft.fft(muestras, axis=0).astype(np.complex64)
+    peaks = -np.sort(-muestras, axis=0)[:N_PEAKS]
+    return muestras, rms, fft, peaks
+
+
+def test_desde_frames_igual_a_desde_arreglos():
+    muestras, rms, fft, peaks = secciones()
+    canales = muestras.shape[1]
+    frames = [Frame(TIPO_MUESTRAS_F32, canales, i, muestras[i:i + 32]) for i in range(0, len(muestras), 32)]
+    frames.append(Frame(TIPO_RMS, canales, 0, rms))
+    frames += [Frame(TIPO_FFT, canales, i, fft[i:i + 32]) for i in range(0, len(fft), 32)]
+    frames.append(Frame(TIPO_PEAKS, canales, 0, peaks))
+
+    por_frames = Ventana.desde_frames(frames)
+    por_arreglos = Ventana.desde_arreglos(muestras, rms, fft, peaks)
+    np.testing.assert_array_equal(por_frames.datos, por_arreglos.datos)
+    np.testing.assert_array_equal(por_frames.crudo, muestras.T)
+
+
+def test_vistas_sobre_el_mismo_arreglo():
+    ventana = Ventana(2, 10, nombres=["a", "b"])
+    ventana["b"][:] = 3
+    assert np.all(ventana.datos[1, 20:30] == 3)
+    assert len(ventana) == 10 and ventana.peaks.shape == (2, N_PEAKS)
+
+
+def test_desde_frames_sin_frames():
+    ventana = Ventana.desde_frames([])
+    assert ventana.canales == 0 and len(ventana) == 0
+    ventana = Ventana.desde_frames([], nombres=["acc_x", "acc_y"])
+    assert ventana.canales == 2 and len(ventana) == 0